@@ -5,7 +5,7 @@ a = Analysis(
     ['main.py'],
     pathex=[],
     binaries=[],
-    datas=[('escala_folgas.xlsx', '.'), ('escala_permanencias.db', '.'), ('escala_algoritmo.py', '.'), ('escala_ler_excel.py', '.'), ('escala_bd_consultas.py', '.'), ('fixarPessoas.py', '.'), ('adicionarPessoas.py', '.')],
+    datas=[('escala_folgas.xlsx', '.'), ('escala_permanencias.db', '.'), ('escala_algoritmo.py', '.'), ('escala_ler_excel.py', '.'), ('escala_bd_consultas.py', '.'), ('fixarPessoas.py', '.'), ('adicionarPessoas.py', '.'), ('escala_disponibilidade.py', '.'), ('escala_fontes_folgas.py', '.'), ('escala_db_setup.py', '.'), ('escala_importar_fixas.py', '.'), ('tarefasQt.py', '.'), ('escala_instrumentacao.py', '.'), ('modeloEscala.py', '.'), ('escala_contexto.py', '.'), ('escala_exportar.py', '.'), ('escala_estatisticas.py', '.'), ('escala_cli.py', '.')],
     hiddenimports=['pandas', 'numpy', 'openpyxl', 'PyQt5.sip', 'PyQt5.QtCore', 'PyQt5.QtGui', 'PyQt5.QtWidgets', 'sqlite3', 'datetime', 'collections'],
     hookspath=[],
     hooksconfig={},
@@ -2,48 +2,68 @@
 # -*- coding: utf-8 -*-
 
 import sys
-import sqlite3
+from bisect import bisect_left, insort
 from PyQt5.QtWidgets import (QApplication, QDialog, QVBoxLayout, QHBoxLayout, 
                              QLabel, QLineEdit, QComboBox, QDoubleSpinBox, 
                              QPushButton, QTableWidget, QTableWidgetItem, 
                              QHeaderView, QMessageBox, QGroupBox, QFormLayout)
 from PyQt5.QtCore import Qt
 from PyQt5.QtGui import QFont
+from escala_bd_consultas import normalizar_nome
+from tarefasQt import ExecutorBD
 
 class AdicionarPessoasDialog(QDialog):
-    def __init__(self, gestor_bd, parent=None):
+    def __init__(self, gestor_bd, parent=None, executor=None):
         super().__init__(parent)
         self.gestor = gestor_bd
         self.parent = parent
         
+        # Acesso à base de dados fora da thread da interface
+        self.executor = executor or ExecutorBD(gestor_bd, parent=self)
+        self.executor.ocupado.connect(self.mostrar_ocupado)
+        
         self.setWindowTitle("Adicionar/Editar Pessoas")
         self.setGeometry(300, 200, 900, 700)
         
-        self.pessoas = []
+        self.pessoas = []  # Uma por linha da tabela, por ordem de nome
+        self._indice_nomes = []  # (palavra normalizada, id) ordenado, para a procura
+        self._filtro = None  # IDs visíveis com a procura atual (None: todos)
         
-        self.carregar_pessoas()
         self.setup_ui()
+        self.carregar_pessoas()
     
     def carregar_pessoas(self):
-        """Carrega pessoas da base de dados"""
-        try:
-            conn = self.gestor._conectar()
-            cursor = conn.cursor()
-            
-            # Carregar pessoas com suas configurações
-            cursor.execute('''
-                SELECT p.id, p.nome, p.ativo, dt.turno, cp.percentagem_min, cp.percentagem_max
-                FROM pessoas p
-                LEFT JOIN disponibilidade_turno dt ON p.id = dt.pessoa_id
-                LEFT JOIN configuracao_percentagens cp ON p.id = cp.pessoa_id
-                ORDER BY p.nome
-            ''')
-            self.pessoas = cursor.fetchall()
-            
-            conn.close()
-            
-        except Exception as e:
-            QMessageBox.critical(self, "Erro", f"Erro ao carregar pessoas: {e}")
+        """Carrega pessoas da base de dados (em segundo plano) e atualiza a tabela"""
+        # Carregar pessoas com suas configurações
+        self.executor.executar(
+            'listar_pessoas',
+            ao_concluir=self.pessoas_carregadas,
+            ao_falhar=lambda e: self.mostrar_erro("Erro ao carregar pessoas", e)
+        )
+    
+    def pessoas_carregadas(self, pessoas):
+        """Recebe as pessoas carregadas da base de dados"""
+        self.pessoas = pessoas
+        self._indice_nomes = sorted(
+            (palavra, pessoa[0]) for pessoa in pessoas for palavra in self._palavras(pessoa[1])
+        )
+        self.atualizar_lista()
+    
+    def mostrar_ocupado(self, ocupado):
+        """Mostra o cursor de espera enquanto há operações na base de dados"""
+        if ocupado:
+            self.setCursor(Qt.BusyCursor)
+        else:
+            self.unsetCursor()
+    
+    def done(self, resultado):
+        """Ao fechar, desliga o diálogo do executor (partilhado com a janela principal)"""
+        self.executor.ocupado.disconnect(self.mostrar_ocupado)
+        super().done(resultado)
+    
+    def mostrar_erro(self, titulo, erro):
+        """Mostra um erro devolvido por uma operação na base de dados"""
+        QMessageBox.critical(self, "Erro", f"{titulo}: {erro}")
     
     def setup_ui(self):
         layout = QVBoxLayout()
@@ -151,6 +171,13 @@ class AdicionarPessoasDialog(QDialog):
         
         lista_layout = QVBoxLayout()
         
+        # Procura (filtra a tabela enquanto se escreve)
+        self.edit_procurar = QLineEdit()
+        self.edit_procurar.setPlaceholderText("Procurar pelo nome...")
+        self.edit_procurar.setClearButtonEnabled(True)
+        self.edit_procurar.textChanged.connect(self.aplicar_filtro)
+        lista_layout.addWidget(self.edit_procurar)
+        
         # Tabela de pessoas
         self.tabela_pessoas = QTableWidget()
         self.tabela_pessoas.setColumnCount(6)
@@ -195,7 +222,7 @@ class AdicionarPessoasDialog(QDialog):
         """)
         
         btn_atualizar = QPushButton("🔄 Atualizar Lista")
-        btn_atualizar.clicked.connect(self.atualizar_lista)
+        btn_atualizar.clicked.connect(self.carregar_pessoas)
         btn_atualizar.setStyleSheet("""
             QPushButton {
                 background-color: #2196F3;
@@ -264,45 +291,27 @@ class AdicionarPessoasDialog(QDialog):
                 QMessageBox.warning(self, "Aviso", "A percentagem mínima não pode ser maior que a máxima!")
                 return
             
-            conn = self.gestor._conectar()
-            cursor = conn.cursor()
-            
-            # Verificar se pessoa já existe
-            cursor.execute('SELECT id FROM pessoas WHERE nome = ?', (nome,))
-            if cursor.fetchone():
-                QMessageBox.warning(self, "Aviso", f"A pessoa '{nome}' já existe!")
-                conn.close()
-                return
-            
-            # Inserir pessoa
-            cursor.execute('INSERT INTO pessoas (nome, ativo) VALUES (?, 1)', (nome,))
-            pessoa_id = cursor.lastrowid
-            
-            # Inserir turno
-            cursor.execute('''
-                INSERT INTO disponibilidade_turno (pessoa_id, turno)
-                VALUES (?, ?)
-            ''', (pessoa_id, turno))
-            
-            # Inserir percentagens
-            cursor.execute('''
-                INSERT INTO configuracao_percentagens 
-                (pessoa_id, percentagem_min, percentagem_max)
-                VALUES (?, ?, ?)
-            ''', (pessoa_id, perc_min, perc_max))
-            
-            conn.commit()
-            conn.close()
-            
-            QMessageBox.information(self, "Sucesso", 
-                                  f"Pessoa '{nome}' adicionada com sucesso!\n"
-                                  f"Turno: {turno}\n"
-                                  f"Percentagens: {perc_min}% - {perc_max}%")
+            def concluido(pessoa_id):
+                # None se a pessoa já existe
+                if pessoa_id is None:
+                    QMessageBox.warning(self, "Aviso", f"A pessoa '{nome}' já existe!")
+                    return
+                
+                QMessageBox.information(self, "Sucesso", 
+                                      f"Pessoa '{nome}' adicionada com sucesso!\n"
+                                      f"Turno: {turno}\n"
+                                      f"Percentagens: {perc_min}% - {perc_max}%")
+                
+                # Inserir na tabela e limpar campos
+                self.inserir_pessoa((pessoa_id, nome, 1, turno, perc_min, perc_max))
+                self.limpar_campos()
             
-            # Atualizar lista e limpar campos
-            self.carregar_pessoas()
-            self.atualizar_lista()
-            self.limpar_campos()
+            # Inserir pessoa, turno e percentagens
+            self.executor.executar(
+                'adicionar_pessoa', nome, turno, perc_min, perc_max,
+                ao_concluir=concluido,
+                ao_falhar=lambda e: self.mostrar_erro("Erro ao adicionar pessoa", e)
+            )
             
         except Exception as e:
             QMessageBox.critical(self, "Erro", f"Erro ao adicionar pessoa: {e}")
@@ -322,7 +331,7 @@ class AdicionarPessoasDialog(QDialog):
                 return
             
             pessoa_id = int(id_item.text())
-            nome_atual = self.tabela_pessoas.item(linha_selecionada, 1).text()
+            ativo = self.pessoas[linha_selecionada][2]
             
             nome_novo = self.edit_nome.text().strip()
             turno_novo = self.combo_turno.currentText()
@@ -337,41 +346,25 @@ class AdicionarPessoasDialog(QDialog):
                 QMessageBox.warning(self, "Aviso", "A percentagem mínima não pode ser maior que a máxima!")
                 return
             
-            conn = self.gestor._conectar()
-            cursor = conn.cursor()
-            
-            # Verificar se nome já existe (para outra pessoa)
-            if nome_novo != nome_atual:
-                cursor.execute('SELECT id FROM pessoas WHERE nome = ? AND id != ?', (nome_novo, pessoa_id))
-                if cursor.fetchone():
+            def concluido(atualizada):
+                # False se o nome já existe
+                if not atualizada:
                     QMessageBox.warning(self, "Aviso", f"A pessoa '{nome_novo}' já existe!")
-                    conn.close()
                     return
-            
-            # Atualizar pessoa
-            cursor.execute('UPDATE pessoas SET nome = ? WHERE id = ?', (nome_novo, pessoa_id))
-            
-            # Atualizar turno
-            cursor.execute('''
-                UPDATE disponibilidade_turno SET turno = ? 
-                WHERE pessoa_id = ?
-            ''', (turno_novo, pessoa_id))
-            
-            # Atualizar percentagens
-            cursor.execute('''
-                UPDATE configuracao_percentagens 
-                SET percentagem_min = ?, percentagem_max = ?
-                WHERE pessoa_id = ?
-            ''', (perc_min_novo, perc_max_novo, pessoa_id))
-            
-            conn.commit()
-            conn.close()
-            
-            QMessageBox.information(self, "Sucesso", f"Pessoa '{nome_novo}' atualizada com sucesso!")
-            
-            # Atualizar lista
-            self.carregar_pessoas()
-            self.atualizar_lista()
+                
+                QMessageBox.information(self, "Sucesso", f"Pessoa '{nome_novo}' atualizada com sucesso!")
+                
+                # Atualizar só a linha da pessoa
+                self.substituir_pessoa(
+                    (pessoa_id, nome_novo, ativo, turno_novo, perc_min_novo, perc_max_novo)
+                )
+            
+            # Atualizar pessoa, turno e percentagens
+            self.executor.executar(
+                'atualizar_pessoa', pessoa_id, nome_novo, turno_novo, perc_min_novo, perc_max_novo,
+                ao_concluir=concluido,
+                ao_falhar=lambda e: self.mostrar_erro("Erro ao editar pessoa", e)
+            )
             
         except Exception as e:
             QMessageBox.critical(self, "Erro", f"Erro ao editar pessoa: {e}")
@@ -397,20 +390,21 @@ class AdicionarPessoasDialog(QDialog):
             ativo_atual = ativo_item.text()
             ativo_novo = 0 if ativo_atual == "Sim" else 1
             
-            conn = self.gestor._conectar()
-            cursor = conn.cursor()
-            
-            cursor.execute('UPDATE pessoas SET ativo = ? WHERE id = ?', (ativo_novo, pessoa_id))
-            
-            conn.commit()
-            conn.close()
-            
-            estado = "ativada" if ativo_novo else "desativada"
-            QMessageBox.information(self, "Sucesso", f"Pessoa '{pessoa_nome}' {estado}!")
-            
-            # Atualizar lista
-            self.carregar_pessoas()
-            self.atualizar_lista()
+            def concluido(_):
+                estado = "ativada" if ativo_novo else "desativada"
+                QMessageBox.information(self, "Sucesso", f"Pessoa '{pessoa_nome}' {estado}!")
+                
+                # Atualizar só a linha da pessoa
+                linha = self.linha_pessoa(pessoa_id)
+                if linha != -1:
+                    _, _, _, turno, perc_min, perc_max = self.pessoas[linha]
+                    self.substituir_pessoa((pessoa_id, pessoa_nome, ativo_novo, turno, perc_min, perc_max))
+            
+            self.executor.executar(
+                'definir_ativo', pessoa_id, ativo_novo,
+                ao_concluir=concluido,
+                ao_falhar=lambda e: self.mostrar_erro("Erro ao alterar estado", e)
+            )
             
         except Exception as e:
             QMessageBox.critical(self, "Erro", f"Erro ao alterar estado: {e}")
@@ -443,24 +437,19 @@ class AdicionarPessoasDialog(QDialog):
             )
             
             if reply == QMessageBox.Yes:
-                conn = self.gestor._conectar()
-                cursor = conn.cursor()
-                
-                # Remover em cascata (depende das constraints da BD)
-                cursor.execute('DELETE FROM configuracao_percentagens WHERE pessoa_id = ?', (pessoa_id,))
-                cursor.execute('DELETE FROM disponibilidade_turno WHERE pessoa_id = ?', (pessoa_id,))
-                cursor.execute('DELETE FROM permanencias_fixas WHERE pessoa_id = ?', (pessoa_id,))
-                cursor.execute('DELETE FROM pessoas WHERE id = ?', (pessoa_id,))
+                def concluido(_):
+                    QMessageBox.information(self, "Sucesso", f"Pessoa '{pessoa_nome}' removida!")
+                    
+                    # Retirar a linha da tabela
+                    self.retirar_pessoa(pessoa_id)
+                    self.limpar_campos()
                 
-                conn.commit()
-                conn.close()
-                
-                QMessageBox.information(self, "Sucesso", f"Pessoa '{pessoa_nome}' removida!")
-                
-                # Atualizar lista
-                self.carregar_pessoas()
-                self.atualizar_lista()
-                self.limpar_campos()
+                # Remover em cascata (configurações e permanências fixas)
+                self.executor.executar(
+                    'remover_pessoa', pessoa_id,
+                    ao_concluir=concluido,
+                    ao_falhar=lambda e: self.mostrar_erro("Erro ao remover pessoa", e)
+                )
                 
         except Exception as e:
             QMessageBox.critical(self, "Erro", f"Erro ao remover pessoa: {e}")
@@ -493,43 +482,111 @@ class AdicionarPessoasDialog(QDialog):
         try:
             self.tabela_pessoas.setRowCount(len(self.pessoas))
             
-            for row, (pessoa_id, nome, ativo, turno, perc_min, perc_max) in enumerate(self.pessoas):
-                # ID
-                item_id = QTableWidgetItem(str(pessoa_id))
-                item_id.setFlags(item_id.flags() & ~Qt.ItemIsEditable)
-                self.tabela_pessoas.setItem(row, 0, item_id)
-                
-                # Nome
-                item_nome = QTableWidgetItem(nome)
-                item_nome.setFlags(item_nome.flags() & ~Qt.ItemIsEditable)
-                self.tabela_pessoas.setItem(row, 1, item_nome)
-                
-                # Ativo
-                item_ativo = QTableWidgetItem("Sim" if ativo else "Não")
-                item_ativo.setFlags(item_ativo.flags() & ~Qt.ItemIsEditable)
-                self.tabela_pessoas.setItem(row, 2, item_ativo)
-                
-                # Turno
-                item_turno = QTableWidgetItem(turno if turno else "Ambos")
-                item_turno.setFlags(item_turno.flags() & ~Qt.ItemIsEditable)
-                self.tabela_pessoas.setItem(row, 3, item_turno)
-                
-                # Percentagem Min
-                item_min = QTableWidgetItem(f"{perc_min if perc_min else 10.0}%")
-                item_min.setFlags(item_min.flags() & ~Qt.ItemIsEditable)
-                self.tabela_pessoas.setItem(row, 4, item_min)
-                
-                # Percentagem Max
-                item_max = QTableWidgetItem(f"{perc_max if perc_max else 20.0}%")
-                item_max.setFlags(item_max.flags() & ~Qt.ItemIsEditable)
-                self.tabela_pessoas.setItem(row, 5, item_max)
+            for row, pessoa in enumerate(self.pessoas):
+                self.preencher_linha(row, pessoa)
             
             # Ocultar coluna ID
             self.tabela_pessoas.setColumnHidden(0, True)
-            
+            self.aplicar_filtro()
+        
         except Exception as e:
             QMessageBox.critical(self, "Erro", f"Erro ao atualizar lista: {e}")
     
+    def preencher_linha(self, row, pessoa):
+        """Preenche uma linha da tabela com (id, nome, ativo, turno, perc_min, perc_max)"""
+        pessoa_id, nome, ativo, turno, perc_min, perc_max = pessoa
+        textos = (
+            str(pessoa_id),
+            nome,
+            "Sim" if ativo else "Não",
+            turno if turno else "Ambos",
+            f"{perc_min if perc_min else 10.0}%",
+            f"{perc_max if perc_max else 20.0}%",
+        )
+        
+        for coluna, texto in enumerate(textos):
+            item = QTableWidgetItem(texto)
+            item.setFlags(item.flags() & ~Qt.ItemIsEditable)
+            self.tabela_pessoas.setItem(row, coluna, item)
+    
+    def linha_pessoa(self, pessoa_id):
+        """Retorna a linha da tabela de uma pessoa, ou -1"""
+        for linha, pessoa in enumerate(self.pessoas):
+            if pessoa[0] == pessoa_id:
+                return linha
+        return -1
+    
+    def inserir_pessoa(self, pessoa):
+        """Insere uma pessoa na tabela, na posição da ordem por nome"""
+        linha = bisect_left([p[1] for p in self.pessoas], pessoa[1])
+        self.pessoas.insert(linha, pessoa)
+        self.tabela_pessoas.insertRow(linha)
+        self.preencher_linha(linha, pessoa)
+        
+        for palavra in self._palavras(pessoa[1]):
+            insort(self._indice_nomes, (palavra, pessoa[0]))
+        self.tabela_pessoas.setRowHidden(linha, not self._visivel(pessoa[0]))
+        return linha
+    
+    def retirar_pessoa(self, pessoa_id):
+        """Retira uma pessoa da tabela e do índice de procura"""
+        linha = self.linha_pessoa(pessoa_id)
+        if linha == -1:
+            return
+        
+        pessoa = self.pessoas.pop(linha)
+        self.tabela_pessoas.removeRow(linha)
+        for palavra in self._palavras(pessoa[1]):
+            indice = bisect_left(self._indice_nomes, (palavra, pessoa_id))
+            if indice < len(self._indice_nomes) and self._indice_nomes[indice] == (palavra, pessoa_id):
+                del self._indice_nomes[indice]
+    
+    def substituir_pessoa(self, pessoa):
+        """Atualiza a linha de uma pessoa (muda de posição se o nome mudou)"""
+        linha = self.linha_pessoa(pessoa[0])
+        if linha != -1 and self.pessoas[linha][1] == pessoa[1]:
+            self.pessoas[linha] = pessoa
+            self.preencher_linha(linha, pessoa)
+            return
+        
+        selecionada = linha != -1 and linha == self.tabela_pessoas.currentRow()
+        self.retirar_pessoa(pessoa[0])
+        linha = self.inserir_pessoa(pessoa)
+        if selecionada:
+            self.tabela_pessoas.selectRow(linha)
+    
+    @staticmethod
+    def _palavras(nome):
+        """Palavras normalizadas de um nome (ex: 'Patrícia S.' -> ['patricia', 's'])"""
+        return normalizar_nome(nome).split() or ['']
+    
+    def _com_prefixo(self, prefixo):
+        """IDs das pessoas com uma palavra do nome começada por prefixo (normalizado)"""
+        ids = set()
+        indice = bisect_left(self._indice_nomes, (prefixo,))
+        while indice < len(self._indice_nomes) and self._indice_nomes[indice][0].startswith(prefixo):
+            ids.add(self._indice_nomes[indice][1])
+            indice += 1
+        return ids
+    
+    def _visivel(self, pessoa_id):
+        """Indica se uma pessoa passa no filtro de procura"""
+        return self._filtro is None or pessoa_id in self._filtro
+    
+    def aplicar_filtro(self, *_):
+        """
+        Mostra só as pessoas cujo nome tem, para cada palavra procurada,
+        uma palavra começada por ela (sem distinguir acentos ou maiúsculas)
+        """
+        termos = normalizar_nome(self.edit_procurar.text()).split()
+        self._filtro = None
+        for termo in termos:
+            ids = self._com_prefixo(termo)
+            self._filtro = ids if self._filtro is None else self._filtro & ids
+        
+        for linha, pessoa in enumerate(self.pessoas):
+            self.tabela_pessoas.setRowHidden(linha, not self._visivel(pessoa[0]))
+    
     def limpar_campos(self):
         """Limpa os campos de edição"""
         self.edit_nome.clear()
@@ -540,7 +597,7 @@ class AdicionarPessoasDialog(QDialog):
 
 def main():
     """Função para teste independente"""
-    from gestor_basedados import GestorBaseDados
+    from escala_bd_consultas import GestorBaseDados
     
     app = QApplication(sys.argv)
     gestor = GestorBaseDados()
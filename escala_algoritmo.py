@@ -3,6 +3,9 @@ from datetime import datetime, timedelta
 import random
 from collections import defaultdict
 from escala_bd_consultas import GestorBaseDados
+from escala_disponibilidade import MatrizDisponibilidade
+from escala_estatisticas import EstatisticasEscala
+from escala_exportar import exportar_escala, exportar_escala_excel, exportar_calendarios_ical
 
 class GeradorEscala:
     """
@@ -13,13 +16,20 @@ class GeradorEscala:
         """
         Args:
             gestor_bd: Instância de GestorBaseDados
-            df_folgas: DataFrame com folgas/férias do Excel
+            df_folgas: DataFrame com folgas/férias do Excel ou MatrizDisponibilidade
         """
         self.gestor = gestor_bd
+        self._bd = gestor_bd  # Snapshot em memória durante gerar_escala
         self.df_folgas = df_folgas
+        if isinstance(df_folgas, MatrizDisponibilidade) or df_folgas is None:
+            self.disponibilidade = df_folgas
+        else:
+            self.disponibilidade = MatrizDisponibilidade.de_dataframe(df_folgas)
         self.escala = {}  # {data: {'Manhã': pessoa, 'Tarde': pessoa}}
         self.contador_permanencias = defaultdict(int)
+        self.cancelada = False
         self.historico_turnos = []  # [(data, pessoa, turno)]
+        self._estatisticas = None  # EstatisticasEscala da última escala (ver estatisticas())
     
     def obter_pessoas_disponiveis_dia(self, data, turno):
         """
@@ -27,15 +37,14 @@ class GeradorEscala:
         Considera: disponibilidade no Excel, configuração de turno, e permanências fixas
         """
         # 1. Obter pessoas disponíveis no Excel (sem FOLGA/FÉRIAS/etc)
-        from escala_ler_excel import obter_pessoas_disponiveis
-        pessoas_excel = obter_pessoas_disponiveis(self.df_folgas, data)
+        pessoas_excel = self.disponibilidade.pessoas_disponiveis(data)
         
         if not pessoas_excel:
             return []
         
         # 2. Obter pessoas que podem fazer este turno na BD
-        pessoas_turno_bd = self.gestor.obter_pessoas_por_turno(turno)
-        nomes_turno = [nome for _, nome in pessoas_turno_bd]
+        pessoas_turno_bd = self._bd.obter_pessoas_por_turno(turno)
+        nomes_turno = {nome for _, nome in pessoas_turno_bd}
         
         # 3. Interseção: disponíveis no Excel E podem fazer o turno
         disponiveis = [p for p in pessoas_excel if p in nomes_turno]
@@ -137,19 +146,12 @@ class GeradorEscala:
         Quanto MENOR o valor, MAIOR a prioridade
         """
         # Obter configuração de percentagens da pessoa
-        conn = self.gestor._conectar()
-        cursor = conn.cursor()
+        pessoa_id = self._bd.obter_id_pessoa(pessoa)
         
-        cursor.execute('SELECT id FROM pessoas WHERE nome = ?', (pessoa,))
-        resultado = cursor.fetchone()
-        
-        if not resultado:
-            conn.close()
+        if pessoa_id is None:
             return 999999
         
-        pessoa_id = resultado[0]
-        perc_min, perc_max = self.gestor.obter_configuracao_pessoa(pessoa_id)
-        conn.close()
+        perc_min, perc_max = self._bd.obter_configuracao_pessoa(pessoa_id)
         
         # Calcular percentagem atual
         permanencias_atuais = self.contador_permanencias[pessoa]
@@ -161,80 +163,140 @@ class GeradorEscala:
         # Quanto mais abaixo do mínimo, maior prioridade (menor valor)
         return -diferenca
     
-    def gerar_escala(self, data_inicio, data_fim):
+    def gerar_escala(self, data_inicio, data_fim, ao_progresso=None, cancelar=None, snapshot=None):
         """
         Gera escala completa para o período especificado
+        
+        Args:
+            data_inicio, data_fim: Período da escala (datetime)
+            ao_progresso: Função chamada no fim de cada dia com
+                (dias_concluidos, total_dias), na thread da geração
+            cancelar: Função sem argumentos verificada antes de cada dia; se
+                devolver True, a geração pára e self.cancelada fica True
+            snapshot: Cópia da base de dados a usar (GestorBaseDados.criar_snapshot);
+                se não for dada, é criada uma e fechada no fim
+        
+        Returns:
+            Dicionário {data: {'Manhã': pessoa, 'Tarde': pessoa}} (parcial se cancelada)
         """
         print("\n" + "="*80)
         print(f"GERANDO ESCALA: {data_inicio.strftime('%d/%m/%Y')} a {data_fim.strftime('%d/%m/%Y')}")
         print("="*80)
         
-        # Limpar escala anterior
-        self.escala = {}
-        self.contador_permanencias = defaultdict(int)
-        
-        # Obter permanências fixas
-        permanencias_fixas = self.gestor.obter_permanencias_fixas(data_inicio, data_fim)
-        
-        # Aplicar permanências fixas primeiro
-        for data_str, turno, pessoa_id, nome in permanencias_fixas:
-            if data_str not in self.escala:
-                self.escala[data_str] = {}
-            self.escala[data_str][turno] = nome
-            self.contador_permanencias[nome] += 1
-            print(f"✓ Permanência fixa: {data_str} - {turno} - {nome}")
-        
-        # Calcular total de dias
-        total_dias = (data_fim - data_inicio).days + 1
-        
-        # Iterar por cada dia
-        data_atual = data_inicio
-        while data_atual <= data_fim:
-            data_str = data_atual.strftime('%Y-%m-%d')
+        # Todas as consultas desta geração usam uma cópia em memória da base de
+        # dados, para não serem afetadas por alterações feitas a meio
+        self._bd = snapshot if snapshot is not None else self.gestor.criar_snapshot()
+        try:
+            # Limpar escala anterior
+            self.escala = {}
+            self._estatisticas = None
+            self.contador_permanencias = defaultdict(int)
+            self.cancelada = False
             
-            # Criar entrada se não existir
-            if data_str not in self.escala:
-                self.escala[data_str] = {}
+            # Obter permanências fixas
+            permanencias_fixas = self._bd.obter_permanencias_fixas(data_inicio, data_fim)
             
-            # Processar cada turno
-            for turno in ['Manhã', 'Tarde']:
-                # Verificar se já tem permanência fixa
-                if turno in self.escala[data_str]:
-                    continue
-                
-                # Obter pessoas disponíveis
-                disponiveis = self.obter_pessoas_disponiveis_dia(data_atual, turno)
+            # Aplicar permanências fixas primeiro
+            for data_str, turno, pessoa_id, nome in permanencias_fixas:
+                if data_str not in self.escala:
+                    self.escala[data_str] = {}
+                self.escala[data_str][turno] = nome
+                self.contador_permanencias[nome] += 1
+                print(f"✓ Permanência fixa: {data_str} - {turno} - {nome}")
+            
+            # Calcular total de dias
+            total_dias = (data_fim - data_inicio).days + 1
+            
+            # Iterar por cada dia
+            data_atual = data_inicio
+            while data_atual <= data_fim:
+                data_str = data_atual.strftime('%Y-%m-%d')
                 
-                if not disponiveis:
-                    print(f"⚠ {data_str} - {turno}: NENHUMA PESSOA DISPONÍVEL")
-                    self.escala[data_str][turno] = "SEM COBERTURA"
-                    continue
+                if cancelar is not None and cancelar():
+                    self.cancelada = True
+                    # Manter só os dias já processados (descarta permanências fixas futuras)
+                    self.escala = {d: turnos for d, turnos in self.escala.items() if d < data_str}
+                    print(f"\n⚠ Geração cancelada em {data_atual.strftime('%d/%m/%Y')}")
+                    break
                 
-                # Filtrar por restrições
-                candidatos = [p for p in disponiveis if self.verificar_restricoes(p, data_atual, turno)]
+                # Criar entrada se não existir
+                if data_str not in self.escala:
+                    self.escala[data_str] = {}
                 
-                if not candidatos:
-                    # Se ninguém passa restrições, usar quem está disponível
-                    candidatos = disponiveis
+                # Processar cada turno
+                for turno in ['Manhã', 'Tarde']:
+                    # Verificar se já tem permanência fixa
+                    if turno in self.escala[data_str]:
+                        continue
+                    
+                    # Obter pessoas disponíveis
+                    disponiveis = self.obter_pessoas_disponiveis_dia(data_atual, turno)
+                    
+                    if not disponiveis:
+                        print(f"⚠ {data_str} - {turno}: NENHUMA PESSOA DISPONÍVEL")
+                        self.escala[data_str][turno] = "SEM COBERTURA"
+                        continue
+                    
+                    # Filtrar por restrições
+                    candidatos = [p for p in disponiveis if self.verificar_restricoes(p, data_atual, turno)]
+                    
+                    if not candidatos:
+                        # Se ninguém passa restrições, usar quem está disponível
+                        candidatos = disponiveis
+                    
+                    # Ordenar por prioridade (quem tem menos permanências)
+                    candidatos_prioridade = sorted(
+                        candidatos,
+                        key=lambda p: self.calcular_prioridade(p, total_dias)
+                    )
+                    
+                    # Escolher pessoa com maior prioridade
+                    pessoa_escolhida = candidatos_prioridade[0]
+                    self.escala[data_str][turno] = pessoa_escolhida
+                    self.contador_permanencias[pessoa_escolhida] += 1
                 
-                # Ordenar por prioridade (quem tem menos permanências)
-                candidatos_prioridade = sorted(
-                    candidatos,
-                    key=lambda p: self.calcular_prioridade(p, total_dias)
-                )
+                data_atual += timedelta(days=1)
                 
-                # Escolher pessoa com maior prioridade
-                pessoa_escolhida = candidatos_prioridade[0]
-                self.escala[data_str][turno] = pessoa_escolhida
-                self.contador_permanencias[pessoa_escolhida] += 1
-            
-            data_atual += timedelta(days=1)
+                if ao_progresso is not None:
+                    ao_progresso((data_atual - data_inicio).days, total_dias)
+        finally:
+            if snapshot is None:
+                self._bd.fechar()
+            self._bd = self.gestor
+        
+        if self.cancelada:
+            return self.escala
         
         print("\n✓ Escala gerada com sucesso!")
         self._mostrar_estatisticas(total_dias)
         
         return self.escala
     
+    def estatisticas(self):
+        """
+        Retorna as estatísticas da escala atual (EstatisticasEscala)
+        
+        São calculadas uma vez por escala e reutilizadas pelo resumo, pelas
+        exportações e pela interface.
+        """
+        if self._estatisticas is None:
+            self._estatisticas = EstatisticasEscala(self.escala)
+        return self._estatisticas
+    
+    def comparar_objetivos(self):
+        """
+        Compara a percentagem de cada pessoa com os mínimos e máximos da base de dados
+        
+        Returns:
+            DataFrame de EstatisticasEscala.comparar_objetivos
+        """
+        objetivos = {
+            nome: (perc_min, perc_max)
+            for _, nome, ativo, _, perc_min, perc_max in self._bd.listar_pessoas()
+            if ativo and perc_min is not None
+        }
+        return self.estatisticas().comparar_objetivos(objetivos)
+    
     def _mostrar_estatisticas(self, total_dias):
         """
         Mostra estatísticas da escala gerada
@@ -245,78 +307,29 @@ class GeradorEscala:
         print(f"{'Pessoa':<25} {'Permanências':<15} {'Percentagem':<15}")
         print("-"*80)
         
-        for pessoa in sorted(self.contador_permanencias.keys()):
-            perm = self.contador_permanencias[pessoa]
-            perc = (perm / total_dias * 100) if total_dias > 0 else 0
+        for pessoa, perm, perc in self.estatisticas().resumo_pessoas():
             print(f"{pessoa:<25} {perm:<15} {perc:<14.1f}%")
         
         print("="*80)
+        
+        violacoes = self.estatisticas().verificar_regras()
+        if len(violacoes):
+            print(f"⚠ {len(violacoes)} violação(ões) das regras da escala:")
+            for regra, pessoa, data, detalhe in violacoes.head(20).itertuples(index=False):
+                print(f"  - {data.strftime('%d/%m/%Y')} {pessoa}: {regra} ({detalhe})")
     
     def exportar_para_excel(self, caminho_saida='escala_gerada.xlsx'):
         """
         Exporta escala gerada para Excel com estatísticas
+        (escrita sequencial, ver escala_exportar.exportar_escala_excel)
         """
         if not self.escala:
             print("✗ Nenhuma escala gerada ainda")
             return
         
         try:
-            # Criar DataFrame principal da escala
-            dados = []
-            
-            for data_str in sorted(self.escala.keys()):
-                data_obj = datetime.strptime(data_str, '%Y-%m-%d')
-                dia_semana = data_obj.strftime('%A')
-                
-                # Traduzir dia da semana para português
-                dias_pt = {
-                    'Monday': 'Segunda',
-                    'Tuesday': 'Terça',
-                    'Wednesday': 'Quarta',
-                    'Thursday': 'Quinta',
-                    'Friday': 'Sexta',
-                    'Saturday': 'Sábado',
-                    'Sunday': 'Domingo'
-                }
-                dia_semana_pt = dias_pt.get(dia_semana, dia_semana)
-                
-                manha = self.escala[data_str].get('Manhã', '')
-                tarde = self.escala[data_str].get('Tarde', '')
-                
-                dados.append({
-                    'Data': data_obj.strftime('%d/%m/%Y'),
-                    'Dia da Semana': dia_semana_pt,
-                    'Manhã': manha,
-                    'Tarde': tarde
-                })
-            
-            df_escala = pd.DataFrame(dados)
-            
-            # CALCULAR ESTATÍSTICAS
-            estatisticas = self._calcular_estatisticas_detalhadas()
-            
-            # Criar Excel writer
-            with pd.ExcelWriter(caminho_saida, engine='openpyxl') as writer:
-                # Escrever escala principal
-                df_escala.to_excel(writer, sheet_name='Escala', index=False)
-                
-                # Escrever estatísticas
-                estatisticas.to_excel(writer, sheet_name='Estatísticas', index=False)
-                
-                # Ajustar largura das colunas
-                for sheet_name in writer.sheets:
-                    worksheet = writer.sheets[sheet_name]
-                    for column in worksheet.columns:
-                        max_length = 0
-                        column_letter = column[0].column_letter
-                        for cell in column:
-                            try:
-                                if len(str(cell.value)) > max_length:
-                                    max_length = len(str(cell.value))
-                            except:
-                                pass
-                        adjusted_width = min(max_length + 2, 50)
-                        worksheet.column_dimensions[column_letter].width = adjusted_width
+            exportar_escala_excel(self.escala, caminho_saida,
+                                  estatisticas=self._calcular_estatisticas_detalhadas())
             
             print(f"\n✓ Escala exportada para: {caminho_saida}")
             print(f"✓ Estatísticas incluídas na aba 'Estatísticas'")
@@ -324,65 +337,53 @@ class GeradorEscala:
         except Exception as e:
             print(f"✗ Erro ao exportar para Excel: {e}")
 
+    def exportar(self, caminho_saida):
+        """
+        Exporta a escala no formato indicado pela extensão (.xlsx, .csv ou .jsonl)
+        """
+        if not self.escala:
+            print("✗ Nenhuma escala gerada ainda")
+            return
+        
+        try:
+            estatisticas = None
+            if caminho_saida.lower().endswith('.xlsx'):
+                estatisticas = self._calcular_estatisticas_detalhadas()
+            exportar_escala(self.escala, caminho_saida, estatisticas)
+            print(f"✓ Escala exportada para: {caminho_saida}")
+        except Exception as e:
+            print(f"✗ Erro ao exportar escala: {e}")
+    
+    def exportar_calendarios(self, pasta_saida='calendarios', horarios=None):
+        """
+        Exporta um calendário iCalendar (.ics) por pessoa
+        
+        Args:
+            pasta_saida: Pasta dos ficheiros
+            horarios: Dicionário {turno: (time início, time fim)}; sem horário,
+                as permanências são eventos de dia inteiro
+        
+        Returns:
+            Dicionário {pessoa: caminho do ficheiro} ou None em caso de erro
+        """
+        if not self.escala:
+            print("✗ Nenhuma escala gerada ainda")
+            return None
+        
+        try:
+            caminhos = exportar_calendarios_ical(self.escala, pasta_saida, horarios)
+        except Exception as e:
+            print(f"✗ Erro ao exportar calendários: {e}")
+            return None
+        
+        print(f"✓ {len(caminhos)} calendário(s) exportado(s) para: {pasta_saida}")
+        return caminhos
+    
     def _calcular_estatisticas_detalhadas(self):
         """
         Calcula estatísticas detalhadas por pessoa
         """
-        # Contar permanências por tipo
-        contador_manhas = defaultdict(int)
-        contador_tardes = defaultdict(int)
-        contador_total = defaultdict(int)
-        
-        for data_str, turnos in self.escala.items():
-            for turno, pessoa in turnos.items():
-                if pessoa and pessoa != "SEM COBERTURA":
-                    if turno == 'Manhã':
-                        contador_manhas[pessoa] += 1
-                    elif turno == 'Tarde':
-                        contador_tardes[pessoa] += 1
-                    contador_total[pessoa] += 1
-        
-        # Calcular totais
-        total_manhas = sum(contador_manhas.values())
-        total_tardes = sum(contador_tardes.values())
-        total_permanencias = total_manhas + total_tardes
-        
-        # Criar DataFrame de estatísticas
-        pessoas = sorted(set(list(contador_manhas.keys()) + list(contador_tardes.keys())))
-        dados_estatisticas = []
-        
-        for pessoa in pessoas:
-            manhas = contador_manhas[pessoa]
-            tardes = contador_tardes[pessoa]
-            total = contador_total[pessoa]
-            
-            # Calcular percentagens
-            perc_manhas = (manhas / total_manhas * 100) if total_manhas > 0 else 0
-            perc_tardes = (tardes / total_tardes * 100) if total_tardes > 0 else 0
-            perc_total = (total / total_permanencias * 100) if total_permanencias > 0 else 0
-            
-            dados_estatisticas.append({
-                'Pessoa': pessoa,
-                'Manhãs': manhas,
-                '% Manhãs': f"{perc_manhas:.1f}%",
-                'Tardes': tardes,
-                '% Tardes': f"{perc_tardes:.1f}%",
-                'Total': total,
-                '% Total': f"{perc_total:.1f}%"
-            })
-        
-        # Adicionar linha de totais
-        dados_estatisticas.append({
-            'Pessoa': 'TOTAL',
-            'Manhãs': total_manhas,
-            '% Manhãs': '100.0%',
-            'Tardes': total_tardes,
-            '% Tardes': '100.0%',
-            'Total': total_permanencias,
-            '% Total': '100.0%'
-        })
-        
-        return pd.DataFrame(dados_estatisticas)
+        return self.estatisticas().tabela_detalhada()
 
 
 # Exemplo de utilização
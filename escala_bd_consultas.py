@@ -1,17 +1,419 @@
+import random
 import sqlite3
-from datetime import datetime, timedelta
+import threading
+import time
+import unicodedata
+import weakref
+from contextlib import nullcontext
+from datetime import date, datetime, timedelta
+from escala_db_setup import migrar_base_dados
+from escala_instrumentacao import ConexaoInstrumentada
+
+
+def normalizar_nome(nome):
+    """
+    Normaliza um nome para comparação (sem acentos, maiúsculas ou pontuação)
+
+    Usado para detetar a mesma pessoa escrita de forma diferente,
+    por exemplo 'Patrícia S.' e 'Patricia S'
+    """
+    sem_acentos = unicodedata.normalize('NFKD', str(nome))
+    sem_acentos = ''.join(c for c in sem_acentos if not unicodedata.combining(c))
+    limpo = ''.join(c if c.isalnum() else ' ' for c in sem_acentos.casefold())
+    return ' '.join(limpo.split())
+
+
+TURNOS_PERMANENCIA = ('Manhã', 'Tarde')
+TURNOS_DISPONIBILIDADE = ('Manhã', 'Tarde', 'Ambos')
+
+
+def _erro_bloqueio(erro):
+    """Indica se um erro do SQLite se deve a outra conexão ter o lock da base de dados"""
+    mensagem = str(erro).lower()
+    return 'locked' in mensagem or 'busy' in mensagem
+
+
+class _ConexaoThread:
+    """
+    Conexão de uma thread, guardada no threading.local do gestor
+    
+    Quando a thread termina, o Python liberta o threading.local e com ele
+    este objeto: o weakref.finalize registado em _conectar fecha a conexão.
+    """
+    
+    __slots__ = ('geracao', 'conexao', 'data_version', '__weakref__')
+    
+    def __init__(self, geracao, conexao):
+        self.geracao = geracao
+        self.conexao = conexao
+        self.data_version = None  # Último PRAGMA data_version lido nesta conexão
+
 
 class GestorBaseDados:
     """
     Classe para gerir todas as operações com a base de dados
+    
+    Cada thread usa uma conexão persistente, aberta na primeira utilização
+    e configurada com os PRAGMAs abaixo. A conexão é fechada quando a thread
+    termina (ou antes, com fechar_conexao_thread()); as que restarem são
+    fechadas com fechar().
     """
     
-    def __init__(self, db_path='escala_permanencias.db'):
+    def __init__(self, db_path='escala_permanencias.db', journal_mode='WAL',
+                 busy_timeout_ms=5000, cache_size_kib=16384, mmap_size=256 * 1024 * 1024,
+                 migrar=True, max_tentativas=5, espera_inicial_s=0.05, espera_maxima_s=2.0,
+                 instrumentacao=None):
+        """
+        Args:
+            db_path: Caminho do ficheiro SQLite
+            journal_mode: Modo de journal ('WAL', 'DELETE', ...) ou None para
+                manter o do ficheiro. Numa pasta de rede usar 'DELETE',
+                porque o WAL exige memória partilhada entre processos.
+            busy_timeout_ms: Tempo de espera por um lock antes de falhar
+            cache_size_kib: Tamanho da cache de páginas por conexão (KiB)
+            mmap_size: Tamanho máximo do mapeamento em memória do ficheiro (bytes)
+            migrar: Se True, atualiza o esquema na primeira conexão
+                (ver escala_db_setup.migrar_base_dados)
+            max_tentativas: Número máximo de tentativas de uma escrita quando a
+                base de dados está bloqueada por outro processo
+            espera_inicial_s: Espera antes da segunda tentativa (duplica em cada tentativa)
+            espera_maxima_s: Espera máxima entre tentativas
+            instrumentacao: InstrumentacaoSQL que regista todas as consultas (opcional)
+        """
         self.db_path = db_path
+        self.journal_mode = journal_mode
+        self.busy_timeout_ms = busy_timeout_ms
+        self.cache_size_kib = cache_size_kib
+        self.mmap_size = mmap_size
+        self.max_tentativas = max(1, max_tentativas)
+        self.espera_inicial_s = espera_inicial_s
+        self.espera_maxima_s = espera_maxima_s
+        self.instrumentacao = instrumentacao
+        
+        # Métricas de contenção nas escritas (ver estatisticas_contencao)
+        self._metricas = {
+            'transacoes': 0,
+            'repeticoes': 0,
+            'falhas_bloqueio': 0,
+            'tempo_bloqueado_s': 0.0,
+            'maior_espera_s': 0.0,
+        }
+        
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._conexoes = []
+        self._geracao = 0  # Incrementada em fechar() para invalidar as conexões das threads
+        self._migrar = migrar
+        
+        # Cache de leituras (pessoas, turnos, percentagens), limpa em cada escrita
+        self._cache = {}
+        self.versao_local = 0  # Incrementada sempre que a cache é invalidada
+        
+        # Mapa bidirecional nome <-> id, atualizado nas inserções, renomeações e remoções
+        self._ids_por_nome = None
+        self._nomes_por_id = None
+        self._versao_mapa = 0  # Incrementada em cada alteração ou descarte do mapa
     
     def _conectar(self):
-        """Cria conexão à base de dados"""
-        return sqlite3.connect(self.db_path)
+        """Retorna a conexão da thread atual (criada na primeira utilização)"""
+        atual = getattr(self._local, 'conexao', None)
+        if atual is not None and atual.geracao == self._geracao:
+            return atual.conexao
+        
+        conn = self._nova_conexao(
+            self.db_path,
+            timeout=self.busy_timeout_ms / 1000,
+            isolation_level=None,  # Transações explícitas em _executar_escrita
+            check_same_thread=False
+        )
+        self._configurar_conexao(conn)
+        
+        with self._lock:
+            if self._migrar:
+                try:
+                    migrar_base_dados(conn)
+                except sqlite3.Error:
+                    conn.close()
+                    raise
+                self._migrar = False
+            self._conexoes.append(conn)
+            atual = _ConexaoThread(self._geracao, conn)
+            self._local.conexao = atual
+        
+        # Fechar a conexão quando a thread terminar (ex: threads de QThreadPool
+        # ou QThread), em vez de a manter aberta até fechar()
+        weakref.finalize(atual, self._descartar_conexao, conn)
+        return conn
+    
+    def _descartar_conexao(self, conn):
+        """Fecha uma conexão e retira-a da lista de conexões abertas"""
+        with self._lock:
+            try:
+                self._conexoes.remove(conn)
+            except ValueError:
+                return  # Já fechada por fechar()
+        
+        try:
+            conn.close()
+        except sqlite3.Error:
+            pass
+    
+    def fechar_conexao_thread(self):
+        """
+        Fecha a conexão da thread atual (ex: no fim de uma thread de trabalho)
+        
+        Uma nova utilização na mesma thread abre outra conexão.
+        """
+        atual = getattr(self._local, 'conexao', None)
+        if atual is not None:
+            del self._local.conexao
+            self._descartar_conexao(atual.conexao)
+    
+    def _nova_conexao(self, *args, **kwargs):
+        """Abre uma conexão sqlite3, instrumentada se houver InstrumentacaoSQL"""
+        if self.instrumentacao is None:
+            return sqlite3.connect(*args, **kwargs)
+        
+        conn = sqlite3.connect(*args, factory=ConexaoInstrumentada, **kwargs)
+        conn.ativar(self.instrumentacao)
+        return conn
+    
+    def medir(self, rotulo):
+        """
+        Context manager que associa as consultas feitas no bloco ao rótulo dado
+        
+        Sem instrumentação não faz nada, por isso pode ser usado sempre:
+        
+            with gestor.medir('gerar_escala'):
+                gerador.gerar_escala(inicio, fim)
+        """
+        if self.instrumentacao is None:
+            return nullcontext()
+        return self.instrumentacao.medir(rotulo)
+    
+    def _configurar_conexao(self, conn):
+        """Aplica os PRAGMAs de desempenho a uma conexão nova"""
+        conn.execute(f'PRAGMA busy_timeout = {int(self.busy_timeout_ms)}')
+        if self.journal_mode:
+            # Lê o cabeçalho do ficheiro: pode falhar se outro processo estiver a escrever
+            self._repetir_se_bloqueado(
+                lambda: conn.execute(f'PRAGMA journal_mode = {self.journal_mode}')
+            )
+        conn.execute('PRAGMA synchronous = NORMAL')
+        conn.execute(f'PRAGMA cache_size = {-int(self.cache_size_kib)}')
+        conn.execute(f'PRAGMA mmap_size = {int(self.mmap_size)}')
+        conn.execute('PRAGMA temp_store = MEMORY')
+        # As chaves estrangeiras do esquema só são verificadas com esta opção (por conexão)
+        conn.execute('PRAGMA foreign_keys = ON')
+    
+    def _repetir_se_bloqueado(self, funcao):
+        """
+        Executa funcao(), repetindo com espera exponencial se a base de dados estiver bloqueada
+        """
+        espera = self.espera_inicial_s
+        for tentativa in range(1, self.max_tentativas + 1):
+            try:
+                return funcao()
+            except sqlite3.OperationalError as e:
+                if not _erro_bloqueio(e) or tentativa == self.max_tentativas:
+                    raise
+            
+            time.sleep(random.uniform(0, espera))
+            espera = min(espera * 2, self.espera_maxima_s)
+    
+    def fechar(self):
+        """Fecha todas as conexões abertas (de todas as threads)"""
+        with self._lock:
+            conexoes, self._conexoes = self._conexoes, []
+            self._geracao += 1
+        
+        for conn in conexoes:
+            try:
+                conn.close()
+            except sqlite3.Error:
+                pass
+    
+    def criar_snapshot(self):
+        """
+        Copia a base de dados para memória e retorna um gestor só de leitura sobre a cópia
+        
+        A cópia é feita de uma só vez com a API de backup do SQLite, por isso
+        reflete um único estado consistente, mesmo que outra janela ou processo
+        esteja a escrever. Fechar o snapshot com fechar() liberta a memória.
+        """
+        return SnapshotBaseDados(self)
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, *exc):
+        self.fechar()
+    
+    def _executar_escrita(self, operacao):
+        """
+        Executa operacao(cursor) numa única transação
+        
+        A transação começa com BEGIN IMMEDIATE, que obtém logo o lock de
+        escrita: se outro processo estiver a escrever, o SQLite espera até
+        busy_timeout_ms e, se continuar bloqueado, a transação é repetida
+        (até max_tentativas, com espera exponencial). Por isso a operação
+        tem de poder ser executada mais do que uma vez.
+        
+        Faz commit se a operação terminar sem erros e rollback caso contrário.
+        
+        Returns:
+            O valor devolvido pela operação
+        """
+        conn = self._conectar()
+        cursor = conn.cursor()
+        espera = self.espera_inicial_s
+        bloqueado = 0.0  # Tempo à espera do lock de escrita (inclui as pausas entre tentativas)
+        
+        for tentativa in range(1, self.max_tentativas + 1):
+            inicio = time.perf_counter()
+            try:
+                try:
+                    cursor.execute('BEGIN IMMEDIATE')
+                finally:
+                    bloqueado += time.perf_counter() - inicio
+                resultado = operacao(cursor)
+                cursor.execute('COMMIT')
+                break
+            except sqlite3.OperationalError as e:
+                if conn.in_transaction:
+                    cursor.execute('ROLLBACK')
+                if not _erro_bloqueio(e) or tentativa == self.max_tentativas:
+                    if _erro_bloqueio(e):
+                        self._registar_contencao(tentativa - 1, bloqueado, falhou=True)
+                    raise
+            except BaseException:
+                if conn.in_transaction:
+                    cursor.execute('ROLLBACK')
+                raise
+            
+            # Espera aleatória até ao limite, para os processos não repetirem ao mesmo tempo
+            pausa = random.uniform(0, espera)
+            time.sleep(pausa)
+            bloqueado += pausa
+            espera = min(espera * 2, self.espera_maxima_s)
+        
+        self._registar_contencao(tentativa - 1, bloqueado)
+        self._invalidar_cache()
+        return resultado
+    
+    def _registar_contencao(self, repeticoes, tempo_bloqueado_s, falhou=False):
+        """Atualiza as métricas de contenção após uma transação de escrita"""
+        with self._lock:
+            metricas = self._metricas
+            metricas['transacoes'] += 1
+            metricas['repeticoes'] += repeticoes
+            metricas['falhas_bloqueio'] += int(falhou)
+            metricas['tempo_bloqueado_s'] += tempo_bloqueado_s
+            metricas['maior_espera_s'] = max(metricas['maior_espera_s'], tempo_bloqueado_s)
+    
+    def estatisticas_contencao(self, limpar=False):
+        """
+        Retorna as métricas de contenção nas escritas desde a criação (ou último limpar)
+        
+        Returns:
+            Dicionário com transacoes, repeticoes, falhas_bloqueio,
+            tempo_bloqueado_s e maior_espera_s
+        """
+        with self._lock:
+            metricas = dict(self._metricas)
+            if limpar:
+                for chave in self._metricas:
+                    self._metricas[chave] = type(self._metricas[chave])()
+        return metricas
+    
+    def _invalidar_cache(self):
+        """Limpa a cache de leituras"""
+        self._cache = {}
+        self.versao_local += 1
+    
+    def _verificar_data_version(self):
+        """
+        Verifica o PRAGMA data_version, que muda quando outra conexão (de outro
+        processo ou thread) escreve na base de dados, e invalida as caches se mudou
+        
+        Os valores só são comparáveis dentro da mesma conexão. As caches são
+        partilhadas entre threads, por isso na primeira verificação de uma
+        conexão nova também são invalidadas: podem ter sido preenchidas por
+        outra conexão antes de uma escrita que esta não tem como detetar.
+        """
+        conn = self._conectar()
+        atual = self._local.conexao
+        data_version = conn.execute('PRAGMA data_version').fetchone()[0]
+        if data_version != atual.data_version:
+            self._invalidar_cache()
+            self._descartar_mapa_pessoas()
+            atual.data_version = data_version
+    
+    def _em_cache(self, chave, carregar):
+        """
+        Retorna o valor em cache para a chave, carregando-o com carregar() se necessário
+        """
+        self._verificar_data_version()
+        
+        cache = self._cache
+        if chave not in cache:
+            cache[chave] = carregar()
+        return cache[chave]
+    
+    def _mapa_pessoas(self):
+        """
+        Retorna os dicionários (ids_por_nome, nomes_por_id), carregando-os se necessário
+        """
+        self._verificar_data_version()
+        
+        with self._lock:
+            ids_por_nome, nomes_por_id = self._ids_por_nome, self._nomes_por_id
+            versao = self._versao_mapa
+        
+        if ids_por_nome is None or nomes_por_id is None:
+            pessoas = self._conectar().execute('SELECT id, nome FROM pessoas').fetchall()
+            ids_por_nome = {nome: pid for pid, nome in pessoas}
+            nomes_por_id = {pid: nome for pid, nome in pessoas}
+            # Uma escrita durante a leitura pode não estar nos dados lidos: não publicar
+            with self._lock:
+                if self._versao_mapa == versao:
+                    self._ids_por_nome, self._nomes_por_id = ids_por_nome, nomes_por_id
+        
+        return ids_por_nome, nomes_por_id
+    
+    def _descartar_mapa_pessoas(self):
+        """Descarta o mapa nome <-> id, que é recarregado na próxima consulta"""
+        with self._lock:
+            self._ids_por_nome = self._nomes_por_id = None
+            self._versao_mapa += 1
+    
+    def _atualizar_mapa_pessoas(self, pessoa_id, nome):
+        """
+        Regista (ou remove, com nome=None) uma pessoa no mapa nome <-> id
+        """
+        with self._lock:
+            self._versao_mapa += 1
+            if self._ids_por_nome is None or self._nomes_por_id is None:
+                return
+            
+            nome_antigo = self._nomes_por_id.pop(pessoa_id, None)
+            if nome_antigo is not None:
+                self._ids_por_nome.pop(nome_antigo, None)
+            if nome is not None:
+                self._ids_por_nome[nome] = pessoa_id
+                self._nomes_por_id[pessoa_id] = nome
+    
+    def obter_id_pessoa(self, pessoa_nome):
+        """
+        Retorna o ID de uma pessoa pelo nome, ou None se não existir
+        """
+        return self._mapa_pessoas()[0].get(pessoa_nome)
+    
+    def obter_nome_pessoa(self, pessoa_id):
+        """
+        Retorna o nome de uma pessoa pelo ID, ou None se não existir
+        """
+        return self._mapa_pessoas()[1].get(pessoa_id)
     
     def obter_pessoas_por_turno(self, turno):
         """
@@ -23,22 +425,40 @@ class GestorBaseDados:
         Returns:
             Lista de tuplos (id, nome)
         """
-        conn = self._conectar()
-        cursor = conn.cursor()
-        
-        cursor.execute('''
+        return list(self._em_cache(('turno', turno), lambda: self._conectar().execute('''
             SELECT p.id, p.nome
             FROM pessoas p
             JOIN disponibilidade_turno dt ON p.id = dt.pessoa_id
             WHERE p.ativo = 1 
             AND (dt.turno = ? OR dt.turno = 'Ambos')
             ORDER BY p.nome
-        ''', (turno,))
+        ''', (turno,)).fetchall()))
+    
+    def obter_pessoas_ativas(self):
+        """
+        Retorna todas as pessoas ativas
         
-        pessoas = cursor.fetchall()
-        conn.close()
+        Returns:
+            Lista de tuplos (id, nome)
+        """
+        return list(self._em_cache('ativas', lambda: self._conectar().execute(
+            'SELECT id, nome FROM pessoas WHERE ativo = 1 ORDER BY nome'
+        ).fetchall()))
+    
+    def listar_pessoas(self):
+        """
+        Retorna todas as pessoas (ativas e inativas) com as suas configurações
         
-        return pessoas
+        Returns:
+            Lista de tuplos (id, nome, ativo, turno, percentagem_min, percentagem_max)
+        """
+        return list(self._em_cache('pessoas', lambda: self._conectar().execute('''
+            SELECT p.id, p.nome, p.ativo, dt.turno, cp.percentagem_min, cp.percentagem_max
+            FROM pessoas p
+            LEFT JOIN disponibilidade_turno dt ON p.id = dt.pessoa_id
+            LEFT JOIN configuracao_percentagens cp ON p.id = cp.pessoa_id
+            ORDER BY p.nome
+        ''').fetchall()))
     
     def obter_configuracao_pessoa(self, pessoa_id):
         """
@@ -47,19 +467,16 @@ class GestorBaseDados:
         Returns:
             Tuplo (percentagem_min, percentagem_max)
         """
-        conn = self._conectar()
-        cursor = conn.cursor()
-        
-        cursor.execute('''
-            SELECT percentagem_min, percentagem_max
-            FROM configuracao_percentagens
-            WHERE pessoa_id = ?
-        ''', (pessoa_id,))
-        
-        config = cursor.fetchone()
-        conn.close()
+        # Todas as configurações são carregadas de uma vez para a cache
+        configuracoes = self._em_cache('percentagens', lambda: {
+            pid: (perc_min, perc_max)
+            for pid, perc_min, perc_max in self._conectar().execute('''
+                SELECT pessoa_id, percentagem_min, percentagem_max
+                FROM configuracao_percentagens
+            ''')
+        })
         
-        return config if config else (10.0, 20.0)
+        return configuracoes.get(pessoa_id, (10.0, 20.0))
     
     def obter_permanencias_fixas(self, data_inicio, data_fim):
         """
@@ -68,21 +485,142 @@ class GestorBaseDados:
         Returns:
             Lista de tuplos (data, turno, pessoa_id, nome_pessoa)
         """
-        conn = self._conectar()
-        cursor = conn.cursor()
-        
-        cursor.execute('''
+        return self._conectar().execute('''
             SELECT pf.data, pf.turno, pf.pessoa_id, p.nome
             FROM permanencias_fixas pf
             JOIN pessoas p ON pf.pessoa_id = p.id
             WHERE pf.data BETWEEN ? AND ?
             ORDER BY pf.data, pf.turno
-        ''', (data_inicio.strftime('%Y-%m-%d'), data_fim.strftime('%Y-%m-%d')))
+        ''', (data_inicio.strftime('%Y-%m-%d'), data_fim.strftime('%Y-%m-%d'))).fetchall()
+    
+    @staticmethod
+    def _filtro_permanencias_fixas(data_inicio=None, data_fim=None, pessoa_id=None):
+        """
+        Condições WHERE (e parâmetros) dos filtros das permanências fixas
+        
+        O filtro por datas usa o índice UNIQUE(data, turno) e o filtro por
+        pessoa o índice idx_permanencias_fixas_pessoa(pessoa_id, data).
+        """
+        condicoes, parametros = [], []
+        if data_inicio is not None:
+            condicoes.append('pf.data >= ?')
+            parametros.append(data_inicio.strftime('%Y-%m-%d')
+                              if isinstance(data_inicio, (date, datetime)) else data_inicio)
+        if data_fim is not None:
+            condicoes.append('pf.data <= ?')
+            parametros.append(data_fim.strftime('%Y-%m-%d')
+                              if isinstance(data_fim, (date, datetime)) else data_fim)
+        if pessoa_id is not None:
+            condicoes.append('pf.pessoa_id = ?')
+            parametros.append(pessoa_id)
+        return condicoes, parametros
+    
+    def listar_permanencias_fixas(self, data_inicio=None, data_fim=None, pessoa_id=None,
+                                  limite=None, apos=None):
+        """
+        Retorna as permanências fixas, por ordem de data e turno
+        
+        Sem argumentos, retorna todas. Para paginar, passar o limite e, a partir
+        da segunda página, a chave (data, turno) da última linha da página
+        anterior em apos: cada página é lida pelo índice a partir dessa chave,
+        sem percorrer as páginas anteriores.
+        
+        Args:
+            data_inicio, data_fim: Período (inclusivo), opcionais
+            pessoa_id: Só as permanências desta pessoa (opcional)
+            limite: Número máximo de linhas (opcional)
+            apos: Chave (data, turno) a partir da qual começar (exclusiva)
+        
+        Returns:
+            Lista de tuplos (id, nome_pessoa, data, turno)
+        """
+        condicoes, parametros = self._filtro_permanencias_fixas(data_inicio, data_fim, pessoa_id)
+        if apos is not None:
+            condicoes.append('(pf.data, pf.turno) > (?, ?)')
+            parametros.extend(apos)
+        
+        sql = '''
+            SELECT pf.id, p.nome, pf.data, pf.turno 
+            FROM permanencias_fixas pf
+            JOIN pessoas p ON pf.pessoa_id = p.id
+        '''
+        if condicoes:
+            sql += ' WHERE ' + ' AND '.join(condicoes)
+        sql += ' ORDER BY pf.data, pf.turno'
+        if limite is not None:
+            sql += ' LIMIT ?'
+            parametros.append(limite)
+        
+        return self._conectar().execute(sql, parametros).fetchall()
+    
+    def contar_permanencias_fixas(self, data_inicio=None, data_fim=None, pessoa_id=None):
+        """
+        Retorna o número de permanências fixas que satisfazem os filtros
+        (os mesmos de listar_permanencias_fixas)
+        """
+        condicoes, parametros = self._filtro_permanencias_fixas(data_inicio, data_fim, pessoa_id)
+        sql = 'SELECT COUNT(*) FROM permanencias_fixas pf'
+        if condicoes:
+            sql += ' WHERE ' + ' AND '.join(condicoes)
+        return self._conectar().execute(sql, parametros).fetchone()[0]
+    
+    def existe_permanencia_fixa(self, data, turno):
+        """
+        Indica se já existe uma permanência fixa para a data e turno
+        """
+        if isinstance(data, datetime):
+            data = data.strftime('%Y-%m-%d')
+        
+        return self._conectar().execute(
+            'SELECT 1 FROM permanencias_fixas WHERE data = ? AND turno = ?', (data, turno)
+        ).fetchone() is not None
+    
+    @staticmethod
+    def _chaves_ocupadas(cursor, chaves):
+        """
+        Retorna as chaves (data, turno) dadas que já têm permanência fixa
         
-        fixas = cursor.fetchall()
-        conn.close()
+        Só as chaves pedidas são procuradas: são copiadas para uma tabela
+        temporária e juntadas a permanencias_fixas pelo índice UNIQUE(data, turno).
+        """
+        chaves = set(chaves)
+        if not chaves:
+            return set()
         
-        return fixas
+        cursor.execute('''
+            CREATE TEMP TABLE IF NOT EXISTS chaves_permanencias (data TEXT NOT NULL, turno TEXT NOT NULL)
+        ''')
+        cursor.execute('DELETE FROM temp.chaves_permanencias')
+        cursor.executemany('INSERT INTO temp.chaves_permanencias (data, turno) VALUES (?, ?)', chaves)
+        ocupadas = set(cursor.execute('''
+            SELECT pf.data, pf.turno
+            FROM temp.chaves_permanencias c
+            JOIN permanencias_fixas pf ON pf.data = c.data AND pf.turno = c.turno
+        ''').fetchall())
+        cursor.execute('DELETE FROM temp.chaves_permanencias')
+        return ocupadas
+    
+    def permanencias_fixas_existentes(self, chaves):
+        """
+        Indica quais das chaves (data, turno) já têm permanência fixa
+        
+        Args:
+            chaves: Iterável de (data 'YYYY-MM-DD', turno)
+        
+        Returns:
+            Conjunto das chaves já ocupadas
+        """
+        conn = self._conectar()
+        cursor = conn.cursor()
+        # A tabela temporária é privada da conexão: não bloqueia a base de dados
+        cursor.execute('BEGIN')
+        try:
+            ocupadas = self._chaves_ocupadas(cursor, chaves)
+        except BaseException:
+            cursor.execute('ROLLBACK')
+            raise
+        cursor.execute('COMMIT')
+        return ocupadas
     
     def adicionar_permanencia_fixa(self, pessoa_nome, data, turno):
         """
@@ -93,40 +631,56 @@ class GestorBaseDados:
             data: Data (datetime ou string 'YYYY-MM-DD')
             turno: 'Manhã' ou 'Tarde'
         """
+        # Obter ID da pessoa
+        pessoa_id = self.obter_id_pessoa(pessoa_nome)
+        
+        if pessoa_id is None:
+            print(f"✗ Pessoa '{pessoa_nome}' não encontrada")
+            return False
+        
+        return self.adicionar_permanencia_fixa_por_id(pessoa_id, data, turno)
+    
+    def adicionar_permanencia_fixa_por_id(self, pessoa_id, data, turno):
+        """
+        Adiciona uma permanência fixa a partir do ID da pessoa
+        
+        Args:
+            pessoa_id: ID da pessoa
+            data: Data (datetime ou string 'YYYY-MM-DD')
+            turno: 'Manhã' ou 'Tarde'
+        
+        Returns:
+            True se foi adicionada; False se a pessoa não existe, o turno é
+            inválido ou já existe uma permanência fixa nessa data e turno
+        """
         if isinstance(data, datetime):
             data = data.strftime('%Y-%m-%d')
         
-        conn = self._conectar()
-        cursor = conn.cursor()
+        pessoa_nome = self.obter_nome_pessoa(pessoa_id)
+        if pessoa_nome is None:
+            print(f"✗ Pessoa com ID {pessoa_id} não encontrada")
+            return False
         
         try:
-            # Obter ID da pessoa
-            cursor.execute('SELECT id FROM pessoas WHERE nome = ?', (pessoa_nome,))
-            resultado = cursor.fetchone()
-            
-            if not resultado:
-                print(f"✗ Pessoa '{pessoa_nome}' não encontrada")
-                conn.close()
-                return False
-            
-            pessoa_id = resultado[0]
-            
             # Inserir permanência fixa
-            cursor.execute('''
+            self._executar_escrita(lambda cursor: cursor.execute('''
                 INSERT INTO permanencias_fixas (pessoa_id, data, turno)
                 VALUES (?, ?, ?)
-            ''', (pessoa_id, data, turno))
+            ''', (pessoa_id, data, turno)))
             
-            conn.commit()
             print(f"✓ Permanência fixa adicionada: {pessoa_nome} - {data} - {turno}")
             return True
             
-        except sqlite3.IntegrityError:
-            print(f"✗ Já existe uma permanência fixa para {data} - {turno}")
+        except sqlite3.IntegrityError as e:
+            mensagem = str(e)
+            if 'UNIQUE' in mensagem:
+                print(f"✗ Já existe uma permanência fixa para {data} - {turno}")
+            elif 'FOREIGN KEY' in mensagem:
+                # O mapa em cache ainda tinha a pessoa, removida entretanto
+                print(f"✗ Pessoa com ID {pessoa_id} não encontrada")
+            else:
+                print(f"✗ Permanência fixa inválida ({data} - {turno}): {mensagem}")
             return False
-        
-        finally:
-            conn.close()
     
     def remover_permanencia_fixa(self, data, turno):
         """
@@ -135,17 +689,10 @@ class GestorBaseDados:
         if isinstance(data, datetime):
             data = data.strftime('%Y-%m-%d')
         
-        conn = self._conectar()
-        cursor = conn.cursor()
-        
-        cursor.execute('''
+        linhas_afetadas = self._executar_escrita(lambda cursor: cursor.execute('''
             DELETE FROM permanencias_fixas
             WHERE data = ? AND turno = ?
-        ''', (data, turno))
-        
-        linhas_afetadas = cursor.rowcount
-        conn.commit()
-        conn.close()
+        ''', (data, turno)).rowcount)
         
         if linhas_afetadas > 0:
             print(f"✓ Permanência fixa removida: {data} - {turno}")
@@ -154,6 +701,117 @@ class GestorBaseDados:
             print(f"✗ Nenhuma permanência fixa encontrada para {data} - {turno}")
             return False
     
+    def remover_permanencia_fixa_por_id(self, permanencia_id):
+        """
+        Remove uma permanência fixa pelo seu ID
+        
+        Returns:
+            True se foi removida
+        """
+        return self._executar_escrita(lambda cursor: cursor.execute(
+            'DELETE FROM permanencias_fixas WHERE id = ?', (permanencia_id,)
+        ).rowcount) > 0
+    
+    def _resolver_pessoa_id(self, pessoa):
+        """Retorna o ID de uma pessoa dada pelo ID ou pelo nome (None se não existir)"""
+        ids_por_nome, nomes_por_id = self._mapa_pessoas()
+        if isinstance(pessoa, int):
+            return pessoa if pessoa in nomes_por_id else None
+        return ids_por_nome.get(pessoa)
+    
+    def adicionar_permanencias_fixas(self, permanencias):
+        """
+        Adiciona várias permanências fixas numa única transação
+        
+        Args:
+            permanencias: Lista de (pessoa, data, turno), com a pessoa dada
+                pelo ID ou pelo nome e a data como date/datetime ou 'YYYY-MM-DD'
+        
+        Returns:
+            Lista de (pessoa, data, turno, estado), pela ordem recebida, com estado:
+            'adicionada', 'pessoa_inexistente', 'turno_invalido',
+            'ocupada' (já existe na base de dados) ou 'duplicada' (repetida no lote)
+        """
+        linhas = []
+        for pessoa, data, turno in permanencias:
+            if isinstance(data, (date, datetime)):
+                data = data.strftime('%Y-%m-%d')
+            linhas.append((pessoa, data, turno, self._resolver_pessoa_id(pessoa)))
+        
+        chaves = [(data, turno) for _, data, turno, pessoa_id in linhas
+                  if pessoa_id is not None and turno in TURNOS_PERMANENCIA]
+        
+        def operacao(cursor):
+            # Permanências já existentes com as chaves do lote, lidas dentro da transação
+            ocupadas = self._chaves_ocupadas(cursor, chaves)
+            
+            inseridas = set()
+            resultados = []
+            inserir = []
+            for pessoa, data, turno, pessoa_id in linhas:
+                if pessoa_id is None:
+                    estado = 'pessoa_inexistente'
+                elif turno not in TURNOS_PERMANENCIA:
+                    estado = 'turno_invalido'
+                elif (data, turno) in ocupadas:
+                    estado = 'duplicada' if (data, turno) in inseridas else 'ocupada'
+                else:
+                    estado = 'adicionada'
+                    ocupadas.add((data, turno))
+                    inseridas.add((data, turno))
+                    inserir.append((pessoa_id, data, turno))
+                resultados.append((pessoa, data, turno, estado))
+            
+            cursor.executemany('''
+                INSERT INTO permanencias_fixas (pessoa_id, data, turno)
+                VALUES (?, ?, ?)
+            ''', inserir)
+            return resultados
+        
+        resultados = self._executar_escrita(operacao)
+        
+        adicionadas = sum(1 for *_, estado in resultados if estado == 'adicionada')
+        rejeitadas = len(resultados) - adicionadas
+        print(f"✓ {adicionadas} permanência(s) fixa(s) adicionada(s)")
+        if rejeitadas:
+            print(f"⚠ {rejeitadas} permanência(s) fixa(s) rejeitada(s)")
+        
+        return resultados
+    
+    def remover_permanencias_fixas(self, chaves):
+        """
+        Remove várias permanências fixas numa única transação
+        
+        Args:
+            chaves: Lista de (data, turno)
+        
+        Returns:
+            Número de permanências removidas
+        """
+        parametros = [
+            (data.strftime('%Y-%m-%d') if isinstance(data, (date, datetime)) else data, turno)
+            for data, turno in chaves
+        ]
+        
+        removidas = self._executar_escrita(lambda cursor: cursor.executemany(
+            'DELETE FROM permanencias_fixas WHERE data = ? AND turno = ?', parametros
+        ).rowcount)
+        
+        print(f"✓ {removidas} permanência(s) fixa(s) removida(s)")
+        return removidas
+    
+    def remover_permanencias_fixas_por_id(self, permanencia_ids):
+        """
+        Remove várias permanências fixas pelos seus IDs numa única transação
+        
+        Returns:
+            Número de permanências removidas
+        """
+        return self._executar_escrita(lambda cursor: cursor.executemany(
+            'DELETE FROM permanencias_fixas WHERE id = ?',
+            [(permanencia_id,) for permanencia_id in permanencia_ids]
+        ).rowcount)
+    
     def atualizar_disponibilidade_turno(self, pessoa_nome, novo_turno):
         """
         Atualiza disponibilidade de turno de uma pessoa
@@ -162,78 +820,306 @@ class GestorBaseDados:
             pessoa_nome: Nome da pessoa
             novo_turno: 'Manhã', 'Tarde' ou 'Ambos'
         """
-        conn = self._conectar()
-        cursor = conn.cursor()
+        pessoa_id = self.obter_id_pessoa(pessoa_nome)
         
-        cursor.execute('SELECT id FROM pessoas WHERE nome = ?', (pessoa_nome,))
-        resultado = cursor.fetchone()
-        
-        if not resultado:
+        if pessoa_id is None:
             print(f"✗ Pessoa '{pessoa_nome}' não encontrada")
-            conn.close()
             return False
         
-        pessoa_id = resultado[0]
+        return self.atualizar_disponibilidade_turno_por_id(pessoa_id, novo_turno)
+    
+    def atualizar_disponibilidade_turno_por_id(self, pessoa_id, novo_turno):
+        """
+        Atualiza disponibilidade de turno de uma pessoa a partir do seu ID
         
-        cursor.execute('''
+        Returns:
+            False se a pessoa não tiver disponibilidade de turno registada
+        """
+        linhas_afetadas = self._executar_escrita(lambda cursor: cursor.execute('''
             UPDATE disponibilidade_turno
             SET turno = ?
             WHERE pessoa_id = ?
-        ''', (novo_turno, pessoa_id))
+        ''', (novo_turno, pessoa_id)).rowcount)
         
-        conn.commit()
-        conn.close()
+        if linhas_afetadas == 0:
+            return False
         
-        print(f"✓ {pessoa_nome} agora pode fazer: {novo_turno}")
+        print(f"✓ {self.obter_nome_pessoa(pessoa_id)} agora pode fazer: {novo_turno}")
         return True
     
     def atualizar_percentagens(self, pessoa_nome, perc_min, perc_max):
         """
         Atualiza percentagens de permanências de uma pessoa
         """
-        conn = self._conectar()
-        cursor = conn.cursor()
-        
-        cursor.execute('SELECT id FROM pessoas WHERE nome = ?', (pessoa_nome,))
-        resultado = cursor.fetchone()
+        pessoa_id = self.obter_id_pessoa(pessoa_nome)
         
-        if not resultado:
+        if pessoa_id is None:
             print(f"✗ Pessoa '{pessoa_nome}' não encontrada")
-            conn.close()
             return False
         
-        pessoa_id = resultado[0]
+        return self.atualizar_percentagens_por_id(pessoa_id, perc_min, perc_max)
+    
+    def atualizar_percentagens_por_id(self, pessoa_id, perc_min, perc_max):
+        """
+        Atualiza percentagens de permanências de uma pessoa a partir do seu ID
         
-        cursor.execute('''
+        Returns:
+            False se a pessoa não tiver configuração de percentagens registada
+        """
+        linhas_afetadas = self._executar_escrita(lambda cursor: cursor.execute('''
             UPDATE configuracao_percentagens
             SET percentagem_min = ?, percentagem_max = ?
             WHERE pessoa_id = ?
-        ''', (perc_min, perc_max, pessoa_id))
+        ''', (perc_min, perc_max, pessoa_id)).rowcount)
+        
+        if linhas_afetadas == 0:
+            return False
+        
+        print(f"✓ {self.obter_nome_pessoa(pessoa_id)}: Percentagens atualizadas para {perc_min}% - {perc_max}%")
+        return True
+    
+    def atualizar_configuracoes(self, configuracoes):
+        """
+        Atualiza o turno e/ou as percentagens de várias pessoas numa única transação
+        
+        Args:
+            configuracoes: Lista de (pessoa, turno, perc_min, perc_max), com a
+                pessoa dada pelo ID ou pelo nome; None mantém o valor atual
+        
+        Returns:
+            Lista de (pessoa, estado), pela ordem recebida, com estado:
+            'atualizada', 'pessoa_inexistente', 'turno_invalido' ou 'percentagens_invalidas'
+        """
+        resultados = []
+        turnos = []
+        percentagens = []
+        
+        for pessoa, turno, perc_min, perc_max in configuracoes:
+            pessoa_id = self._resolver_pessoa_id(pessoa)
+            
+            if pessoa_id is None:
+                estado = 'pessoa_inexistente'
+            elif turno is not None and turno not in TURNOS_DISPONIBILIDADE:
+                estado = 'turno_invalido'
+            elif perc_min is not None and perc_max is not None and perc_min > perc_max:
+                estado = 'percentagens_invalidas'
+            else:
+                estado = 'atualizada'
+                if turno is not None:
+                    turnos.append((turno, pessoa_id))
+                if perc_min is not None or perc_max is not None:
+                    percentagens.append((perc_min, perc_max, pessoa_id))
+            
+            resultados.append((pessoa, estado))
+        
+        def operacao(cursor):
+            cursor.executemany('''
+                UPDATE disponibilidade_turno
+                SET turno = ?
+                WHERE pessoa_id = ?
+            ''', turnos)
+            cursor.executemany('''
+                UPDATE configuracao_percentagens
+                SET percentagem_min = COALESCE(?, percentagem_min),
+                    percentagem_max = COALESCE(?, percentagem_max)
+                WHERE pessoa_id = ?
+            ''', percentagens)
         
-        conn.commit()
-        conn.close()
+        self._executar_escrita(operacao)
         
-        print(f"✓ {pessoa_nome}: Percentagens atualizadas para {perc_min}% - {perc_max}%")
+        atualizadas = sum(1 for _, estado in resultados if estado == 'atualizada')
+        print(f"✓ Configuração atualizada para {atualizadas} pessoa(s)")
+        if atualizadas < len(resultados):
+            print(f"⚠ {len(resultados) - atualizadas} atualização(ões) rejeitada(s)")
+        
+        return resultados
+    
+    def adicionar_pessoa(self, nome, turno='Ambos', perc_min=10.0, perc_max=20.0):
+        """
+        Adiciona uma pessoa com a sua disponibilidade de turno e percentagens
+        
+        Returns:
+            ID da pessoa criada, ou None se já existir uma pessoa com o mesmo nome
+        """
+        def operacao(cursor):
+            cursor.execute('INSERT INTO pessoas (nome, ativo) VALUES (?, 1)', (nome,))
+            pessoa_id = cursor.lastrowid
+            
+            cursor.execute('''
+                INSERT INTO disponibilidade_turno (pessoa_id, turno)
+                VALUES (?, ?)
+            ''', (pessoa_id, turno))
+            
+            cursor.execute('''
+                INSERT INTO configuracao_percentagens 
+                (pessoa_id, percentagem_min, percentagem_max)
+                VALUES (?, ?, ?)
+            ''', (pessoa_id, perc_min, perc_max))
+            
+            return pessoa_id
+        
+        try:
+            pessoa_id = self._executar_escrita(operacao)
+        except sqlite3.IntegrityError:
+            return None
+        
+        self._atualizar_mapa_pessoas(pessoa_id, nome)
+        return pessoa_id
+    
+    def atualizar_pessoa(self, pessoa_id, nome, turno, perc_min, perc_max):
+        """
+        Atualiza nome, disponibilidade de turno e percentagens de uma pessoa
+        
+        Returns:
+            False se já existir outra pessoa com o mesmo nome
+        """
+        def operacao(cursor):
+            cursor.execute('UPDATE pessoas SET nome = ? WHERE id = ?', (nome, pessoa_id))
+            
+            cursor.execute('''
+                UPDATE disponibilidade_turno SET turno = ? 
+                WHERE pessoa_id = ?
+            ''', (turno, pessoa_id))
+            
+            cursor.execute('''
+                UPDATE configuracao_percentagens 
+                SET percentagem_min = ?, percentagem_max = ?
+                WHERE pessoa_id = ?
+            ''', (perc_min, perc_max, pessoa_id))
+        
+        try:
+            self._executar_escrita(operacao)
+        except sqlite3.IntegrityError:
+            return False
+        
+        self._atualizar_mapa_pessoas(pessoa_id, nome)
         return True
     
+    def definir_ativo(self, pessoa_id, ativo):
+        """
+        Ativa ou desativa uma pessoa
+        """
+        self._executar_escrita(lambda cursor: cursor.execute(
+            'UPDATE pessoas SET ativo = ? WHERE id = ?', (1 if ativo else 0, pessoa_id)
+        ))
+    
+    def remover_pessoa(self, pessoa_id):
+        """
+        Remove uma pessoa com as suas configurações e permanências fixas
+        """
+        def operacao(cursor):
+            cursor.execute('DELETE FROM configuracao_percentagens WHERE pessoa_id = ?', (pessoa_id,))
+            cursor.execute('DELETE FROM disponibilidade_turno WHERE pessoa_id = ?', (pessoa_id,))
+            cursor.execute('DELETE FROM permanencias_fixas WHERE pessoa_id = ?', (pessoa_id,))
+            cursor.execute('DELETE FROM pessoas WHERE id = ?', (pessoa_id,))
+        
+        self._executar_escrita(operacao)
+        self._atualizar_mapa_pessoas(pessoa_id, None)
+
+    def sincronizar_pessoas(self, nomes, turno='Ambos', perc_min=10.0, perc_max=20.0,
+                            aplicar_renomeacoes=False):
+        """
+        Sincroniza uma lista de nomes (ex: colunas do Excel) com a tabela pessoas
+
+        A comparação é feita por conjuntos e as pessoas novas, os seus turnos
+        e as suas percentagens são inseridos com executemany numa única transação.
+
+        Args:
+            nomes: Iterável com os nomes das pessoas
+            turno: Turno por defeito das pessoas novas
+            perc_min: Percentagem mínima por defeito das pessoas novas
+            perc_max: Percentagem máxima por defeito das pessoas novas
+            aplicar_renomeacoes: Se True, renomeia na BD as pessoas cujo nome só
+                difere em acentos, maiúsculas ou pontuação; se False, esses nomes
+                são inseridos como pessoas novas (podem ser pessoas diferentes)
+
+        Returns:
+            Dicionário com as listas:
+                'adicionadas': pessoas novas inseridas
+                'renomeadas': tuplos (nome_bd, nome_novo) de possíveis renomeações
+                    (aplicadas só com aplicar_renomeacoes)
+                'desativadas': pessoas presentes nos nomes mas inativas na BD
+                'ausentes': pessoas ativas na BD que não constam dos nomes
+        """
+        nomes = {str(nome).strip() for nome in nomes if str(nome).strip()}
+
+        def operacao(cursor):
+            cursor.execute('SELECT nome, ativo FROM pessoas')
+            ativo_por_nome = dict(cursor.fetchall())
+
+            nomes_bd = set(ativo_por_nome)
+            novos = nomes - nomes_bd
+            em_falta = nomes_bd - nomes
+
+            # Nomes novos que correspondem a um nome da BD escrito de outra forma
+            em_falta_normalizados = {}
+            for nome_bd in em_falta:
+                em_falta_normalizados.setdefault(normalizar_nome(nome_bd), nome_bd)
+
+            renomeadas = []
+            for nome in sorted(novos):
+                nome_bd = em_falta_normalizados.pop(normalizar_nome(nome), None)
+                if nome_bd is not None:
+                    renomeadas.append((nome_bd, nome))
+
+            # Renomeações não confirmadas: o nome novo entra como pessoa nova,
+            # para nunca ficar sem linha em pessoas (e fora da escala)
+            if aplicar_renomeacoes:
+                adicionadas = sorted(novos - {nome for _, nome in renomeadas})
+                renomeadas_bd = {nome_bd for nome_bd, _ in renomeadas}
+            else:
+                adicionadas = sorted(novos)
+                renomeadas_bd = set()
+            desativadas = sorted(nome for nome in nomes & nomes_bd if not ativo_por_nome[nome])
+            ausentes = sorted(
+                nome for nome in em_falta - renomeadas_bd if ativo_por_nome[nome]
+            )
+
+            cursor.executemany('INSERT INTO pessoas (nome) VALUES (?)',
+                               [(nome,) for nome in adicionadas])
+            cursor.executemany('''
+                INSERT INTO disponibilidade_turno (pessoa_id, turno)
+                SELECT id, ? FROM pessoas WHERE nome = ?
+            ''', [(turno, nome) for nome in adicionadas])
+            cursor.executemany('''
+                INSERT INTO configuracao_percentagens
+                (pessoa_id, percentagem_min, percentagem_max)
+                SELECT id, ?, ? FROM pessoas WHERE nome = ?
+            ''', [(perc_min, perc_max, nome) for nome in adicionadas])
+
+            if aplicar_renomeacoes and renomeadas:
+                cursor.executemany(
+                    'UPDATE pessoas SET nome = ? WHERE nome = ?',
+                    [(nome_novo, nome_bd) for nome_bd, nome_novo in renomeadas]
+                )
+
+            return {
+                'adicionadas': adicionadas,
+                'renomeadas': renomeadas,
+                'desativadas': desativadas,
+                'ausentes': ausentes,
+            }
+
+        resultado = self._executar_escrita(operacao)
+        
+        # Inserções em massa: o mapa nome <-> id é recarregado na próxima consulta
+        if resultado['adicionadas'] or (aplicar_renomeacoes and resultado['renomeadas']):
+            self._descartar_mapa_pessoas()
+        
+        return resultado
+
     def listar_configuracoes(self):
         """
         Lista todas as configurações de pessoas
         """
-        conn = self._conectar()
-        cursor = conn.cursor()
-        
-        cursor.execute('''
+        configs = self._conectar().execute('''
             SELECT p.nome, dt.turno, cp.percentagem_min, cp.percentagem_max
             FROM pessoas p
             JOIN disponibilidade_turno dt ON p.id = dt.pessoa_id
             JOIN configuracao_percentagens cp ON p.id = cp.pessoa_id
             WHERE p.ativo = 1
             ORDER BY p.nome
-        ''')
-        
-        configs = cursor.fetchall()
-        conn.close()
+        ''').fetchall()
         
         print("\n" + "="*80)
         print("CONFIGURAÇÕES DE PESSOAS")
@@ -247,6 +1133,42 @@ class GestorBaseDados:
         print("="*80)
 
 
+class SnapshotBaseDados(GestorBaseDados):
+    """
+    Cópia em memória e só de leitura de uma base de dados (ver criar_snapshot)
+    
+    Todas as threads partilham a mesma conexão, porque cada conexão a
+    ':memory:' abriria uma base de dados vazia diferente.
+    """
+    
+    def __init__(self, origem):
+        super().__init__(':memory:', journal_mode=None, migrar=False,
+                         instrumentacao=origem.instrumentacao)
+        self.origem = origem.db_path
+        self.criado_em = datetime.now()
+        
+        conn = self._nova_conexao(':memory:', isolation_level=None, check_same_thread=False)
+        origem._conectar().backup(conn)
+        conn.execute('PRAGMA query_only = ON')
+        
+        self._conexoes.append(conn)
+        self._conexao = conn
+    
+    def _verificar_data_version(self):
+        """A cópia é só de leitura e privada: a cache nunca fica desatualizada"""
+    
+    def _conectar(self):
+        """Retorna a conexão partilhada à cópia em memória"""
+        if self._conexao is None:
+            raise sqlite3.ProgrammingError("Snapshot já foi fechado")
+        return self._conexao
+    
+    def fechar(self):
+        """Fecha a cópia em memória"""
+        super().fechar()
+        self._conexao = None
+
+
 # Exemplo de utilização
 if __name__ == "__main__":
     gestor = GestorBaseDados()
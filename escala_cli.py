@@ -0,0 +1,235 @@
+"""
+Geração de escalas pela linha de comandos, sem interface gráfica
+
+Não importa o PyQt5, por isso corre num servidor sem ecrã (ex: a partir do
+cron). Os módulos pesados (pandas, openpyxl) só são importados depois de
+validados os argumentos, e a base de dados e as folgas são lidas uma única
+vez para todos os períodos pedidos.
+
+Exemplos:
+    python escala_cli.py --mes 2025-10 --mes 2025-11 --formatos xlsx csv
+    python escala_cli.py --bd /dados/escala.db --folgas 'folgas/*.csv' \\
+        --periodo 2025-10-01:2025-12-31 --formatos jsonl ics --saida /dados/escalas
+"""
+
+import argparse
+import calendar
+import contextlib
+import os
+import sys
+import time
+from datetime import datetime
+
+
+FORMATOS = ('xlsx', 'csv', 'jsonl', 'ics')
+MOTORES = ('threads', 'processos')
+
+
+def _data(texto):
+    """Converte 'AAAA-MM-DD' em datetime (para o argparse)"""
+    try:
+        return datetime.strptime(texto, '%Y-%m-%d')
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"data inválida '{texto}' (usar AAAA-MM-DD)")
+
+
+def _periodo(texto):
+    """Converte 'AAAA-MM-DD:AAAA-MM-DD' em (início, fim)"""
+    inicio, separador, fim = texto.partition(':')
+    if not separador:
+        raise argparse.ArgumentTypeError(f"período inválido '{texto}' (usar INÍCIO:FIM)")
+    inicio, fim = _data(inicio), _data(fim)
+    if inicio > fim:
+        raise argparse.ArgumentTypeError(f"período inválido '{texto}' (início depois do fim)")
+    return inicio, fim
+
+
+def _mes(texto):
+    """Converte 'AAAA-MM' no período do primeiro ao último dia do mês"""
+    try:
+        inicio = datetime.strptime(texto, '%Y-%m')
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"mês inválido '{texto}' (usar AAAA-MM)")
+    ultimo_dia = calendar.monthrange(inicio.year, inicio.month)[1]
+    return inicio, inicio.replace(day=ultimo_dia)
+
+
+def _horario(texto):
+    """Converte 'Turno=HH:MM-HH:MM' em (turno, (time início, time fim))"""
+    turno, separador, horas = texto.partition('=')
+    inicio, _, fim = horas.partition('-')
+    try:
+        if not separador:
+            raise ValueError
+        return turno, (datetime.strptime(inicio, '%H:%M').time(),
+                       datetime.strptime(fim, '%H:%M').time())
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"horário inválido '{texto}' (usar Turno=HH:MM-HH:MM)")
+
+
+def criar_parser():
+    parser = argparse.ArgumentParser(
+        prog='escala_cli',
+        description='Gera escalas de permanências sem interface gráfica.',
+    )
+    parser.add_argument('--bd', default='escala_permanencias.db',
+                        help='base de dados SQLite (por omissão: %(default)s)')
+    parser.add_argument('--folgas', nargs='+', default=['escala_folgas.xlsx'],
+                        help='ficheiros de folgas (Excel, CSV ou Parquet) e/ou padrões glob; '
+                             'vários ficheiros são juntos numa só matriz (por omissão: %(default)s)')
+    parser.add_argument('--formato-folgas', choices=('auto', 'largo', 'longo'), default='auto',
+                        help='formato dos ficheiros de folgas (por omissão: %(default)s)')
+
+    periodos = parser.add_argument_group('períodos (podem repetir-se)')
+    periodos.add_argument('--periodo', type=_periodo, action='append', default=[],
+                          metavar='INÍCIO:FIM', help='período AAAA-MM-DD:AAAA-MM-DD')
+    periodos.add_argument('--mes', type=_mes, action='append', default=[],
+                          metavar='AAAA-MM', help='mês completo')
+
+    parser.add_argument('--formatos', nargs='+', choices=FORMATOS, default=['xlsx'],
+                        help='formatos de saída; ics cria um calendário por pessoa '
+                             '(por omissão: %(default)s)')
+    parser.add_argument('--saida', default='.',
+                        help='pasta onde são escritos os ficheiros (por omissão: a atual)')
+    parser.add_argument('--horario', type=_horario, action='append', default=[],
+                        metavar='TURNO=HH:MM-HH:MM',
+                        help='horário de um turno nos calendários .ics '
+                             '(sem horário, as permanências são eventos de dia inteiro)')
+
+    parser.add_argument('--motor', choices=MOTORES, default='threads',
+                        help='leitura de vários ficheiros de folgas em threads ou em processos '
+                             '(processos compensa com muitos Excel grandes; por omissão: %(default)s)')
+    parser.add_argument('--workers', type=int, default=None,
+                        help='número máximo de ficheiros lidos ou escritos em simultâneo '
+                             '(por omissão: número de CPUs)')
+    parser.add_argument('--journal-mode', default='WAL',
+                        help="modo de journal do SQLite; numa pasta de rede usar 'DELETE' "
+                             '(por omissão: %(default)s)')
+    parser.add_argument('-q', '--silencioso', action='store_true',
+                        help='não mostrar o detalhe da geração de cada dia')
+    return parser
+
+
+def nome_base(inicio, fim):
+    """Nome dos ficheiros de um período (ex: 'escala_2025-10-01_2025-10-31')"""
+    return f"escala_{inicio:%Y-%m-%d}_{fim:%Y-%m-%d}"
+
+
+def exportar_periodo(gerador, inicio, fim, formatos, pasta_saida, horarios=None, max_workers=None):
+    """
+    Exporta a escala gerada de um período em cada formato pedido
+
+    Returns:
+        Lista dos caminhos criados (ficheiros ou pastas de calendários), ou None em caso de erro
+    """
+    from escala_exportar import exportar_calendarios_ical, exportar_escala
+
+    base = os.path.join(pasta_saida, nome_base(inicio, fim))
+    criados = []
+
+    for formato in formatos:
+        try:
+            if formato == 'ics':
+                calendarios = exportar_calendarios_ical(gerador.escala, base + '_calendarios',
+                                                        horarios, max_workers)
+                criados.append(base + '_calendarios')
+                print(f"✓ {len(calendarios)} calendário(s) exportado(s) para {base}_calendarios")
+            else:
+                caminho = f"{base}.{formato}"
+                estatisticas = gerador.estatisticas().tabela_detalhada() if formato == 'xlsx' else None
+                exportar_escala(gerador.escala, caminho, estatisticas)
+                criados.append(caminho)
+                print(f"✓ Escala exportada para: {caminho}")
+        except Exception as e:
+            print(f"✗ Erro ao exportar {formato}: {e}")
+            return None
+
+    return criados
+
+
+def main(argv=None):
+    """
+    Gera e exporta a escala de cada período pedido
+
+    Returns:
+        Código de saída: 0 se todos os períodos foram gerados e exportados, 1 caso contrário
+    """
+    parser = criar_parser()
+    args = parser.parse_args(argv)
+
+    periodos = sorted(set(args.periodo + args.mes))
+    if not periodos:
+        parser.error('indicar pelo menos um --periodo ou --mes')
+    if not os.path.exists(args.bd):
+        print(f"✗ Erro: Base de dados '{args.bd}' não encontrada!")
+        return 1
+
+    # Só agora: --help e erros nos argumentos não pagam a importação do pandas
+    from escala_algoritmo import GeradorEscala
+    from escala_bd_consultas import GestorBaseDados
+    from escala_exportar import SEM_COBERTURA
+    from escala_fontes_folgas import ler_varias_folgas
+
+    inicio_total = time.perf_counter()
+    gestor = GestorBaseDados(args.bd, journal_mode=args.journal_mode)
+    # Ficheiros em formato longo (só ausências) cobrem todos os períodos e as pessoas ativas
+    matriz = ler_varias_folgas(args.folgas, formato=args.formato_folgas,
+                               max_workers=args.workers, usar_processos=args.motor == 'processos',
+                               data_inicio=periodos[0][0], data_fim=max(fim for _, fim in periodos),
+                               pessoas=[nome for _, nome in gestor.obter_pessoas_ativas()])
+    if matriz is None:
+        gestor.fechar()
+        return 1
+
+    os.makedirs(args.saida, exist_ok=True)
+    horarios = dict(args.horario)
+
+    # Uma só cópia da base de dados para todos os períodos: resultados consistentes entre si
+    snapshot = gestor.criar_snapshot()
+    gerador = GeradorEscala(gestor, matriz)
+    falhados = []
+
+    try:
+        for inicio, fim in periodos:
+            if inicio.date() < matriz.inicio or fim.date() > matriz.fim:
+                print(f"⚠ Período {inicio:%d/%m/%Y} a {fim:%d/%m/%Y} sai fora das folgas "
+                      f"({matriz.inicio:%d/%m/%Y} a {matriz.fim:%d/%m/%Y})")
+
+            inicio_periodo = time.perf_counter()
+            try:
+                with contextlib.ExitStack() as pilha:
+                    if args.silencioso:
+                        nulo = pilha.enter_context(open(os.devnull, 'w'))
+                        pilha.enter_context(contextlib.redirect_stdout(nulo))
+                    gerador.gerar_escala(inicio, fim, snapshot=snapshot)
+            except Exception as e:
+                print(f"✗ Erro ao gerar a escala de {inicio:%d/%m/%Y} a {fim:%d/%m/%Y}: {e}")
+                falhados.append((inicio, fim))
+                continue
+
+            sem_cobertura = sum(
+                1 for turnos in gerador.escala.values() for pessoa in turnos.values()
+                if pessoa == SEM_COBERTURA
+            )
+            print(f"✓ Escala de {inicio:%d/%m/%Y} a {fim:%d/%m/%Y} gerada em "
+                  f"{time.perf_counter() - inicio_periodo:.2f} s ({len(gerador.escala)} dias)")
+            if sem_cobertura:
+                print(f"⚠ {sem_cobertura} turno(s) sem cobertura")
+
+            if exportar_periodo(gerador, inicio, fim, args.formatos, args.saida,
+                                horarios, args.workers) is None:
+                falhados.append((inicio, fim))
+    finally:
+        snapshot.fechar()
+        gestor.fechar()
+
+    print(f"\n✓ {len(periodos) - len(falhados)}/{len(periodos)} período(s) em "
+          f"{time.perf_counter() - inicio_total:.2f} s")
+    for inicio, fim in falhados:
+        print(f"✗ Falhou: {inicio:%d/%m/%Y} a {fim:%d/%m/%Y}")
+
+    return 1 if falhados else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
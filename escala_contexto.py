@@ -0,0 +1,109 @@
+import os
+import sqlite3
+import threading
+from escala_algoritmo import GeradorEscala
+from escala_fontes_folgas import CacheFolgas
+
+
+class ContextoDados:
+    """
+    Dados usados pela geração e exportação de escalas, mantidos entre gerações
+
+    Guarda a MatrizDisponibilidade (via CacheFolgas), uma cópia em memória da
+    base de dados e o GeradorEscala. Em cada atualizar(), o ficheiro de folgas
+    só é relido se a data de modificação mudou e a cópia da base de dados só
+    é refeita se o PRAGMA data_version indicar escritas desde a última cópia.
+    """
+
+    def __init__(self, gestor_bd, caminho_folgas='escala_folgas.xlsx', **opcoes_folgas):
+        """
+        Args:
+            gestor_bd: GestorBaseDados
+            caminho_folgas: Ficheiro de folgas (Excel, CSV ou Parquet)
+            **opcoes_folgas: Opções da fonte de folgas (ver abrir_fonte)
+        """
+        self.gestor = gestor_bd
+        self.folgas = CacheFolgas(caminho_folgas, **opcoes_folgas)
+        self.snapshot = None
+        self.gerador = None
+
+        self._lock = threading.RLock()
+        self._conexao_versao = None
+        self._versao_snapshot = None
+
+    @property
+    def disponibilidade(self):
+        return self.folgas.matriz
+
+    def _data_version(self):
+        """
+        PRAGMA data_version numa conexão própria: muda sempre que outra conexão
+        (de qualquer thread ou processo, incluindo as do gestor) escreve na base
+        """
+        if self._conexao_versao is None:
+            self._conexao_versao = sqlite3.connect(self.gestor.db_path, check_same_thread=False)
+        return self._conexao_versao.execute('PRAGMA data_version').fetchone()[0]
+
+    def atualizar(self, data_inicio=None, data_fim=None):
+        """
+        Recarrega o que mudou desde a última chamada
+
+        Args:
+            data_inicio, data_fim: Período a gerar; um ficheiro de folgas em formato
+                longo (só ausências) cobre este período e todas as pessoas ativas
+
+        Returns:
+            Tuplo (datas_alteradas, bd_alterada): datas (date) cuja disponibilidade
+            mudou e se a cópia da base de dados foi refeita; None se o ficheiro de
+            folgas não existir
+        """
+        with self._lock:
+            if not os.path.exists(self.folgas.caminho):
+                print(f"✗ Erro: Ficheiro '{self.folgas.caminho}' não encontrado!")
+                return None
+
+            pessoas = [nome for _, nome in self.gestor.obter_pessoas_ativas()]
+            datas_alteradas = self.folgas.recarregar(data_inicio=data_inicio, data_fim=data_fim,
+                                                     pessoas=pessoas)
+            if datas_alteradas:
+                print(f"✓ Folgas atualizadas: {len(datas_alteradas)} dia(s) alterado(s)")
+
+            # A versão é lida antes da cópia: uma escrita entretanto só causa outra cópia
+            versao = self._data_version()
+            bd_alterada = self.snapshot is None or versao != self._versao_snapshot
+            if bd_alterada:
+                if self.snapshot is not None:
+                    self.snapshot.fechar()
+                self.snapshot = self.gestor.criar_snapshot()
+                self._versao_snapshot = versao
+
+            if self.gerador is None:
+                # A matriz é atualizada no lugar, por isso o gerador continua válido
+                self.gerador = GeradorEscala(self.gestor, self.folgas.matriz)
+
+            return datas_alteradas, bd_alterada
+
+    def gerar_escala(self, data_inicio, data_fim, ao_progresso=None, cancelar=None):
+        """
+        Atualiza os dados e gera a escala (ver GeradorEscala.gerar_escala)
+
+        Returns:
+            O GeradorEscala, ou None se o ficheiro de folgas não existir
+        """
+        with self._lock:
+            if self.atualizar(data_inicio, data_fim) is None:
+                return None
+
+            self.gerador.gerar_escala(data_inicio, data_fim, ao_progresso=ao_progresso,
+                                      cancelar=cancelar, snapshot=self.snapshot)
+            return self.gerador
+
+    def fechar(self):
+        """Fecha a cópia da base de dados e a conexão usada para verificar a versão"""
+        with self._lock:
+            if self.snapshot is not None:
+                self.snapshot.fechar()
+                self.snapshot = None
+            if self._conexao_versao is not None:
+                self._conexao_versao.close()
+                self._conexao_versao = None
@@ -1,25 +1,19 @@
 import sqlite3
 import os
 
-def criar_base_dados():
-    """
-    Cria a base de dados SQLite com todas as tabelas necessárias
-    """
-    # Conectar à base de dados (cria se não existir)
-    conn = sqlite3.connect('escala_permanencias.db')
-    cursor = conn.cursor()
-    
-    # Tabela: Pessoas
-    cursor.execute('''
+# Migrações do esquema, aplicadas por ordem e registadas em PRAGMA user_version.
+# Cada migração tem de ser idempotente, porque as bases de dados antigas
+# (user_version = 0) já podem ter as tabelas da versão 1.
+MIGRACOES = [
+    (1, "Tabelas base", [
+        '''
         CREATE TABLE IF NOT EXISTS pessoas (
             id INTEGER PRIMARY KEY AUTOINCREMENT,
             nome TEXT NOT NULL UNIQUE,
             ativo INTEGER DEFAULT 1
         )
-    ''')
-    
-    # Tabela: Disponibilidade por turno
-    cursor.execute('''
+        ''',
+        '''
         CREATE TABLE IF NOT EXISTS disponibilidade_turno (
             id INTEGER PRIMARY KEY AUTOINCREMENT,
             pessoa_id INTEGER NOT NULL,
@@ -27,10 +21,8 @@ def criar_base_dados():
             FOREIGN KEY (pessoa_id) REFERENCES pessoas(id),
             UNIQUE(pessoa_id)
         )
-    ''')
-    
-    # Tabela: Permanências fixas
-    cursor.execute('''
+        ''',
+        '''
         CREATE TABLE IF NOT EXISTS permanencias_fixas (
             id INTEGER PRIMARY KEY AUTOINCREMENT,
             pessoa_id INTEGER NOT NULL,
@@ -39,10 +31,8 @@ def criar_base_dados():
             FOREIGN KEY (pessoa_id) REFERENCES pessoas(id),
             UNIQUE(data, turno)
         )
-    ''')
-    
-    # Tabela: Configuração de percentagens por pessoa
-    cursor.execute('''
+        ''',
+        '''
         CREATE TABLE IF NOT EXISTS configuracao_percentagens (
             id INTEGER PRIMARY KEY AUTOINCREMENT,
             pessoa_id INTEGER NOT NULL,
@@ -51,13 +41,90 @@ def criar_base_dados():
             FOREIGN KEY (pessoa_id) REFERENCES pessoas(id),
             UNIQUE(pessoa_id)
         )
-    ''')
+        ''',
+    ]),
+    (2, "Índices para as consultas mais frequentes", [
+        # Remoção de uma pessoa e permanências fixas de uma pessoa num período
+        '''
+        CREATE INDEX IF NOT EXISTS idx_permanencias_fixas_pessoa
+        ON permanencias_fixas(pessoa_id, data)
+        ''',
+        # Pessoas por turno (obter_pessoas_por_turno)
+        '''
+        CREATE INDEX IF NOT EXISTS idx_disponibilidade_turno_turno
+        ON disponibilidade_turno(turno, pessoa_id)
+        ''',
+        # Pessoas ativas ordenadas por nome, sem ordenação temporária
+        '''
+        CREATE INDEX IF NOT EXISTS idx_pessoas_ativo_nome
+        ON pessoas(ativo, nome)
+        ''',
+        # Estatísticas para o planeador de consultas escolher os índices
+        'ANALYZE',
+    ]),
+]
+
+VERSAO_ESQUEMA = MIGRACOES[-1][0]
+
+
+def migrar_base_dados(conn, verbose=True):
+    """
+    Atualiza o esquema da base de dados para a versão mais recente
     
-    conn.commit()
-    conn.close()
+    Pode ser executada em cada arranque: se a base de dados já estiver na
+    versão atual, faz apenas uma leitura de PRAGMA user_version.
+    
+    Args:
+        conn: Conexão sqlite3 ou caminho do ficheiro
+        verbose: Se True, mostra as migrações aplicadas
+    
+    Returns:
+        Versão do esquema após a migração
+    """
+    if not isinstance(conn, sqlite3.Connection):
+        conn = sqlite3.connect(conn)
+        try:
+            return migrar_base_dados(conn, verbose)
+        finally:
+            conn.close()
+    
+    if conn.execute('PRAGMA user_version').fetchone()[0] >= VERSAO_ESQUEMA:
+        return VERSAO_ESQUEMA
+    
+    # BEGIN IMMEDIATE garante que só um processo aplica as migrações;
+    # a versão é relida já com o lock obtido
+    conn.execute('BEGIN IMMEDIATE')
+    try:
+        versao = conn.execute('PRAGMA user_version').fetchone()[0]
+        
+        for numero, descricao, instrucoes in MIGRACOES:
+            if numero <= versao:
+                continue
+            for sql in instrucoes:
+                conn.execute(sql)
+            conn.execute(f'PRAGMA user_version = {numero}')
+            versao = numero
+            if verbose:
+                print(f"✓ Migração {numero} aplicada: {descricao}")
+        
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    
+    return versao
+
+
+def criar_base_dados(db_path='escala_permanencias.db'):
+    """
+    Cria a base de dados SQLite com todas as tabelas necessárias,
+    ou atualiza o esquema de uma base de dados existente
+    """
+    # Conectar à base de dados (cria se não existir)
+    versao = migrar_base_dados(db_path)
     
     print("✓ Base de dados criada com sucesso!")
-    print("✓ Ficheiro: escala_permanencias.db")
+    print(f"✓ Ficheiro: {db_path} (esquema v{versao})")
     print("\nTabelas criadas:")
     print("  - pessoas")
     print("  - disponibilidade_turno")
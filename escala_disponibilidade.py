@@ -0,0 +1,556 @@
+import calendar
+import numpy as np
+import pandas as pd
+from datetime import datetime, date, timedelta
+
+# Códigos das categorias guardadas na matriz de disponibilidade
+DISPONIVEL = 0      # Célula vazia
+FOLGA = 1
+FERIAS = 2
+FORMACAO = 3
+INDISPONIVEL = 4
+OUTRO = 5           # Texto sem palavra de ausência (conta como disponível)
+SEM_DADOS = 6       # Data sem informação no ficheiro (conta como indisponível)
+
+CATEGORIAS = ('', 'FOLGA', 'FÉRIAS', 'FORMAÇÃO', 'INDISPONÍVEL', 'OUTRO', 'SEM DADOS')
+
+# Palavras-chave de ausência, pela ordem em que são verificadas
+PALAVRAS_AUSENCIA = (
+    (FOLGA, ('FOLGA',)),
+    (FERIAS, ('FÉRIAS', 'FERIAS')),
+    (FORMACAO, ('FORMAÇÃO', 'FORMACAO')),
+    (INDISPONIVEL, ('INDISPONÍVEL', 'INDISPONIVEL')),
+)
+
+COLUNAS_NAO_PESSOAS = ['Data', 'Dia da Semana']
+
+# Ordinal (date.toordinal) de 1970-01-01, para converter datetime64 em ordinais
+_ORDINAL_EPOCH = date(1970, 1, 1).toordinal()
+
+
+def converter_datas(valores):
+    """
+    Converte uma coluna de datas (ISO 'YYYY-MM-DD' ou 'DD/MM/YYYY') para datetime
+
+    Returns:
+        Series datetime64 normalizada (NaT nas datas inválidas)
+    """
+    serie = pd.Series(valores)
+
+    if pd.api.types.is_datetime64_any_dtype(serie):
+        return serie.dt.normalize()
+
+    datas = pd.to_datetime(serie, format='ISO8601', errors='coerce')
+
+    # Tentar formato português nas que falharam
+    em_falta = datas.isna() & serie.notna()
+    if em_falta.any():
+        datas = datas.fillna(
+            pd.to_datetime(serie.where(em_falta), format='%d/%m/%Y', errors='coerce')
+        )
+
+    return datas.dt.normalize()
+
+
+def classificar_valores(valores):
+    """
+    Classifica valores de células (FOLGA, FÉRIAS, ...) em códigos de categoria
+
+    Só os valores distintos são analisados, o resultado é depois
+    expandido para todas as células.
+
+    Args:
+        valores: Array (1D ou 2D) com o conteúdo das células
+
+    Returns:
+        Array int8 com a mesma forma e os códigos de categoria
+    """
+    valores = np.asarray(valores, dtype=object)
+    codigos, unicos = pd.factorize(valores.ravel(), use_na_sentinel=True)
+
+    texto = pd.Series(unicos, dtype=object).astype(str).str.upper().str.strip()
+    categorias_unicos = np.where(texto == '', DISPONIVEL, OUTRO).astype(np.int8)
+
+    # Percorrer por ordem inversa para que a primeira palavra encontrada prevaleça
+    for categoria, palavras in reversed(PALAVRAS_AUSENCIA):
+        contem = np.zeros(len(texto), dtype=bool)
+        for palavra in palavras:
+            contem |= texto.str.contains(palavra, regex=False).to_numpy(dtype=bool)
+        categorias_unicos[contem] = categoria
+
+    # Códigos -1 (NaN) correspondem a células vazias
+    resultado = np.append(categorias_unicos, np.int8(DISPONIVEL))[codigos]
+    return resultado.reshape(valores.shape)
+
+
+def _extrair_formato_largo(df):
+    """
+    Extrai datas, pessoas e valores de um DataFrame em formato largo
+
+    Linhas sem data válida são ignoradas e, em datas repetidas,
+    prevalece a primeira linha.
+
+    Returns:
+        Tuplo (ordinais das datas, lista de pessoas, array 2D de valores)
+    """
+    df = df.rename(columns={df.columns[0]: 'Data'})
+    datas = converter_datas(df['Data'])
+
+    valido = (datas.notna() & ~datas.duplicated()).to_numpy()
+    if not valido.any():
+        raise ValueError("O ficheiro de folgas não tem datas válidas")
+
+    pessoas = [col for col in df.columns if col not in COLUNAS_NAO_PESSOAS]
+
+    dias_epoch = datas[valido].to_numpy().astype('datetime64[D]').astype(np.int64)
+    ordinais = dias_epoch + _ORDINAL_EPOCH
+    valores = df.loc[valido, pessoas].to_numpy(dtype=object)
+
+    return ordinais, pessoas, valores
+
+
+# Multiplicador para misturar hashes de células antes de os somar
+_MISTURA = np.uint64(0x9E3779B97F4A7C15)
+
+
+def _calcular_hashes(ordinais, pessoas, valores):
+    """
+    Calcula hashes de conteúdo por linha (data) e por coluna (pessoa)
+
+    Os hashes não dependem da ordem das linhas nem das colunas.
+
+    Returns:
+        Tuplo ({ordinal: hash}, {pessoa: hash})
+    """
+    if not pessoas:
+        return {int(o): 0 for o in ordinais}, {}
+
+    celulas = pd.util.hash_array(valores.ravel()).reshape(valores.shape)
+    hash_pessoas = pd.util.hash_array(np.array(pessoas, dtype=object))
+    hash_datas = pd.util.hash_array(ordinais)
+
+    with np.errstate(over='ignore'):
+        linhas = ((celulas ^ hash_pessoas) * _MISTURA).sum(axis=1, dtype=np.uint64)
+        colunas = ((celulas ^ hash_datas[:, None]) * _MISTURA).sum(axis=0, dtype=np.uint64)
+
+    return (dict(zip(ordinais.tolist(), linhas.tolist())),
+            dict(zip(pessoas, colunas.tolist())))
+
+
+def _para_date(data):
+    """Converte datetime, date, Timestamp ou string 'YYYY-MM-DD' para date"""
+    if isinstance(data, datetime):
+        return data.date()
+    if isinstance(data, date):
+        return data
+    if isinstance(data, str):
+        return datetime.strptime(data, '%Y-%m-%d').date()
+    return pd.Timestamp(data).date()
+
+
+class MatrizDisponibilidade:
+    """
+    Estrutura compacta com a disponibilidade de cada pessoa em cada dia
+
+    As linhas são dias consecutivos a partir de `inicio` e as colunas são
+    pessoas. Cada célula guarda um código de categoria (int8).
+    """
+
+    def __init__(self, inicio, pessoas, categorias, preenchimento=SEM_DADOS):
+        """
+        Args:
+            inicio: Primeiro dia da matriz (date)
+            pessoas: Lista com os nomes das pessoas (colunas)
+            categorias: Array int8 (dias x pessoas) com os códigos de categoria
+            preenchimento: Categoria do que o ficheiro não regista nos dias da
+                matriz (DISPONIVEL no formato longo, que só lista ausências)
+        """
+        self.inicio = _para_date(inicio)
+        self.pessoas = list(pessoas)
+        self.categorias = np.asarray(categorias, dtype=np.int8)
+        self.preenchimento = preenchimento
+        self._indice_pessoa = {pessoa: i for i, pessoa in enumerate(self.pessoas)}
+        self._hash_linhas = {}
+        self._hash_colunas = {}
+        self._recalcular()
+
+    def _recalcular(self):
+        """Recalcula as estruturas derivadas da matriz de categorias"""
+        self._ordinal_inicio = self.inicio.toordinal()
+        self.disponivel = (self.categorias == DISPONIVEL) | (self.categorias == OUTRO)
+        self._pessoas_array = np.array(self.pessoas, dtype=object)
+        # Índice invertido por pessoa, construído na primeira consulta
+        self._dias_disponiveis = None
+        self._acumulado = None
+
+    def _construir_indice(self):
+        """
+        Constrói, para cada pessoa, o array ordenado dos dias disponíveis
+        (offsets a partir de `inicio`) e as contagens acumuladas por dia
+        """
+        self._dias_disponiveis = [
+            np.flatnonzero(self.disponivel[:, j]).astype(np.int32)
+            for j in range(len(self.pessoas))
+        ]
+        self._acumulado = np.zeros((self.numero_dias + 1, len(self.pessoas)), dtype=np.int32)
+        np.cumsum(self.disponivel, axis=0, dtype=np.int32, out=self._acumulado[1:])
+
+    @property
+    def numero_dias(self):
+        return self.categorias.shape[0]
+
+    @property
+    def fim(self):
+        return self.inicio + timedelta(days=self.numero_dias - 1)
+
+    def datas(self):
+        """Retorna DatetimeIndex com todos os dias da matriz"""
+        return pd.date_range(self.inicio, periods=self.numero_dias, freq='D')
+
+    def indice_dia(self, data):
+        """
+        Retorna a linha correspondente a uma data, ou None se estiver fora da matriz
+        """
+        indice = _para_date(data).toordinal() - self._ordinal_inicio
+        if 0 <= indice < self.numero_dias:
+            return indice
+        return None
+
+    def pessoas_disponiveis(self, data):
+        """
+        Retorna lista de pessoas disponíveis numa determinada data
+        (pela ordem das colunas do ficheiro)
+        """
+        indice = self.indice_dia(data)
+
+        if indice is None:
+            print(f"⚠ Data {_para_date(data).strftime('%d/%m/%Y')} não encontrada no ficheiro de folgas")
+            return []
+
+        return self._pessoas_array[self.disponivel[indice]].tolist()
+
+    def esta_disponivel(self, pessoa, data):
+        """Indica se a pessoa está disponível na data"""
+        indice = self.indice_dia(data)
+        coluna = self._indice_pessoa.get(pessoa)
+
+        if indice is None:
+            return False
+        if coluna is None:
+            return self.preenchimento in (DISPONIVEL, OUTRO)
+
+        return bool(self.disponivel[indice, coluna])
+
+    def categoria(self, pessoa, data):
+        """Retorna o nome da categoria (ex: 'FOLGA') de uma pessoa numa data"""
+        indice = self.indice_dia(data)
+        coluna = self._indice_pessoa.get(pessoa)
+
+        if indice is None:
+            return CATEGORIAS[SEM_DADOS]
+        if coluna is None:
+            return CATEGORIAS[self.preenchimento]
+
+        return CATEGORIAS[self.categorias[indice, coluna]]
+
+    def proximo_dia_disponivel(self, pessoa, data):
+        """
+        Retorna o primeiro dia, a partir da data (inclusive), em que a pessoa
+        está disponível, ou None se não houver nenhum na matriz (O(log n))
+        """
+        coluna = self._indice_pessoa.get(pessoa)
+        if coluna is None:
+            return None
+        if self._dias_disponiveis is None:
+            self._construir_indice()
+
+        dias = self._dias_disponiveis[coluna]
+        offset = max(_para_date(data).toordinal() - self._ordinal_inicio, 0)
+        posicao = np.searchsorted(dias, offset)
+
+        if posicao == len(dias):
+            return None
+        return date.fromordinal(self._ordinal_inicio + int(dias[posicao]))
+
+    def contar_dias_disponiveis(self, pessoa, data_inicio, data_fim):
+        """
+        Conta os dias em que a pessoa está disponível entre duas datas
+        (inclusive), em tempo constante
+        """
+        coluna = self._indice_pessoa.get(pessoa)
+        if coluna is None:
+            return 0
+        if self._acumulado is None:
+            self._construir_indice()
+
+        primeiro = max(_para_date(data_inicio).toordinal() - self._ordinal_inicio, 0)
+        ultimo = min(_para_date(data_fim).toordinal() - self._ordinal_inicio, self.numero_dias - 1)
+
+        if primeiro > ultimo:
+            return 0
+        return int(self._acumulado[ultimo + 1, coluna] - self._acumulado[primeiro, coluna])
+
+    def copia(self):
+        """
+        Retorna uma cópia independente da matriz, que não muda quando esta
+        é atualizada no lugar (ex: para ler noutra thread)
+        """
+        copia = type(self)(self.inicio, self.pessoas, self.categorias.copy(), self.preenchimento)
+        copia._hash_linhas, copia._hash_colunas = dict(self._hash_linhas), dict(self._hash_colunas)
+        return copia
+
+    @classmethod
+    def de_dataframe(cls, df):
+        """
+        Cria a matriz a partir do DataFrame em formato largo
+        (coluna 'Data', coluna opcional 'Dia da Semana' e uma coluna por pessoa)
+        """
+        ordinais, pessoas, valores = _extrair_formato_largo(df)
+
+        inicio = date.fromordinal(int(ordinais.min()))
+        numero_dias = int(ordinais.max() - ordinais.min()) + 1
+
+        # Dias que não aparecem no ficheiro ficam sem dados (ninguém disponível)
+        categorias = np.full((numero_dias, len(pessoas)), SEM_DADOS, dtype=np.int8)
+        categorias[ordinais - ordinais.min()] = classificar_valores(valores)
+
+        matriz = cls(inicio, pessoas, categorias)
+        matriz._hash_linhas, matriz._hash_colunas = _calcular_hashes(ordinais, pessoas, valores)
+        return matriz
+
+    @classmethod
+    def combinar(cls, matrizes, origens=None):
+        """
+        Junta várias matrizes (ex: um ficheiro por equipa ou por mês) numa só
+
+        A mesma pessoa na mesma data pode aparecer em mais do que uma matriz
+        desde que a categoria seja igual; caso contrário é um conflito. O que
+        uma matriz não regista (ex: dias sem ausências no formato longo) não
+        entra em conflito: só preenche, com a categoria de preenchimento dessa
+        matriz, as células que nenhuma outra regista. Os dias fora de todas as
+        matrizes ficam sem dados.
+
+        Args:
+            matrizes: Lista de MatrizDisponibilidade
+            origens: Lista com a origem de cada matriz (ex: caminho do ficheiro)
+
+        Returns:
+            Tuplo (MatrizDisponibilidade combinada, lista de conflitos), em que cada
+            conflito é (pessoa, data, origem_1, categoria_1, origem_2, categoria_2)
+        """
+        if not matrizes:
+            raise ValueError("Nenhuma matriz para combinar")
+        if origens is None:
+            origens = [str(i + 1) for i in range(len(matrizes))]
+
+        pessoas = list(dict.fromkeys(p for matriz in matrizes for p in matriz.pessoas))
+        indice_pessoa = {pessoa: j for j, pessoa in enumerate(pessoas)}
+
+        ordinal_inicio = min(m.inicio.toordinal() for m in matrizes)
+        numero_dias = max(m.fim.toordinal() for m in matrizes) - ordinal_inicio + 1
+
+        categorias = np.full((numero_dias, len(pessoas)), SEM_DADOS, dtype=np.int8)
+        origem = np.full(categorias.shape, -1, dtype=np.int16)
+        conflitos = []
+
+        for k, matriz in enumerate(matrizes):
+            primeira = matriz.inicio.toordinal() - ordinal_inicio
+            bloco = np.ix_(np.arange(primeira, primeira + matriz.numero_dias),
+                           [indice_pessoa[p] for p in matriz.pessoas])
+
+            atuais = categorias[bloco]
+            origens_atuais = origem[bloco]
+            com_dados = matriz.categorias != matriz.preenchimento
+
+            em_conflito = com_dados & (origens_atuais >= 0) & (atuais != matriz.categorias)
+            for i, j in zip(*np.nonzero(em_conflito)):
+                conflitos.append((
+                    matriz.pessoas[j],
+                    matriz.inicio + timedelta(days=int(i)),
+                    origens[origens_atuais[i, j]], CATEGORIAS[atuais[i, j]],
+                    origens[k], CATEGORIAS[matriz.categorias[i, j]],
+                ))
+
+            atuais[com_dados] = matriz.categorias[com_dados]
+            origens_atuais[com_dados] = k
+            categorias[bloco] = atuais
+            origem[bloco] = origens_atuais
+
+        # Preencher o período de cada matriz (todas as pessoas) onde nenhuma tem registo
+        for matriz in matrizes:
+            if matriz.preenchimento == SEM_DADOS:
+                continue
+            primeira = matriz.inicio.toordinal() - ordinal_inicio
+            linhas = categorias[primeira:primeira + matriz.numero_dias]
+            linhas[linhas == SEM_DADOS] = matriz.preenchimento
+
+        return cls(date.fromordinal(ordinal_inicio), pessoas, categorias), conflitos
+
+    def atualizar_de_dataframe(self, df):
+        """
+        Atualiza a matriz com uma nova versão do DataFrame em formato largo
+
+        Compara hashes por linha (data) e por coluna (pessoa) com os da versão
+        anterior e só reclassifica as células das linhas e colunas alteradas.
+
+        Returns:
+            Lista ordenada das datas (date) cuja disponibilidade mudou
+        """
+        ordinais, pessoas, valores = _extrair_formato_largo(df)
+        hash_linhas, hash_colunas = _calcular_hashes(ordinais, pessoas, valores)
+
+        ordinal_inicio = int(ordinais.min())
+        numero_dias = int(ordinais.max()) - ordinal_inicio + 1
+        posicoes = ordinais - ordinal_inicio
+
+        anteriores = self._alinhar(ordinal_inicio, numero_dias, pessoas)
+        categorias = np.full_like(anteriores, SEM_DADOS)
+        categorias[posicoes] = anteriores[posicoes]
+
+        colunas_alteradas = [
+            j for j, pessoa in enumerate(pessoas)
+            if self._hash_colunas.get(pessoa) != hash_colunas[pessoa]
+        ]
+
+        if set(pessoas) == set(self.pessoas):
+            linhas_alteradas = [
+                i for i, ordinal in enumerate(ordinais.tolist())
+                if self._hash_linhas.get(ordinal) != hash_linhas[ordinal]
+            ]
+        else:
+            # Com colunas diferentes os hashes de linha não são comparáveis
+            linhas_alteradas = list(range(len(ordinais)))
+
+        if colunas_alteradas and linhas_alteradas:
+            indices = np.ix_(linhas_alteradas, colunas_alteradas)
+            categorias[np.ix_(posicoes[linhas_alteradas], colunas_alteradas)] = \
+                classificar_valores(valores[indices])
+
+        datas_alteradas = self._datas_alteradas(ordinal_inicio, pessoas, anteriores, categorias)
+
+        self.inicio = date.fromordinal(ordinal_inicio)
+        self.pessoas = pessoas
+        self.categorias = categorias
+        self._indice_pessoa = {pessoa: i for i, pessoa in enumerate(pessoas)}
+        self._hash_linhas, self._hash_colunas = hash_linhas, hash_colunas
+        self._recalcular()
+
+        return datas_alteradas
+
+    def substituir(self, outra):
+        """
+        Substitui o conteúdo da matriz pelo de outra matriz
+
+        Returns:
+            Lista ordenada das datas (date) cuja disponibilidade mudou
+        """
+        ordinal_inicio = outra.inicio.toordinal()
+        anteriores = self._alinhar(ordinal_inicio, outra.numero_dias, outra.pessoas)
+        datas_alteradas = self._datas_alteradas(
+            ordinal_inicio, outra.pessoas, anteriores, outra.categorias
+        )
+
+        self.inicio = outra.inicio
+        self.pessoas = list(outra.pessoas)
+        self.categorias = outra.categorias
+        self.preenchimento = outra.preenchimento
+        self._indice_pessoa = dict(outra._indice_pessoa)
+        self._hash_linhas, self._hash_colunas = outra._hash_linhas, outra._hash_colunas
+        self._recalcular()
+
+        return datas_alteradas
+
+    def _alinhar(self, ordinal_inicio, numero_dias, pessoas):
+        """
+        Retorna as categorias atuais reordenadas para outro intervalo de datas
+        e outra lista de pessoas (SEM_DADOS onde não há informação)
+        """
+        alinhadas = np.full((numero_dias, len(pessoas)), SEM_DADOS, dtype=np.int8)
+
+        comuns = [(j, self._indice_pessoa[p]) for j, p in enumerate(pessoas) if p in self._indice_pessoa]
+        desvio = ordinal_inicio - self._ordinal_inicio
+        primeira = max(0, -desvio)
+        ultima = min(numero_dias, self.numero_dias - desvio)
+
+        if comuns and primeira < ultima:
+            novas, antigas = (list(indices) for indices in zip(*comuns))
+            alinhadas[primeira:ultima, novas] = \
+                self.categorias[primeira + desvio:ultima + desvio][:, antigas]
+
+        return alinhadas
+
+    def _datas_alteradas(self, ordinal_inicio, pessoas, anteriores, categorias):
+        """
+        Compara a matriz atual com as novas categorias (já alinhadas)
+        e retorna as datas em que a disponibilidade mudou
+        """
+        ordinais = set(
+            (np.flatnonzero((anteriores != categorias).any(axis=1)) + ordinal_inicio).tolist()
+        )
+
+        # Pessoas removidas e datas que deixaram de estar no intervalo
+        pessoas_novas = set(pessoas)
+        removidas = [i for i, p in enumerate(self.pessoas) if p not in pessoas_novas]
+        com_dados = self.categorias != SEM_DADOS
+        if removidas:
+            linhas = np.flatnonzero(com_dados[:, removidas].any(axis=1))
+            ordinais.update((linhas + self._ordinal_inicio).tolist())
+
+        fim = ordinal_inicio + categorias.shape[0]
+        linhas = np.flatnonzero(com_dados.any(axis=1)) + self._ordinal_inicio
+        ordinais.update(o for o in linhas.tolist() if o < ordinal_inicio or o >= fim)
+
+        return [date.fromordinal(o) for o in sorted(ordinais)]
+
+    @classmethod
+    def de_formato_longo(cls, df, coluna_data='Data', coluna_pessoa='Pessoa',
+                         coluna_categoria='Categoria', data_inicio=None, data_fim=None,
+                         pessoas=None):
+        """
+        Cria a matriz a partir de um DataFrame em formato longo
+        (uma linha por ausência: data, pessoa, categoria)
+
+        O ficheiro só lista ausências: todas as datas do período e todas as
+        pessoas sem registo ficam disponíveis.
+
+        Args:
+            df: DataFrame com uma linha por ausência
+            coluna_data, coluna_pessoa, coluna_categoria: Nomes das colunas
+            data_inicio, data_fim: Período a cobrir (por omissão, os meses completos
+                da primeira e da última ausência); é alargado se houver ausências
+                fora dele
+            pessoas: Nomes das pessoas a incluir mesmo sem ausências (ex: as
+                pessoas ativas da base de dados)
+        """
+        datas = converter_datas(df[coluna_data])
+
+        valido = (datas.notna() & df[coluna_pessoa].notna()).to_numpy()
+        if not valido.any() and (data_inicio is None or data_fim is None):
+            raise ValueError("O ficheiro de folgas não tem linhas válidas")
+
+        datas = datas[valido]
+        nomes = df.loc[valido, coluna_pessoa].astype(str).str.strip()
+        categorias_linhas = classificar_valores(df.loc[valido, coluna_categoria].to_numpy(dtype=object))
+
+        limites_inicio = [datas.min().date()] if len(datas) else []
+        limites_fim = [datas.max().date()] if len(datas) else []
+        if data_inicio is not None:
+            limites_inicio.append(_para_date(data_inicio))
+        else:
+            limites_inicio.append(limites_inicio[0].replace(day=1))
+        if data_fim is not None:
+            limites_fim.append(_para_date(data_fim))
+        else:
+            ultimo = limites_fim[0]
+            limites_fim.append(ultimo.replace(day=calendar.monthrange(ultimo.year, ultimo.month)[1]))
+        inicio, fim = min(limites_inicio), max(limites_fim)
+
+        pessoas = list(dict.fromkeys([*(pessoas or ()), *nomes]))
+        codigos_pessoa = pd.Index(pessoas).get_indexer(nomes)
+        offsets = (datas - pd.Timestamp(inicio)).dt.days.to_numpy()
+        numero_dias = (fim - inicio).days + 1
+
+        categorias = np.full((numero_dias, len(pessoas)), DISPONIVEL, dtype=np.int8)
+        categorias[offsets[::-1], codigos_pessoa[::-1]] = categorias_linhas[::-1]
+
+        return cls(inicio, pessoas, categorias, preenchimento=DISPONIVEL)
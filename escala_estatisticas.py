@@ -0,0 +1,308 @@
+import numpy as np
+import pandas as pd
+
+
+TURNOS = ('Manhã', 'Tarde')
+DIAS_SEMANA = ('Segunda', 'Terça', 'Quarta', 'Quinta', 'Sexta', 'Sábado', 'Domingo')
+SEM_COBERTURA = 'SEM COBERTURA'
+
+# Códigos da matriz da escala que não correspondem a uma pessoa
+VAZIO = -1
+DESCOBERTO = -2
+
+# Regras verificadas (as mesmas de GeradorEscala.verificar_restricoes)
+MAX_DIAS_CONSECUTIVOS = 2
+MAX_PERMANENCIAS_SEMANA = 3
+
+GRANULARIDADES = ('periodo', 'turno', 'dia_semana', 'semana', 'mes')
+
+
+def codificar_escala(escala):
+    """
+    Converte a escala para uma matriz de inteiros
+
+    Args:
+        escala: Dicionário {'YYYY-MM-DD': {'Manhã': pessoa, 'Tarde': pessoa}}
+
+    Returns:
+        Tuplo (dias, pessoas, codigos): dias é um array datetime64[D] contínuo
+        do primeiro ao último dia, pessoas a lista ordenada de nomes e codigos
+        uma matriz (dias x turnos) com o índice da pessoa, VAZIO ou DESCOBERTO
+    """
+    if not escala:
+        return np.array([], dtype='datetime64[D]'), [], np.empty((0, len(TURNOS)), dtype=np.int32)
+
+    datas = sorted(escala)
+    pessoas = sorted({
+        pessoa for turnos in escala.values() for pessoa in turnos.values()
+        if pessoa and pessoa != SEM_COBERTURA
+    })
+    indices = {pessoa: i for i, pessoa in enumerate(pessoas)}
+    indices[SEM_COBERTURA] = DESCOBERTO
+
+    inicio = np.datetime64(datas[0], 'D')
+    numero_dias = int((np.datetime64(datas[-1], 'D') - inicio).astype(int)) + 1
+    dias = inicio + np.arange(numero_dias)
+
+    codigos = np.full((numero_dias, len(TURNOS)), VAZIO, dtype=np.int32)
+    linhas = (np.array(datas, dtype='datetime64[D]') - inicio).astype(np.int64)
+    for coluna, turno in enumerate(TURNOS):
+        codigos[linhas, coluna] = [indices.get(escala[d].get(turno) or '', VAZIO) for d in datas]
+
+    return dias, pessoas, codigos
+
+
+def _semanas_iso(dias):
+    """Rótulo 'YYYY-Www' da semana ISO de cada dia"""
+    if len(dias) == 0:
+        return np.array([], dtype=str)
+    dia_semana = (dias.astype(np.int64) + 3) % 7           # 1970-01-01 foi quinta-feira
+    quinta = dias + (3 - dia_semana)                         # A quinta decide o ano ISO
+    ano = quinta.astype('datetime64[Y]')
+    semana = (quinta - ano.astype('datetime64[D]')).astype(np.int64) // 7 + 1
+    return np.char.add(np.char.add(ano.astype(str), '-W'), np.char.zfill(semana.astype(str), 2))
+
+
+class EstatisticasEscala:
+    """
+    Estatísticas de uma escala, calculadas de uma vez sobre a matriz de inteiros
+
+    tabela contém uma linha por (granularidade, grupo, pessoa, turno) com:
+      - permanencias: número de permanências
+      - percentagem: parte das permanências atribuídas nesse grupo e turno
+      - percentagem_dias: permanências / dias do grupo * 100 (a medida usada
+        nas percentagens mínima e máxima de cada pessoa)
+    As granularidades são 'periodo' (grupo 'total'), 'turno', 'dia_semana',
+    'semana' (ISO, 'YYYY-Www') e 'mes' ('YYYY-MM'); turno é 'Manhã', 'Tarde'
+    ou 'Total'.
+    """
+
+    def __init__(self, escala):
+        self.dias, self.pessoas, self.codigos = codificar_escala(escala)
+
+        # Dias que existem na escala (a matriz é contínua; pode haver intervalos)
+        self.na_escala = np.zeros(len(self.dias), dtype=bool)
+        if escala:
+            self.na_escala[(np.array(sorted(escala), dtype='datetime64[D]') - self.dias[0]).astype(np.int64)] = True
+
+        self.dia_semana = (self.dias.astype(np.int64) + 3) % 7
+        self.tabela = self._calcular_tabela()
+
+    # ----- Contagens -----
+
+    def _contar(self, grupos, rotulos):
+        """
+        Conta permanências por (grupo, pessoa, turno)
+
+        Args:
+            grupos: Índice do grupo de cada dia (array de inteiros)
+            rotulos: Rótulo de cada grupo
+
+        Returns:
+            DataFrame tidy (grupo, pessoa, turno, permanencias, percentagem, percentagem_dias)
+        """
+        numero_grupos = len(rotulos)
+        numero_pessoas = len(self.pessoas)
+
+        # contagens[grupo, pessoa, turno]
+        contagens = np.zeros((numero_grupos, max(numero_pessoas, 1), len(TURNOS)), dtype=np.int64)
+        for coluna in range(len(TURNOS)):
+            codigos = self.codigos[:, coluna]
+            validos = codigos >= 0
+            np.add.at(contagens, (grupos[validos], codigos[validos], coluna), 1)
+        contagens = contagens[:, :numero_pessoas]
+
+        total = contagens.sum(axis=2, keepdims=True)
+        contagens = np.concatenate([contagens, total], axis=2)
+
+        atribuidas = contagens.sum(axis=1, keepdims=True)
+        dias_grupo = np.bincount(grupos[self.na_escala], minlength=numero_grupos)
+
+        with np.errstate(divide='ignore', invalid='ignore'):
+            percentagem = np.where(atribuidas > 0, contagens / atribuidas * 100, 0.0)
+            percentagem_dias = np.where(dias_grupo[:, None, None] > 0,
+                                        contagens / dias_grupo[:, None, None] * 100, 0.0)
+
+        indice = pd.MultiIndex.from_product(
+            [list(rotulos), self.pessoas, list(TURNOS) + ['Total']],
+            names=['grupo', 'pessoa', 'turno']
+        )
+        return pd.DataFrame({
+            'permanencias': contagens.ravel(),
+            'percentagem': percentagem.ravel(),
+            'percentagem_dias': percentagem_dias.ravel(),
+        }, index=indice).reset_index()
+
+    def _calcular_tabela(self):
+        """Calcula a tabela tidy com todas as granularidades"""
+        numero_dias = len(self.dias)
+        partes = []
+
+        # Período completo
+        partes.append(('periodo', self._contar(np.zeros(numero_dias, dtype=np.int64), ['total'])))
+
+        # Dia da semana
+        partes.append(('dia_semana', self._contar(self.dia_semana, DIAS_SEMANA)))
+
+        # Semana ISO e mês
+        for granularidade, rotulos_dias in (('semana', _semanas_iso(self.dias)),
+                                            ('mes', self.dias.astype('datetime64[M]').astype(str))):
+            rotulos, grupos = np.unique(rotulos_dias, return_inverse=True)
+            partes.append((granularidade, self._contar(grupos.ravel(), rotulos.tolist())))
+
+        tabelas = []
+        for granularidade, tabela in partes:
+            tabela.insert(0, 'granularidade', granularidade)
+            tabelas.append(tabela)
+
+        # Por turno: as linhas por turno do período completo, com o turno como grupo
+        periodo = tabelas[0]
+        por_turno = periodo[periodo['turno'] != 'Total'].copy()
+        por_turno['granularidade'] = 'turno'
+        por_turno['grupo'] = por_turno['turno']
+        tabelas.insert(1, por_turno)
+
+        return pd.concat(tabelas, ignore_index=True)
+
+    def filtrar(self, granularidade, turno=None):
+        """Linhas da tabela de uma granularidade (e opcionalmente de um turno)"""
+        tabela = self.tabela[self.tabela['granularidade'] == granularidade]
+        if turno is not None:
+            tabela = tabela[tabela['turno'] == turno]
+        return tabela.reset_index(drop=True)
+
+    def contagens(self, granularidade, turno='Total'):
+        """
+        Permanências em formato largo: uma linha por pessoa, uma coluna por grupo
+        """
+        return self.filtrar(granularidade, turno).pivot(
+            index='pessoa', columns='grupo', values='permanencias'
+        )
+
+    # ----- Relatórios -----
+
+    def tabela_detalhada(self):
+        """
+        Manhãs, tardes e total por pessoa, com percentagens e linha de totais
+        (a tabela da aba 'Estatísticas' do Excel)
+        """
+        periodo = self.filtrar('periodo')
+        permanencias = periodo.pivot(index='pessoa', columns='turno', values='permanencias')
+        percentagens = periodo.pivot(index='pessoa', columns='turno', values='percentagem')
+        permanencias = permanencias.reindex(self.pessoas, fill_value=0)
+        percentagens = percentagens.reindex(self.pessoas, fill_value=0.0)
+
+        colunas = ['Pessoa', 'Manhãs', '% Manhãs', 'Tardes', '% Tardes', 'Total', '% Total']
+        turnos = (('Manhã', 'Manhãs'), ('Tarde', 'Tardes'), ('Total', 'Total'))
+
+        totais = {'Pessoa': 'TOTAL'}
+        for turno, coluna in turnos:
+            totais[coluna] = int(permanencias[turno].sum()) if self.pessoas else 0
+            totais[f"% {coluna}"] = '100.0%'
+        if not self.pessoas:
+            return pd.DataFrame([totais])[colunas]
+
+        tabela = pd.DataFrame({'Pessoa': self.pessoas})
+        for turno, coluna in turnos:
+            tabela[coluna] = permanencias[turno].to_numpy(dtype=np.int64)
+            tabela[f"% {coluna}"] = [f"{p:.1f}%" for p in percentagens[turno]]
+
+        return pd.concat([tabela, pd.DataFrame([totais])], ignore_index=True)[colunas]
+
+    def comparar_objetivos(self, objetivos):
+        """
+        Compara a percentagem de cada pessoa no período com os seus limites
+
+        Args:
+            objetivos: Dicionário {pessoa: (percentagem_min, percentagem_max)}
+
+        Returns:
+            DataFrame (pessoa, permanencias, percentagem_dias, percentagem_min,
+            percentagem_max, estado), com estado 'abaixo', 'dentro' ou 'acima'
+        """
+        periodo = self.filtrar('periodo', 'Total').set_index('pessoa')
+        pessoas = sorted(set(self.pessoas) | set(objetivos))
+
+        resultado = pd.DataFrame({'pessoa': pessoas})
+        resultado['permanencias'] = periodo['permanencias'].reindex(pessoas, fill_value=0).to_numpy()
+        resultado['percentagem_dias'] = periodo['percentagem_dias'].reindex(pessoas, fill_value=0.0).to_numpy()
+        resultado['percentagem_min'] = [objetivos.get(p, (np.nan, np.nan))[0] for p in pessoas]
+        resultado['percentagem_max'] = [objetivos.get(p, (np.nan, np.nan))[1] for p in pessoas]
+
+        abaixo = resultado['percentagem_dias'] < resultado['percentagem_min']
+        acima = resultado['percentagem_dias'] > resultado['percentagem_max']
+        resultado['estado'] = np.select([abaixo, acima], ['abaixo', 'acima'], 'dentro')
+        resultado.loc[resultado['percentagem_min'].isna(), 'estado'] = 'sem objetivo'
+
+        return resultado
+
+    def verificar_regras(self):
+        """
+        Verifica as regras da escala:
+        - no máximo MAX_DIAS_CONSECUTIVOS dias seguidos
+        - Tarde seguida de Manhã no dia seguinte
+        - no máximo MAX_PERMANENCIAS_SEMANA permanências por semana (segunda a domingo)
+        - dois turnos no mesmo dia
+
+        Returns:
+            DataFrame (regra, pessoa, data, detalhe), vazio se não houver violações
+        """
+        colunas = ['regra', 'pessoa', 'data', 'detalhe']
+        numero_dias, numero_pessoas = len(self.dias), len(self.pessoas)
+        if numero_dias == 0 or numero_pessoas == 0:
+            return pd.DataFrame(columns=colunas)
+
+        manha, tarde = self.codigos[:, 0], self.codigos[:, 1]
+        violacoes = []
+
+        # Presença por dia: presenca[dia, pessoa]
+        presenca = np.zeros((numero_dias, numero_pessoas), dtype=bool)
+        for codigos in (manha, tarde):
+            validos = codigos >= 0
+            presenca[np.nonzero(validos)[0], codigos[validos]] = True
+
+        # Dias consecutivos: dia em que a sequência ultrapassa o máximo
+        seguidos = np.ones((numero_dias - MAX_DIAS_CONSECUTIVOS, numero_pessoas), dtype=bool) \
+            if numero_dias > MAX_DIAS_CONSECUTIVOS else np.zeros((0, numero_pessoas), dtype=bool)
+        for deslocamento in range(MAX_DIAS_CONSECUTIVOS + 1):
+            seguidos &= presenca[deslocamento:numero_dias - MAX_DIAS_CONSECUTIVOS + deslocamento]
+        for dia, pessoa in zip(*np.nonzero(seguidos)):
+            violacoes.append(('dias consecutivos', self.pessoas[pessoa],
+                              self.dias[dia + MAX_DIAS_CONSECUTIVOS],
+                              f"mais de {MAX_DIAS_CONSECUTIVOS} dias seguidos"))
+
+        # Tarde seguida de Manhã
+        for dia in np.nonzero((tarde[:-1] >= 0) & (tarde[:-1] == manha[1:]))[0]:
+            violacoes.append(('tarde seguida de manhã', self.pessoas[tarde[dia]], self.dias[dia + 1],
+                              'manhã a seguir a uma tarde'))
+
+        # Dois turnos no mesmo dia
+        for dia in np.nonzero((manha >= 0) & (manha == tarde))[0]:
+            violacoes.append(('dois turnos no mesmo dia', self.pessoas[manha[dia]], self.dias[dia],
+                              'manhã e tarde'))
+
+        # Permanências por semana (segunda a domingo)
+        segundas = self.dias - self.dia_semana
+        semanas, grupos = np.unique(segundas, return_inverse=True)
+        por_semana = np.zeros((len(semanas), numero_pessoas), dtype=np.int64)
+        for codigos in (manha, tarde):
+            validos = codigos >= 0
+            np.add.at(por_semana, (grupos.ravel()[validos], codigos[validos]), 1)
+        for semana, pessoa in zip(*np.nonzero(por_semana > MAX_PERMANENCIAS_SEMANA)):
+            violacoes.append(('permanências por semana', self.pessoas[pessoa], semanas[semana],
+                              f"{por_semana[semana, pessoa]} permanências na semana"))
+
+        resultado = pd.DataFrame(violacoes, columns=colunas)
+        resultado['data'] = pd.to_datetime(resultado['data']).dt.date
+        return resultado.sort_values(['data', 'regra', 'pessoa'], ignore_index=True)
+
+    def resumo_pessoas(self):
+        """
+        Permanências e percentagem dos dias por pessoa no período
+
+        Returns:
+            Lista de (pessoa, permanencias, percentagem_dias)
+        """
+        periodo = self.filtrar('periodo', 'Total')
+        return list(zip(periodo['pessoa'], periodo['permanencias'].astype(int),
+                        periodo['percentagem_dias']))
@@ -0,0 +1,306 @@
+import csv
+import json
+import os
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime, timedelta, timezone
+from openpyxl import Workbook
+from openpyxl.cell import WriteOnlyCell
+from openpyxl.styles import Font
+from openpyxl.utils import get_column_letter
+from escala_bd_consultas import normalizar_nome
+
+
+DIAS_SEMANA = ('Segunda', 'Terça', 'Quarta', 'Quinta', 'Sexta', 'Sábado', 'Domingo')
+TURNOS = ('Manhã', 'Tarde')
+COLUNAS_ESCALA = ('Data', 'Dia da Semana') + TURNOS
+LARGURA_MAXIMA = 50
+
+# Campos dos formatos de texto (CSV e JSON Lines), com a data em ISO 8601
+CAMPOS_TEXTO = ('data', 'dia_semana', 'manha', 'tarde')
+SEM_COBERTURA = 'SEM COBERTURA'
+
+
+def _largura(textos):
+    """Largura de uma coluna para o texto mais comprido (com margem e limite)"""
+    return min(max(map(len, textos), default=0) + 2, LARGURA_MAXIMA)
+
+
+def _criar_folha(livro, titulo, cabecalho, larguras):
+    """
+    Cria uma folha em modo de escrita sequencial com o cabeçalho a negrito
+
+    As larguras têm de ser definidas antes da primeira linha: nesse modo as
+    colunas são escritas no início do ficheiro, antes dos dados.
+    """
+    folha = livro.create_sheet(titulo)
+    for coluna, largura in enumerate(larguras, start=1):
+        folha.column_dimensions[get_column_letter(coluna)].width = largura
+
+    negrito = Font(bold=True)
+    celulas = []
+    for texto in cabecalho:
+        celula = WriteOnlyCell(folha, value=texto)
+        celula.font = negrito
+        celulas.append(celula)
+    folha.append(celulas)
+
+    return folha
+
+
+def linhas_escala(escala):
+    """
+    Gera as linhas (data, dia da semana, manhã, tarde) da escala, por ordem de data
+
+    Args:
+        escala: Dicionário {'YYYY-MM-DD': {'Manhã': pessoa, 'Tarde': pessoa}}
+    """
+    for data_str in sorted(escala):
+        turnos = escala[data_str]
+        yield (
+            f"{data_str[8:10]}/{data_str[5:7]}/{data_str[0:4]}",
+            DIAS_SEMANA[date.fromisoformat(data_str).weekday()],
+            turnos.get('Manhã', ''),
+            turnos.get('Tarde', ''),
+        )
+
+
+def larguras_escala(escala):
+    """
+    Larguras das colunas da escala, calculadas a partir dos valores distintos
+    (as datas têm largura fixa e há poucas pessoas diferentes por turno)
+    """
+    larguras = [_largura(('Data', '00/00/0000')), _largura(('Dia da Semana',) + DIAS_SEMANA)]
+    for turno in TURNOS:
+        nomes = {turnos.get(turno, '') for turnos in escala.values()}
+        nomes.add(turno)
+        larguras.append(_largura(nomes))
+    return larguras
+
+
+def exportar_escala_excel(escala, caminho_saida, estatisticas=None):
+    """
+    Exporta a escala (e opcionalmente as estatísticas) para Excel
+
+    As linhas são escritas diretamente a partir do dicionário da escala, em
+    modo de escrita sequencial (sem guardar as células em memória).
+
+    Args:
+        escala: Dicionário {'YYYY-MM-DD': {'Manhã': pessoa, 'Tarde': pessoa}}
+        caminho_saida: Ficheiro .xlsx a criar
+        estatisticas: DataFrame escrito na aba 'Estatísticas' (opcional)
+    """
+    livro = Workbook(write_only=True)
+
+    folha = _criar_folha(livro, 'Escala', COLUNAS_ESCALA, larguras_escala(escala))
+    for linha in linhas_escala(escala):
+        folha.append(linha)
+
+    if estatisticas is not None:
+        cabecalho = [str(coluna) for coluna in estatisticas.columns]
+        larguras = [
+            _largura([titulo] + estatisticas[coluna].astype(str).tolist())
+            for titulo, coluna in zip(cabecalho, estatisticas.columns)
+        ]
+        folha = _criar_folha(livro, 'Estatísticas', cabecalho, larguras)
+        for linha in estatisticas.itertuples(index=False, name=None):
+            folha.append(linha)
+
+    livro.save(caminho_saida)
+
+
+def registos_escala(escala):
+    """
+    Gera os registos (data ISO, dia da semana, manhã, tarde) da escala, por ordem de data
+    """
+    for data_str in sorted(escala):
+        turnos = escala[data_str]
+        yield (
+            data_str,
+            DIAS_SEMANA[date.fromisoformat(data_str).weekday()],
+            turnos.get('Manhã', ''),
+            turnos.get('Tarde', ''),
+        )
+
+
+def exportar_escala_csv(escala, caminho_saida, separador=','):
+    """
+    Exporta a escala para CSV (UTF-8), uma linha por dia com os campos CAMPOS_TEXTO
+    """
+    with open(caminho_saida, 'w', newline='', encoding='utf-8') as f:
+        escritor = csv.writer(f, delimiter=separador)
+        escritor.writerow(CAMPOS_TEXTO)
+        escritor.writerows(registos_escala(escala))
+
+
+def exportar_escala_jsonl(escala, caminho_saida):
+    """
+    Exporta a escala para JSON Lines, um objeto por dia com os campos CAMPOS_TEXTO
+    """
+    with open(caminho_saida, 'w', encoding='utf-8') as f:
+        for registo in registos_escala(escala):
+            f.write(json.dumps(dict(zip(CAMPOS_TEXTO, registo)), ensure_ascii=False))
+            f.write('\n')
+
+
+# Exportadores por extensão do ficheiro (ver exportar_escala)
+EXPORTADORES = {
+    '.xlsx': exportar_escala_excel,
+    '.csv': exportar_escala_csv,
+    '.jsonl': exportar_escala_jsonl,
+}
+
+
+def exportar_escala(escala, caminho_saida, estatisticas=None):
+    """
+    Exporta a escala no formato indicado pela extensão (.xlsx, .csv ou .jsonl)
+
+    As estatísticas só são incluídas no Excel.
+    """
+    extensao = os.path.splitext(caminho_saida)[1].lower()
+    if extensao not in EXPORTADORES:
+        raise ValueError(f"Formato de exportação não suportado: '{extensao}' "
+                         f"(suportados: {', '.join(EXPORTADORES)})")
+
+    if extensao == '.xlsx':
+        exportar_escala_excel(escala, caminho_saida, estatisticas)
+    else:
+        EXPORTADORES[extensao](escala, caminho_saida)
+
+
+# ----- iCalendar -----
+
+def _texto_ical(texto):
+    """Escapa um valor de texto (RFC 5545)"""
+    return (str(texto).replace('\\', '\\\\').replace(';', '\\;')
+            .replace(',', '\\,').replace('\n', '\\n'))
+
+
+def _linha_ical(linha):
+    """Dobra a linha em segmentos de até 75 octetos, terminados em CRLF"""
+    codificada = linha.encode('utf-8')
+    if len(codificada) <= 75:
+        return linha + '\r\n'
+
+    partes = []
+    atual = ''
+    limite = 75
+    for caracter in linha:
+        if len((atual + caracter).encode('utf-8')) > limite:
+            partes.append(atual)
+            atual = ''
+            limite = 74  # As linhas de continuação começam por um espaço
+        atual += caracter
+    partes.append(atual)
+    return '\r\n '.join(partes) + '\r\n'
+
+
+def _nome_ficheiro(pessoa, usados):
+    """Nome de ficheiro seguro e único para uma pessoa (ex: 'Patrícia S.' -> 'patricia_s')"""
+    base = normalizar_nome(pessoa).replace(' ', '_') or 'pessoa'
+    nome = base
+    sufixo = 2
+    while nome in usados:
+        nome = f"{base}_{sufixo}"
+        sufixo += 1
+    usados.add(nome)
+    return nome
+
+
+def turnos_por_pessoa(escala):
+    """
+    Agrupa a escala por pessoa (sem os turnos SEM COBERTURA)
+
+    Returns:
+        Dicionário {pessoa: [(data ISO, turno), ...]} por ordem de data
+    """
+    turnos = defaultdict(list)
+    for data_str in sorted(escala):
+        for turno in TURNOS:
+            pessoa = escala[data_str].get(turno)
+            if pessoa and pessoa != SEM_COBERTURA:
+                turnos[pessoa].append((data_str, turno))
+    return turnos
+
+
+def escrever_calendario_ical(pessoa, turnos, caminho_saida, horarios=None, carimbo=None):
+    """
+    Escreve o calendário iCalendar (.ics) das permanências de uma pessoa
+
+    Args:
+        pessoa: Nome da pessoa
+        turnos: Lista de (data ISO, turno)
+        caminho_saida: Ficheiro .ics a criar
+        horarios: Dicionário {turno: (time início, time fim)}; sem horário,
+            cada permanência é um evento de dia inteiro
+        carimbo: DTSTAMP (texto UTC 'YYYYMMDDTHHMMSSZ'); por omissão, agora
+    """
+    horarios = horarios or {}
+    carimbo = carimbo or datetime.now(timezone.utc).strftime('%Y%m%dT%H%M%SZ')
+    id_pessoa = normalizar_nome(pessoa).replace(' ', '-')
+
+    with open(caminho_saida, 'w', encoding='utf-8', newline='') as f:
+        f.write(_linha_ical('BEGIN:VCALENDAR'))
+        f.write(_linha_ical('VERSION:2.0'))
+        f.write(_linha_ical('PRODID:-//Sistema de Gestao de Escalas//PT'))
+        f.write(_linha_ical('CALSCALE:GREGORIAN'))
+        f.write(_linha_ical(f'X-WR-CALNAME:{_texto_ical(f"Permanências - {pessoa}")}'))
+
+        for data_str, turno in turnos:
+            dia = date.fromisoformat(data_str)
+            f.write(_linha_ical('BEGIN:VEVENT'))
+            # UID estável: ao reimportar, os calendários atualizam os eventos em vez de os duplicar
+            f.write(_linha_ical(f'UID:{data_str}-{normalizar_nome(turno)}-{id_pessoa}@escala-permanencias'))
+            f.write(_linha_ical(f'DTSTAMP:{carimbo}'))
+
+            if turno in horarios:
+                inicio, fim = horarios[turno]
+                f.write(_linha_ical(f"DTSTART:{datetime.combine(dia, inicio):%Y%m%dT%H%M%S}"))
+                f.write(_linha_ical(f"DTEND:{datetime.combine(dia, fim):%Y%m%dT%H%M%S}"))
+            else:
+                f.write(_linha_ical(f"DTSTART;VALUE=DATE:{dia:%Y%m%d}"))
+                f.write(_linha_ical(f"DTEND;VALUE=DATE:{dia + timedelta(days=1):%Y%m%d}"))
+
+            f.write(_linha_ical(f'SUMMARY:{_texto_ical(f"Permanência ({turno})")}'))
+            f.write(_linha_ical('END:VEVENT'))
+
+        f.write(_linha_ical('END:VCALENDAR'))
+
+
+def exportar_calendarios_ical(escala, pasta_saida, horarios=None, max_workers=None):
+    """
+    Escreve um calendário .ics por pessoa, em paralelo
+
+    Args:
+        escala: Dicionário {'YYYY-MM-DD': {'Manhã': pessoa, 'Tarde': pessoa}}
+        pasta_saida: Pasta onde são criados os ficheiros (criada se não existir)
+        horarios: Dicionário {turno: (time início, time fim)} (opcional)
+        max_workers: Número máximo de ficheiros escritos em simultâneo
+
+    Returns:
+        Dicionário {pessoa: caminho do ficheiro}
+    """
+    os.makedirs(pasta_saida, exist_ok=True)
+
+    por_pessoa = turnos_por_pessoa(escala)
+    usados = set()
+    caminhos = {
+        pessoa: os.path.join(pasta_saida, f"{_nome_ficheiro(pessoa, usados)}.ics")
+        for pessoa in sorted(por_pessoa)
+    }
+    if not caminhos:
+        return caminhos
+
+    carimbo = datetime.now(timezone.utc).strftime('%Y%m%dT%H%M%SZ')
+    max_workers = max_workers or min(len(caminhos), os.cpu_count() or 1)
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futuros = [
+            executor.submit(escrever_calendario_ical, pessoa, por_pessoa[pessoa],
+                            caminho, horarios, carimbo)
+            for pessoa, caminho in caminhos.items()
+        ]
+        for futuro in futuros:
+            futuro.result()
+
+    return caminhos
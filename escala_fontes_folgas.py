@@ -0,0 +1,363 @@
+import csv
+import glob
+import os
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, as_completed
+import pandas as pd
+from escala_bd_consultas import normalizar_nome
+from escala_disponibilidade import MatrizDisponibilidade
+
+
+# Fontes registadas por extensão do ficheiro
+FONTES = {}
+
+
+def registar_fonte(classe_fonte):
+    """
+    Regista uma classe de fonte para as extensões que declara
+    """
+    for extensao in classe_fonte.extensoes:
+        FONTES[extensao.lower()] = classe_fonte
+    return classe_fonte
+
+
+class FonteFolgas:
+    """
+    Interface base para fontes de folgas/férias/formação/indisponibilidades
+
+    Cada fonte lê um ficheiro para um DataFrame, em formato largo
+    (Data, Dia da Semana, uma coluna por pessoa) ou em formato longo
+    (Data, Pessoa, Categoria), e converte-o para MatrizDisponibilidade.
+    """
+
+    extensoes = ()
+
+    def __init__(self, caminho, formato='auto'):
+        """
+        Args:
+            caminho: Caminho do ficheiro
+            formato: 'largo', 'longo' ou 'auto' (deteta pelas colunas)
+        """
+        self.caminho = caminho
+        self.formato = formato
+
+    def ler_dataframe(self):
+        """Lê o ficheiro para um DataFrame (implementado por cada fonte)"""
+        raise NotImplementedError
+
+    def ler(self, data_inicio=None, data_fim=None, pessoas=None):
+        """
+        Lê o ficheiro e retorna a MatrizDisponibilidade correspondente
+        (ver ler_de)
+        """
+        return self.ler_de(self.ler_dataframe(), data_inicio, data_fim, pessoas)
+
+    def ler_de(self, df, data_inicio=None, data_fim=None, pessoas=None):
+        """
+        Converte um DataFrame lido desta fonte para MatrizDisponibilidade
+
+        Args:
+            df: DataFrame lido pela fonte
+            data_inicio, data_fim: Período a cobrir no formato longo, que só lista
+                ausências (no formato largo o período é o das linhas do ficheiro)
+            pessoas: Pessoas disponíveis sem registo no formato longo
+        """
+        colunas_longo = detetar_formato_longo(df)
+
+        if self.formato == 'longo' or (self.formato == 'auto' and colunas_longo):
+            if not colunas_longo:
+                raise ValueError("Formato longo requer as colunas Data, Pessoa e Categoria")
+            return MatrizDisponibilidade.de_formato_longo(
+                df, *colunas_longo, data_inicio=data_inicio, data_fim=data_fim, pessoas=pessoas
+            )
+
+        return MatrizDisponibilidade.de_dataframe(df)
+
+
+@registar_fonte
+class FonteExcel(FonteFolgas):
+    """Fonte de folgas em Excel (.xlsx)"""
+
+    extensoes = ('.xlsx', '.xlsm')
+
+    def ler_dataframe(self):
+        return pd.read_excel(self.caminho)
+
+
+@registar_fonte
+class FonteCSV(FonteFolgas):
+    """Fonte de folgas em CSV (separador ',' ou ';' detetado automaticamente)"""
+
+    extensoes = ('.csv', '.txt')
+
+    def __init__(self, caminho, formato='auto', separador=None, encoding='utf-8-sig'):
+        super().__init__(caminho, formato)
+        self.separador = separador
+        self.encoding = encoding
+
+    def _detetar_separador(self):
+        with open(self.caminho, encoding=self.encoding, newline='') as f:
+            amostra = f.read(4096)
+        try:
+            return csv.Sniffer().sniff(amostra, delimiters=',;\t').delimiter
+        except csv.Error:
+            return ','
+
+    def ler_dataframe(self):
+        separador = self.separador or self._detetar_separador()
+        return pd.read_csv(self.caminho, sep=separador, encoding=self.encoding,
+                           dtype=str, keep_default_na=False, na_values=[''])
+
+
+@registar_fonte
+class FonteParquet(FonteFolgas):
+    """Fonte de folgas em Parquet (requer pyarrow ou fastparquet)"""
+
+    extensoes = ('.parquet', '.pq')
+
+    def ler_dataframe(self):
+        try:
+            return pd.read_parquet(self.caminho)
+        except ImportError as e:
+            raise ImportError(
+                "Leitura de Parquet requer o pacote 'pyarrow' (pip install pyarrow)"
+            ) from e
+
+
+def detetar_formato_longo(df):
+    """
+    Verifica se o DataFrame está em formato longo
+
+    Returns:
+        Tuplo (coluna_data, coluna_pessoa, coluna_categoria) ou None
+    """
+    colunas = {normalizar_nome(col): col for col in df.columns}
+    nomes = ('data', 'pessoa', 'categoria')
+
+    if all(nome in colunas for nome in nomes):
+        return tuple(colunas[nome] for nome in nomes)
+    return None
+
+
+def abrir_fonte(caminho, formato='auto', **opcoes):
+    """
+    Cria a fonte adequada à extensão do ficheiro
+
+    Args:
+        caminho: Caminho do ficheiro de folgas
+        formato: 'largo', 'longo' ou 'auto'
+        **opcoes: Opções específicas da fonte (ex: separador no CSV)
+    """
+    extensao = os.path.splitext(caminho)[1].lower()
+    classe_fonte = FONTES.get(extensao)
+
+    if classe_fonte is None:
+        suportadas = ', '.join(sorted(FONTES))
+        raise ValueError(f"Formato '{extensao}' não suportado (suportados: {suportadas})")
+
+    return classe_fonte(caminho, formato=formato, **opcoes)
+
+
+def ler_folgas(caminho='escala_folgas.xlsx', formato='auto', data_inicio=None, data_fim=None,
+               pessoas=None, **opcoes):
+    """
+    Lê um ficheiro de folgas (Excel, CSV ou Parquet) para MatrizDisponibilidade
+
+    Args:
+        caminho: Caminho do ficheiro de folgas
+        formato: 'largo', 'longo' ou 'auto'
+        data_inicio, data_fim, pessoas: Período e pessoas no formato longo (ver FonteFolgas.ler_de)
+        **opcoes: Opções específicas da fonte (ex: separador no CSV)
+
+    Returns:
+        MatrizDisponibilidade ou None em caso de erro
+    """
+    if not os.path.exists(caminho):
+        print(f"✗ Erro: Ficheiro '{caminho}' não encontrado!")
+        return None
+
+    try:
+        matriz = abrir_fonte(caminho, formato, **opcoes).ler(data_inicio, data_fim, pessoas)
+
+        print(f"✓ Folgas lidas com sucesso: {caminho}")
+        print(f"✓ Período: {matriz.inicio.strftime('%d/%m/%Y')} a {matriz.fim.strftime('%d/%m/%Y')}")
+        print(f"✓ Total de dias: {matriz.numero_dias}")
+        print(f"✓ Pessoas no ficheiro: {len(matriz.pessoas)}")
+
+        return matriz
+
+    except Exception as e:
+        print(f"✗ Erro ao ler folgas: {e}")
+        return None
+
+
+class CacheFolgas:
+    """
+    Mantém a MatrizDisponibilidade de um ficheiro de folgas em memória
+
+    Ao recarregar, o ficheiro só é lido se a data de modificação mudou e,
+    no formato largo, só as linhas e colunas alteradas são reclassificadas.
+    No formato longo o ficheiro também é relido se o período ou as pessoas
+    pedidas não estiverem na matriz.
+    """
+
+    def __init__(self, caminho='escala_folgas.xlsx', formato='auto', **opcoes):
+        self.fonte = abrir_fonte(caminho, formato, **opcoes)
+        self.matriz = None
+        self._mtime = None
+        self._longo = False
+
+    @property
+    def caminho(self):
+        return self.fonte.caminho
+
+    def desatualizado(self):
+        """Indica se o ficheiro mudou desde a última leitura"""
+        try:
+            return self.matriz is None or os.path.getmtime(self.caminho) != self._mtime
+        except OSError:
+            return True
+
+    def _cobre(self, data_inicio, data_fim, pessoas):
+        """Indica se a matriz (formato longo) já inclui o período e as pessoas pedidas"""
+        if data_inicio is not None and self.matriz.indice_dia(data_inicio) is None:
+            return False
+        if data_fim is not None and self.matriz.indice_dia(data_fim) is None:
+            return False
+        return set(pessoas or ()).issubset(self.matriz.pessoas)
+
+    def recarregar(self, forcar=False, data_inicio=None, data_fim=None, pessoas=None):
+        """
+        Recarrega o ficheiro de folgas se tiver sido alterado
+
+        Args:
+            forcar: Se True, lê o ficheiro mesmo que a data de modificação não tenha mudado
+            data_inicio, data_fim, pessoas: Período e pessoas no formato longo
+                (ver FonteFolgas.ler_de)
+
+        Returns:
+            Lista ordenada das datas (date) cuja disponibilidade mudou
+            (todas as datas na primeira leitura)
+        """
+        if (not forcar and not self.desatualizado()
+                and not (self._longo and not self._cobre(data_inicio, data_fim, pessoas))):
+            return []
+
+        mtime = os.path.getmtime(self.caminho)
+        df = self.fonte.ler_dataframe()
+        self._longo = self.fonte.formato == 'longo' or (self.fonte.formato == 'auto'
+                                                       and bool(detetar_formato_longo(df)))
+
+        if self.matriz is None:
+            self.matriz = self.fonte.ler_de(df, data_inicio, data_fim, pessoas)
+            datas_alteradas = [d.date() for d in self.matriz.datas()]
+        elif not self._longo:
+            datas_alteradas = self.matriz.atualizar_de_dataframe(df)
+        else:
+            datas_alteradas = self.matriz.substituir(
+                self.fonte.ler_de(df, data_inicio, data_fim, pessoas)
+            )
+
+        self._mtime = mtime
+        return datas_alteradas
+
+
+def expandir_caminhos(caminhos):
+    """
+    Expande uma lista de caminhos e/ou padrões glob (ex: 'folgas/*.xlsx')
+
+    Returns:
+        Lista ordenada de caminhos, sem repetições
+    """
+    if isinstance(caminhos, (str, os.PathLike)):
+        caminhos = [caminhos]
+
+    resultado = []
+    for caminho in caminhos:
+        caminho = os.fspath(caminho)
+        if glob.has_magic(caminho):
+            resultado.extend(sorted(glob.glob(caminho)))
+        else:
+            resultado.append(caminho)
+
+    return list(dict.fromkeys(resultado))
+
+
+def _ler_matriz(caminho, formato, opcoes, data_inicio, data_fim, pessoas):
+    """Lê um ficheiro para MatrizDisponibilidade (executado nos workers)"""
+    return abrir_fonte(caminho, formato, **opcoes).ler(data_inicio, data_fim, pessoas)
+
+
+def ler_varias_folgas(caminhos, formato='auto', max_workers=None, usar_processos=False,
+                      max_conflitos=20, data_inicio=None, data_fim=None, pessoas=None, **opcoes):
+    """
+    Lê vários ficheiros de folgas em paralelo e junta-os numa só matriz
+
+    Args:
+        caminhos: Lista de caminhos e/ou padrões glob (ex: 'folgas/2025-*.xlsx')
+        formato: 'largo', 'longo' ou 'auto'
+        max_workers: Número máximo de ficheiros lidos em simultâneo
+        usar_processos: Se True, usa um pool de processos (útil para muitos
+            ficheiros Excel grandes, cuja leitura ocupa o CPU)
+        max_conflitos: Número máximo de conflitos mostrados
+        data_inicio, data_fim, pessoas: Período e pessoas de cada ficheiro em formato
+            longo (ver FonteFolgas.ler_de); sem período, cada um cobre os meses das
+            suas ausências e os dias entre ficheiros ficam sem dados
+        **opcoes: Opções específicas da fonte (ex: separador no CSV)
+
+    Returns:
+        MatrizDisponibilidade combinada ou None em caso de erro ou conflito
+    """
+    caminhos = expandir_caminhos(caminhos)
+
+    if not caminhos:
+        print("✗ Erro: Nenhum ficheiro de folgas encontrado!")
+        return None
+
+    em_falta = [c for c in caminhos if not os.path.exists(c)]
+    if em_falta:
+        for caminho in em_falta:
+            print(f"✗ Erro: Ficheiro '{caminho}' não encontrado!")
+        return None
+
+    classe_executor = ProcessPoolExecutor if usar_processos else ThreadPoolExecutor
+    max_workers = max_workers or min(len(caminhos), os.cpu_count() or 1)
+
+    matrizes = {}
+    erros = False
+
+    with classe_executor(max_workers=max_workers) as executor:
+        futuros = {
+            executor.submit(_ler_matriz, caminho, formato, opcoes,
+                            data_inicio, data_fim, pessoas): caminho
+            for caminho in caminhos
+        }
+        for futuro in as_completed(futuros):
+            caminho = futuros[futuro]
+            try:
+                matrizes[caminho] = futuro.result()
+            except Exception as e:
+                print(f"✗ Erro ao ler '{caminho}': {e}")
+                erros = True
+
+    if erros:
+        return None
+
+    matriz, conflitos = MatrizDisponibilidade.combinar(
+        [matrizes[c] for c in caminhos], origens=caminhos
+    )
+
+    if conflitos:
+        print(f"✗ {len(conflitos)} conflito(s) entre ficheiros de folgas:")
+        for pessoa, data, origem_1, cat_1, origem_2, cat_2 in conflitos[:max_conflitos]:
+            print(f"  - {pessoa} em {data.strftime('%d/%m/%Y')}: "
+                  f"'{cat_1 or 'disponível'}' ({origem_1}) vs "
+                  f"'{cat_2 or 'disponível'}' ({origem_2})")
+        if len(conflitos) > max_conflitos:
+            print(f"  ... e mais {len(conflitos) - max_conflitos}")
+        return None
+
+    print(f"✓ {len(caminhos)} ficheiro(s) de folgas lidos")
+    print(f"✓ Período: {matriz.inicio.strftime('%d/%m/%Y')} a {matriz.fim.strftime('%d/%m/%Y')}")
+    print(f"✓ Pessoas: {len(matriz.pessoas)}")
+
+    return matriz
@@ -0,0 +1,204 @@
+import os
+import numpy as np
+import pandas as pd
+from escala_bd_consultas import normalizar_nome, TURNOS_PERMANENCIA
+from escala_disponibilidade import converter_datas, CATEGORIAS, DISPONIVEL, OUTRO, SEM_DADOS
+from escala_fontes_folgas import abrir_fonte
+
+
+# Nomes aceites (normalizados) para cada coluna do ficheiro a importar
+COLUNAS_IMPORTACAO = {
+    'data': ('data', 'dia'),
+    'turno': ('turno',),
+    'pessoa': ('pessoa', 'nome'),
+}
+
+# Motivo de rejeição de cada estado devolvido por GestorBaseDados.adicionar_permanencias_fixas
+MOTIVOS_ESTADO = {
+    'ocupada': 'já existe permanência fixa nesta data e turno',
+    'duplicada': 'repetida no ficheiro',
+    'pessoa_inexistente': 'pessoa não registada',
+    'turno_invalido': 'turno inválido',
+}
+
+
+def _detetar_colunas(df):
+    """
+    Encontra as colunas de data, turno e pessoa pelo nome (sem acentos nem maiúsculas)
+
+    Returns:
+        Dicionário {'data': coluna, 'turno': coluna, 'pessoa': coluna}
+    """
+    colunas = {normalizar_nome(col): col for col in df.columns}
+    encontradas = {}
+
+    for chave, nomes in COLUNAS_IMPORTACAO.items():
+        coluna = next((colunas[nome] for nome in nomes if nome in colunas), None)
+        if coluna is None:
+            raise ValueError(f"Coluna '{chave}' não encontrada (colunas: {', '.join(map(str, df.columns))})")
+        encontradas[chave] = coluna
+
+    return encontradas
+
+
+def validar_permanencias_fixas(df, gestor, disponibilidade=None, permitir_indisponiveis=False):
+    """
+    Valida um DataFrame de permanências fixas (data, turno, pessoa)
+
+    Todas as validações são feitas sobre colunas inteiras: datas e turnos
+    válidos, pessoa registada e ativa, pessoa habilitada para o turno,
+    (data, turno) livre na base de dados e não repetido no ficheiro e,
+    se for dada a MatrizDisponibilidade, pessoa disponível nesse dia.
+
+    Args:
+        df: DataFrame com as colunas de data, turno e pessoa
+        gestor: GestorBaseDados
+        disponibilidade: MatrizDisponibilidade (opcional)
+        permitir_indisponiveis: Se True, aceita pessoas de folga/férias/formação
+
+    Returns:
+        DataFrame com as colunas linha, data, turno, pessoa, pessoa_id e motivo
+        (motivo vazio nas linhas válidas)
+    """
+    colunas = _detetar_colunas(df)
+
+    # Linha do ficheiro (1 = cabeçalho), para o relatório
+    linhas = pd.DataFrame({
+        'linha': np.arange(2, len(df) + 2),
+        'data_original': df[colunas['data']].to_numpy(),
+        'turno_original': df[colunas['turno']].to_numpy(),
+        'pessoa': df[colunas['pessoa']].astype('string').str.strip().to_numpy(),
+    })
+    motivo = pd.Series('', index=linhas.index, dtype=object)
+
+    def rejeitar(mascara, texto):
+        mascara = np.asarray(mascara, dtype=bool) & (motivo == '').to_numpy()
+        motivo[mascara] = texto
+
+    # Datas
+    datas = converter_datas(linhas['data_original'].to_numpy())
+    rejeitar(datas.isna(), 'data inválida')
+    linhas['data'] = datas.dt.strftime('%Y-%m-%d').to_numpy()
+
+    # Turnos: aceita 'manha', 'MANHÃ', 'Tarde ', ...
+    turnos_por_nome = {normalizar_nome(turno): turno for turno in TURNOS_PERMANENCIA}
+    turnos_distintos = pd.unique(linhas['turno_original'].astype(str))
+    mapa_turnos = {valor: turnos_por_nome.get(normalizar_nome(valor)) for valor in turnos_distintos}
+    linhas['turno'] = linhas['turno_original'].astype(str).map(mapa_turnos)
+    rejeitar(linhas['turno'].isna(), 'turno inválido')
+
+    # Pessoas: nome exato ou normalizado
+    pessoas = gestor.listar_pessoas()
+    por_nome = {nome: (pid, ativo, turno) for pid, nome, ativo, turno, _, _ in pessoas}
+    por_nome_normalizado = {normalizar_nome(nome): registo for nome, registo in por_nome.items()}
+
+    nomes_distintos = pd.unique(linhas['pessoa'].dropna())
+    mapa_pessoas = {
+        nome: por_nome.get(nome) or por_nome_normalizado.get(normalizar_nome(nome))
+        for nome in nomes_distintos
+    }
+    registos = linhas['pessoa'].map(mapa_pessoas)
+    encontrada = registos.notna().to_numpy()
+    rejeitar(~encontrada, 'pessoa não registada')
+
+    linhas['pessoa_id'] = registos.map(lambda r: r[0], na_action='ignore').astype('Int64')
+    ativa = registos.map(lambda r: bool(r[1]), na_action='ignore').fillna(False).astype(bool)
+    turno_pessoa = registos.map(lambda r: r[2], na_action='ignore')
+    rejeitar(~ativa, 'pessoa inativa')
+    rejeitar(~(turno_pessoa.eq('Ambos') | turno_pessoa.eq(linhas['turno'])).fillna(False),
+             'pessoa não habilitada para o turno')
+
+    # Nome canónico (o da base de dados) para o relatório e para a matriz
+    nomes_por_id = {pid: nome for nome, (pid, _, _) in por_nome.items()}
+    linhas['pessoa'] = linhas['pessoa_id'].map(nomes_por_id).fillna(linhas['pessoa'])
+
+    # Conflitos com a base de dados e dentro do ficheiro
+    chaves = linhas['data'] + '|' + linhas['turno'].fillna('')
+    por_validar = (motivo == '').to_numpy()
+    existentes = gestor.permanencias_fixas_existentes(
+        zip(linhas['data'][por_validar], linhas['turno'][por_validar])
+    )
+    existentes = {f"{data}|{turno}" for data, turno in existentes}
+    rejeitar(chaves.isin(existentes), MOTIVOS_ESTADO['ocupada'])
+    por_validar = (motivo == '')
+    rejeitar(chaves.where(por_validar).duplicated() & por_validar, MOTIVOS_ESTADO['duplicada'])
+
+    # Ausências segundo o ficheiro de folgas
+    if disponibilidade is not None and not permitir_indisponiveis:
+        validas = (motivo == '').to_numpy()
+        dias = (datas - pd.Timestamp(disponibilidade.inicio)).dt.days.fillna(-1).astype(np.int64).to_numpy()
+        colunas_pessoa = linhas['pessoa'].map(
+            {nome: i for i, nome in enumerate(disponibilidade.pessoas)}
+        ).fillna(-1).astype(np.int64).to_numpy()
+
+        na_matriz = validas & (dias >= 0) & (dias < disponibilidade.numero_dias) & (colunas_pessoa >= 0)
+        categorias = np.full(len(linhas), DISPONIVEL, dtype=np.int8)
+        categorias[na_matriz] = disponibilidade.categorias[dias[na_matriz], colunas_pessoa[na_matriz]]
+
+        # Datas sem dados no ficheiro de folgas não são rejeitadas
+        ausente = na_matriz & ~np.isin(categorias, (DISPONIVEL, OUTRO, SEM_DADOS))
+        for categoria in np.unique(categorias[ausente]):
+            rejeitar(ausente & (categorias == categoria), f"pessoa com {CATEGORIAS[categoria]}")
+
+    linhas['motivo'] = motivo
+    return linhas[['linha', 'data', 'turno', 'pessoa', 'pessoa_id', 'motivo']]
+
+
+def importar_permanencias_fixas(caminho, gestor, disponibilidade=None,
+                                permitir_indisponiveis=False, max_rejeitadas=20, **opcoes):
+    """
+    Importa permanências fixas de um ficheiro CSV/Excel com colunas Data, Turno e Pessoa
+
+    As linhas válidas são inseridas numa única transação.
+
+    Args:
+        caminho: Caminho do ficheiro
+        gestor: GestorBaseDados
+        disponibilidade: MatrizDisponibilidade para rejeitar pessoas ausentes (opcional)
+        permitir_indisponiveis: Se True, não rejeita pessoas ausentes
+        max_rejeitadas: Número máximo de linhas rejeitadas mostradas
+        **opcoes: Opções específicas da fonte (ex: separador no CSV)
+
+    Returns:
+        Tuplo (importadas, rejeitadas) de DataFrames, ou None em caso de erro
+    """
+    if not os.path.exists(caminho):
+        print(f"✗ Erro: Ficheiro '{caminho}' não encontrado!")
+        return None
+
+    try:
+        df = abrir_fonte(caminho, **opcoes).ler_dataframe()
+        linhas = validar_permanencias_fixas(df, gestor, disponibilidade, permitir_indisponiveis)
+    except Exception as e:
+        print(f"✗ Erro ao ler permanências fixas: {e}")
+        return None
+
+    validas = linhas[linhas['motivo'] == '']
+
+    # A base de dados pode ter mudado desde a validação: o estado final é o do lote
+    if len(validas):
+        try:
+            resultados = gestor.adicionar_permanencias_fixas(
+                list(zip(validas['pessoa_id'].astype(int).tolist(), validas['data'], validas['turno']))
+            )
+        except Exception as e:
+            print(f"✗ Erro ao gravar permanências fixas: {e}")
+            return None
+        estados = pd.Series([estado for *_, estado in resultados], index=validas.index)
+        rejeitados = estados[estados != 'adicionada']
+        linhas.loc[rejeitados.index, 'motivo'] = [
+            MOTIVOS_ESTADO.get(estado, f"não adicionada ({estado})") for estado in rejeitados
+        ]
+
+    importadas = linhas[linhas['motivo'] == ''].drop(columns='motivo').reset_index(drop=True)
+    rejeitadas = linhas[linhas['motivo'] != ''].reset_index(drop=True)
+
+    print(f"✓ {len(importadas)} permanência(s) fixa(s) importada(s) de {caminho}")
+    if len(rejeitadas):
+        print(f"⚠ {len(rejeitadas)} linha(s) rejeitada(s):")
+        for linha, data, turno, pessoa, _, motivo in rejeitadas.head(max_rejeitadas).itertuples(index=False):
+            print(f"  - Linha {linha}: {pessoa} - {data} - {turno}: {motivo}")
+        if len(rejeitadas) > max_rejeitadas:
+            print(f"  ... e mais {len(rejeitadas) - max_rejeitadas}")
+
+    return importadas, rejeitadas
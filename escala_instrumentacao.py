@@ -0,0 +1,317 @@
+import csv
+import json
+import re
+import sqlite3
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+
+
+SEM_ROTULO = '(sem rótulo)'
+
+
+def normalizar_sql(sql):
+    """Colapsa espaços para agrupar as execuções da mesma instrução"""
+    return re.sub(r'\s+', ' ', sql).strip()
+
+
+class EstatisticaTempo:
+    """Contagem e tempos (em ms) de um conjunto de execuções"""
+
+    __slots__ = ('contagem', 'total_ms', 'max_ms')
+
+    def __init__(self):
+        self.contagem = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+
+    def registar(self, duracao_ms, contar=True):
+        self.contagem += int(contar)
+        self.total_ms += duracao_ms
+        self.max_ms = max(self.max_ms, duracao_ms)
+
+    @property
+    def media_ms(self):
+        return self.total_ms / self.contagem if self.contagem else 0.0
+
+
+class InstrumentacaoSQL:
+    """
+    Regista as consultas SQL feitas através do GestorBaseDados
+
+    Cada consulta é associada ao rótulo da operação em curso na thread
+    (ver medir()). São registados o número de instruções executadas pelo
+    SQLite (set_trace_callback, inclui BEGIN/COMMIT e cada linha de um
+    executemany), o tempo de cada execute/fetch e as consultas lentas,
+    com o respetivo EXPLAIN QUERY PLAN.
+    """
+
+    def __init__(self, limite_lento_ms=50.0, max_lentas=200):
+        """
+        Args:
+            limite_lento_ms: Duração a partir da qual uma consulta é considerada lenta
+            max_lentas: Número máximo de consultas lentas guardadas
+        """
+        self.limite_lento_ms = limite_lento_ms
+        self.max_lentas = max_lentas
+
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self.limpar()
+
+    def limpar(self):
+        """Apaga todos os registos"""
+        with self._lock:
+            self._operacoes = defaultdict(EstatisticaTempo)    # rótulo -> duração das operações
+            self._instrucoes = defaultdict(int)                # rótulo -> instruções do SQLite
+            self._consultas = defaultdict(EstatisticaTempo)    # (rótulo, sql) -> tempos
+            self.lentas = []
+
+    # ----- Rótulos -----
+
+    @property
+    def rotulo_atual(self):
+        pilha = getattr(self._local, 'rotulos', None)
+        return pilha[-1] if pilha else SEM_ROTULO
+
+    @contextmanager
+    def medir(self, rotulo):
+        """
+        Associa as consultas feitas dentro do bloco (nesta thread) ao rótulo dado
+
+        Os blocos podem ser encaixados; as consultas contam para o mais interior.
+        """
+        pilha = getattr(self._local, 'rotulos', None)
+        if pilha is None:
+            pilha = self._local.rotulos = []
+
+        pilha.append(rotulo)
+        inicio = time.perf_counter()
+        try:
+            yield self
+        finally:
+            duracao_ms = (time.perf_counter() - inicio) * 1000
+            pilha.pop()
+            with self._lock:
+                self._operacoes[rotulo].registar(duracao_ms)
+
+    # ----- Registo (chamado pelas conexões instrumentadas) -----
+
+    def _instrucao_executada(self, _sql):
+        """Callback de set_trace_callback: conta cada instrução executada pelo SQLite"""
+        rotulo = self.rotulo_atual
+        with self._lock:
+            self._instrucoes[rotulo] += 1
+
+    def _registar(self, conn, sql, parametros, duracao_ms, contar=True):
+        rotulo = self.rotulo_atual
+        chave = (rotulo, normalizar_sql(sql))
+
+        with self._lock:
+            self._consultas[chave].registar(duracao_ms, contar)
+
+        if duracao_ms >= self.limite_lento_ms and len(self.lentas) < self.max_lentas:
+            lenta = {
+                'rotulo': rotulo,
+                'sql': chave[1],
+                'parametros': repr(parametros)[:200],
+                'duracao_ms': round(duracao_ms, 3),
+                'plano': _plano_consulta(conn, sql, parametros),
+            }
+            with self._lock:
+                self.lentas.append(lenta)
+            print(f"⚠ Consulta lenta ({duracao_ms:.1f} ms) em '{rotulo}': {chave[1][:100]}")
+
+    # ----- Relatórios -----
+
+    def suspeitas_n_mais_1(self, limite=20):
+        """
+        Instruções executadas muitas vezes por cada execução de uma operação
+
+        Returns:
+            Lista de (rótulo, sql, execuções por operação), por ordem decrescente
+        """
+        with self._lock:
+            operacoes = {rotulo: estat.contagem for rotulo, estat in self._operacoes.items()}
+            consultas = [(chave, estat.contagem) for chave, estat in self._consultas.items()]
+
+        suspeitas = []
+        for (rotulo, sql), contagem in consultas:
+            por_operacao = contagem / max(operacoes.get(rotulo, 1), 1)
+            if por_operacao >= limite:
+                suspeitas.append((rotulo, sql, round(por_operacao, 1)))
+
+        return sorted(suspeitas, key=lambda s: -s[2])
+
+    def resumo(self):
+        """
+        Retorna um resumo dos registos
+
+        Returns:
+            Dicionário com 'operacoes', 'consultas', 'lentas' e 'suspeitas_n_mais_1'
+        """
+        with self._lock:
+            operacoes = [
+                {
+                    'rotulo': rotulo,
+                    'execucoes': estat.contagem,
+                    'total_ms': round(estat.total_ms, 3),
+                    'media_ms': round(estat.media_ms, 3),
+                    'instrucoes_sqlite': self._instrucoes.get(rotulo, 0),
+                }
+                for rotulo, estat in self._operacoes.items()
+            ]
+            # Consultas fora de medir() também aparecem nas operações
+            for rotulo, instrucoes in self._instrucoes.items():
+                if rotulo not in self._operacoes:
+                    operacoes.append({'rotulo': rotulo, 'execucoes': 0, 'total_ms': 0.0,
+                                      'media_ms': 0.0, 'instrucoes_sqlite': instrucoes})
+            consultas = [
+                {
+                    'rotulo': rotulo,
+                    'sql': sql,
+                    'execucoes': estat.contagem,
+                    'total_ms': round(estat.total_ms, 3),
+                    'media_ms': round(estat.media_ms, 3),
+                    'max_ms': round(estat.max_ms, 3),
+                }
+                for (rotulo, sql), estat in self._consultas.items()
+            ]
+            lentas = list(self.lentas)
+
+        return {
+            'operacoes': sorted(operacoes, key=lambda o: -o['instrucoes_sqlite']),
+            'consultas': sorted(consultas, key=lambda c: -c['total_ms']),
+            'lentas': lentas,
+            'suspeitas_n_mais_1': [
+                {'rotulo': rotulo, 'sql': sql, 'execucoes_por_operacao': n}
+                for rotulo, sql, n in self.suspeitas_n_mais_1()
+            ],
+        }
+
+    def exportar(self, caminho):
+        """
+        Exporta o resumo para JSON (.json) ou CSV (.csv, uma linha por consulta)
+        """
+        resumo = self.resumo()
+
+        if caminho.lower().endswith('.csv'):
+            with open(caminho, 'w', newline='', encoding='utf-8-sig') as f:
+                escritor = csv.DictWriter(
+                    f, fieldnames=['rotulo', 'sql', 'execucoes', 'total_ms', 'media_ms', 'max_ms']
+                )
+                escritor.writeheader()
+                escritor.writerows(resumo['consultas'])
+        else:
+            with open(caminho, 'w', encoding='utf-8') as f:
+                json.dump(resumo, f, ensure_ascii=False, indent=2)
+
+        print(f"✓ Resumo das consultas exportado para: {caminho}")
+
+    def mostrar_resumo(self, max_linhas=15):
+        """Mostra o resumo das consultas por operação e as mais demoradas"""
+        resumo = self.resumo()
+
+        print("\n" + "="*80)
+        print("CONSULTAS SQL POR OPERAÇÃO")
+        print("="*80)
+        print(f"{'Operação':<35} {'Execuções':<10} {'Instruções':<12} {'Média (ms)':<12}")
+        print("-"*80)
+        for op in resumo['operacoes'][:max_linhas]:
+            print(f"{op['rotulo'][:35]:<35} {op['execucoes']:<10} "
+                  f"{op['instrucoes_sqlite']:<12} {op['media_ms']:<12.2f}")
+
+        print("\nConsultas com mais tempo acumulado:")
+        for c in resumo['consultas'][:max_linhas]:
+            print(f"  {c['total_ms']:>9.2f} ms  {c['execucoes']:>6}x  [{c['rotulo']}] {c['sql'][:80]}")
+
+        if resumo['suspeitas_n_mais_1']:
+            print("\n⚠ Possíveis padrões N+1:")
+            for s in resumo['suspeitas_n_mais_1'][:max_linhas]:
+                print(f"  [{s['rotulo']}] {s['execucoes_por_operacao']}x por operação: {s['sql'][:80]}")
+
+        if resumo['lentas']:
+            print(f"\n⚠ {len(resumo['lentas'])} consulta(s) lenta(s) (>= {self.limite_lento_ms} ms)")
+
+        print("="*80)
+
+
+def _plano_consulta(conn, sql, parametros):
+    """Retorna o EXPLAIN QUERY PLAN de uma instrução (lista de linhas) ou None"""
+    if not normalizar_sql(sql).upper().startswith(('SELECT', 'UPDATE', 'DELETE', 'INSERT', 'WITH')):
+        return None
+    try:
+        # Cursor base, para o EXPLAIN não ser ele próprio registado
+        cursor = sqlite3.Cursor(conn)
+        linhas = cursor.execute(f'EXPLAIN QUERY PLAN {sql}', parametros or ()).fetchall()
+        return [linha[-1] for linha in linhas]
+    except (sqlite3.Error, ValueError):
+        return None
+
+
+class CursorInstrumentado(sqlite3.Cursor):
+    """Cursor que mede execute/executemany e as leituras dos resultados"""
+
+    def execute(self, sql, parametros=()):
+        inicio = time.perf_counter()
+        try:
+            return super().execute(sql, parametros)
+        finally:
+            self._ultima = (sql, parametros)
+            self.connection.instrumentacao._registar(
+                self.connection, sql, parametros, (time.perf_counter() - inicio) * 1000
+            )
+
+    def executemany(self, sql, sequencia):
+        inicio = time.perf_counter()
+        try:
+            return super().executemany(sql, sequencia)
+        finally:
+            self._ultima = (sql, None)
+            self.connection.instrumentacao._registar(
+                self.connection, sql, None, (time.perf_counter() - inicio) * 1000
+            )
+
+    def _medir_leitura(self, leitura, *args):
+        inicio = time.perf_counter()
+        try:
+            return leitura(*args)
+        finally:
+            ultima = getattr(self, '_ultima', None)
+            if ultima is not None:
+                # O tempo de leitura soma ao da consulta, sem contar outra execução
+                self.connection.instrumentacao._registar(
+                    self.connection, ultima[0], ultima[1],
+                    (time.perf_counter() - inicio) * 1000, contar=False
+                )
+
+    def fetchone(self):
+        return self._medir_leitura(super().fetchone)
+
+    def fetchmany(self, size=None):
+        if size is None:
+            return self._medir_leitura(super().fetchmany)
+        return self._medir_leitura(super().fetchmany, size)
+
+    def fetchall(self):
+        return self._medir_leitura(super().fetchall)
+
+
+class ConexaoInstrumentada(sqlite3.Connection):
+    """Conexão sqlite3 cujos cursores são medidos pela InstrumentacaoSQL associada"""
+
+    instrumentacao = None
+
+    def ativar(self, instrumentacao):
+        self.instrumentacao = instrumentacao
+        self.set_trace_callback(instrumentacao._instrucao_executada)
+
+    def cursor(self, factory=CursorInstrumentado):
+        return super().cursor(factory)
+
+    def execute(self, sql, parametros=()):
+        return self.cursor().execute(sql, parametros)
+
+    def executemany(self, sql, sequencia):
+        return self.cursor().executemany(sql, sequencia)
@@ -1,7 +1,7 @@
 import pandas as pd
 from datetime import datetime
-import sqlite3
 import os
+from escala_bd_consultas import GestorBaseDados
 
 def ler_excel_folgas(caminho_excel='escala_folgas.xlsx'):
     """
@@ -96,51 +96,32 @@ def obter_pessoas_disponiveis(df, data):
     return pessoas_disponiveis
 
 
-def sincronizar_pessoas_com_bd(df):
+def sincronizar_pessoas_com_bd(df, gestor_bd=None, aplicar_renomeacoes=False):
     """
     Sincroniza as pessoas do Excel com a base de dados
-    Adiciona pessoas que estão no Excel mas não estão na BD
+    Adiciona pessoas que estão no Excel mas não estão na BD e reporta
+    possíveis renomeações, pessoas desativadas e pessoas sem coluna no Excel
+    
+    Args:
+        df: DataFrame com os dados do Excel
+        gestor_bd: Instância de GestorBaseDados (default: BD escala_permanencias.db)
+        aplicar_renomeacoes: Se True, atualiza na BD os nomes que só diferem
+            em acentos, maiúsculas ou pontuação
+    
+    Returns:
+        Dicionário devolvido por GestorBaseDados.sincronizar_pessoas
     """
-    conn = sqlite3.connect('escala_permanencias.db')
-    cursor = conn.cursor()
+    if gestor_bd is None:
+        gestor_bd = GestorBaseDados()
     
     # Obter nomes das colunas (pessoas) do Excel
     colunas_pessoas = [col for col in df.columns if col not in ['Data', 'Dia da Semana']]
     
-    # Obter pessoas já na base de dados
-    cursor.execute('SELECT nome FROM pessoas WHERE ativo = 1')
-    pessoas_bd = [row[0] for row in cursor.fetchall()]
-    
-    pessoas_adicionadas = []
-    
-    for pessoa in colunas_pessoas:
-        if pessoa not in pessoas_bd:
-            try:
-                # Inserir pessoa
-                cursor.execute('INSERT INTO pessoas (nome) VALUES (?)', (pessoa,))
-                pessoa_id = cursor.lastrowid
-                
-                # Inserir disponibilidade padrão (Ambos os turnos)
-                cursor.execute('''
-                    INSERT INTO disponibilidade_turno (pessoa_id, turno) 
-                    VALUES (?, 'Ambos')
-                ''', (pessoa_id,))
-                
-                # Inserir configuração padrão (10-20%)
-                cursor.execute('''
-                    INSERT INTO configuracao_percentagens 
-                    (pessoa_id, percentagem_min, percentagem_max)
-                    VALUES (?, 10.0, 20.0)
-                ''', (pessoa_id,))
-                
-                pessoas_adicionadas.append(pessoa)
-                
-            except sqlite3.IntegrityError:
-                pass  # Pessoa já existe
-    
-    conn.commit()
-    conn.close()
+    resultado = gestor_bd.sincronizar_pessoas(
+        colunas_pessoas, aplicar_renomeacoes=aplicar_renomeacoes
+    )
     
+    pessoas_adicionadas = resultado['adicionadas']
     if pessoas_adicionadas:
         print(f"\n✓ {len(pessoas_adicionadas)} pessoa(s) adicionada(s) à base de dados:")
         for p in pessoas_adicionadas:
@@ -148,7 +129,26 @@ def sincronizar_pessoas_com_bd(df):
     else:
         print("\n✓ Todas as pessoas do Excel já estão na base de dados")
     
-    return pessoas_adicionadas
+    if resultado['renomeadas']:
+        if aplicar_renomeacoes:
+            print(f"⚠ {len(resultado['renomeadas'])} pessoa(s) renomeada(s):")
+        else:
+            print(f"⚠ {len(resultado['renomeadas'])} pessoa(s) possivelmente renomeada(s), "
+                  "adicionada(s) como pessoa(s) nova(s) (confirmar com aplicar_renomeacoes=True):")
+        for nome_bd, nome_excel in resultado['renomeadas']:
+            print(f"  - {nome_bd} → {nome_excel}")
+    
+    if resultado['desativadas']:
+        print(f"⚠ {len(resultado['desativadas'])} pessoa(s) do Excel desativada(s) na base de dados:")
+        for p in resultado['desativadas']:
+            print(f"  - {p}")
+    
+    if resultado['ausentes']:
+        print(f"⚠ {len(resultado['ausentes'])} pessoa(s) ativa(s) sem coluna no Excel:")
+        for p in resultado['ausentes']:
+            print(f"  - {p}")
+    
+    return resultado
 
 
 def mostrar_disponibilidade_periodo(df, data_inicio, data_fim):
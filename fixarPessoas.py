@@ -2,53 +2,149 @@
 # -*- coding: utf-8 -*-
 
 import sys
-import sqlite3
+from bisect import bisect_left
+from datetime import timedelta
 from PyQt5.QtWidgets import (QApplication, QDialog, QVBoxLayout, QHBoxLayout, 
                              QLabel, QComboBox, QDateEdit, QPushButton, 
                              QTableWidget, QTableWidgetItem, QHeaderView,
-                             QMessageBox, QGroupBox, QFormLayout)
+                             QMessageBox, QGroupBox, QFormLayout, QCheckBox,
+                             QFileDialog)
 from PyQt5.QtCore import Qt, QDate
 from PyQt5.QtGui import QFont
 from escala_bd_consultas import GestorBaseDados
+from tarefasQt import ExecutorBD
 
 class FixarPessoasDialog(QDialog):
-    def __init__(self, gestor_bd, parent=None):
+    TAMANHO_PAGINA = 100  # Permanências fixas por página da tabela
+    
+    def __init__(self, gestor_bd, parent=None, disponibilidade=None, executor=None):
         super().__init__(parent)
         self.gestor = gestor_bd
         self.parent = parent
+        self.disponibilidade = disponibilidade  # MatrizDisponibilidade (opcional)
+        
+        # Acesso à base de dados fora da thread da interface
+        self.executor = executor or ExecutorBD(gestor_bd, parent=self)
+        self.executor.ocupado.connect(self.mostrar_ocupado)
         
         self.setWindowTitle("Fixar Pessoas em Datas Específicas")
         self.setGeometry(300, 200, 800, 600)
         
         self.pessoas = []
-        self.permanencias_fixas = []
+        self.permanencias_fixas = []  # Linhas da página atual (id, pessoa, data, turno)
+        self.total_permanencias = 0  # Total com os filtros atuais
+        self._inicios_pagina = [None]  # Chave (data, turno) após a qual começa cada página
+        self._ha_seguinte = False  # Há permanências depois da última linha da página
         
-        self.carregar_dados()
         self.setup_ui()
+        self.carregar_dados()
     
     def carregar_dados(self):
-        """Carrega pessoas e permanências fixas da base de dados"""
-        try:
-            conn = self.gestor._conectar()
-            cursor = conn.cursor()
-            
-            # Carregar pessoas
-            cursor.execute('SELECT id, nome FROM pessoas WHERE ativo = 1 ORDER BY nome')
-            self.pessoas = cursor.fetchall()
-            
-            # Carregar permanências fixas
-            cursor.execute('''
-                SELECT pf.id, p.nome, pf.data, pf.turno 
-                FROM permanencias_fixas pf
-                JOIN pessoas p ON pf.pessoa_id = p.id
-                ORDER BY pf.data, pf.turno
-            ''')
-            self.permanencias_fixas = cursor.fetchall()
-            
-            conn.close()
-            
-        except Exception as e:
-            QMessageBox.critical(self, "Erro", f"Erro ao carregar dados: {e}")
+        """Carrega as pessoas e a página atual de permanências fixas (em segundo plano)"""
+        data_inicio, data_fim, pessoa_id = self.filtros()
+        apos = self._inicios_pagina[-1]
+        
+        def carregar():
+            # Só a página pedida é lida (pelo índice), mais o total para a paginação;
+            # a linha a mais indica se existe página seguinte
+            return (
+                self.gestor.obter_pessoas_ativas(),
+                self.gestor.listar_permanencias_fixas(data_inicio, data_fim, pessoa_id,
+                                                      limite=self.TAMANHO_PAGINA + 1, apos=apos),
+                self.gestor.contar_permanencias_fixas(data_inicio, data_fim, pessoa_id)
+            )
+        
+        self.executor.executar(
+            carregar,
+            ao_concluir=self.dados_carregados,
+            ao_falhar=lambda e: self.mostrar_erro("Erro ao carregar dados", e)
+        )
+    
+    def dados_carregados(self, dados):
+        """Recebe as pessoas e a página de permanências fixas carregadas da base de dados"""
+        pessoas, registos, self.total_permanencias = dados
+        self._ha_seguinte = len(registos) > self.TAMANHO_PAGINA
+        self.permanencias_fixas = registos[:self.TAMANHO_PAGINA]
+        
+        if pessoas != self.pessoas:
+            self.pessoas = pessoas
+            self.preencher_pessoas()
+        
+        # A página ficou vazia (ex: remoções noutra janela): voltar à anterior
+        if not self.permanencias_fixas and len(self._inicios_pagina) > 1:
+            self.pagina_anterior()
+            return
+        
+        self.atualizar_lista()
+    
+    def filtros(self):
+        """
+        Filtros escolhidos para a lista
+        
+        Returns:
+            Tuplo (data_inicio, data_fim, pessoa_id), com None nos filtros não usados
+        """
+        pessoa_id = self.combo_filtro_pessoa.currentData()
+        if not self.check_filtro_datas.isChecked():
+            return None, None, pessoa_id
+        return (self.date_filtro_inicio.date().toString('yyyy-MM-dd'),
+                self.date_filtro_fim.date().toString('yyyy-MM-dd'),
+                pessoa_id)
+    
+    def filtrar(self, *_):
+        """Aplica os filtros, voltando à primeira página"""
+        self._inicios_pagina = [None]
+        self.carregar_dados()
+    
+    def pagina_seguinte(self):
+        """Mostra a página seguinte (a partir da última linha da página atual)"""
+        if not self._ha_seguinte or not self.permanencias_fixas:
+            return
+        self._inicios_pagina.append(tuple(self.permanencias_fixas[-1][2:]))
+        self.carregar_dados()
+    
+    def pagina_anterior(self):
+        """Mostra a página anterior"""
+        if len(self._inicios_pagina) > 1:
+            self._inicios_pagina.pop()
+            self.carregar_dados()
+    
+    def preencher_pessoas(self):
+        """Preenche a lista de pessoas, mantendo a pessoa selecionada"""
+        pessoa_id = self.combo_pessoa.currentData()
+        
+        self.combo_pessoa.clear()
+        for pessoa_id_combo, nome in self.pessoas:
+            self.combo_pessoa.addItem(nome, pessoa_id_combo)
+        
+        indice = self.combo_pessoa.findData(pessoa_id)
+        self.combo_pessoa.setCurrentIndex(max(indice, 0))
+        
+        # Filtro por pessoa (sem voltar a filtrar ao preencher)
+        filtro_id = self.combo_filtro_pessoa.currentData()
+        self.combo_filtro_pessoa.blockSignals(True)
+        self.combo_filtro_pessoa.clear()
+        self.combo_filtro_pessoa.addItem("Todas as pessoas", None)
+        for pessoa_id_combo, nome in self.pessoas:
+            self.combo_filtro_pessoa.addItem(nome, pessoa_id_combo)
+        self.combo_filtro_pessoa.setCurrentIndex(max(self.combo_filtro_pessoa.findData(filtro_id), 0))
+        self.combo_filtro_pessoa.blockSignals(False)
+    
+    def mostrar_ocupado(self, ocupado):
+        """Mostra o cursor de espera enquanto há operações na base de dados"""
+        if ocupado:
+            self.setCursor(Qt.BusyCursor)
+        else:
+            self.unsetCursor()
+    
+    def done(self, resultado):
+        """Ao fechar, desliga o diálogo do executor (partilhado com a janela principal)"""
+        self.executor.ocupado.disconnect(self.mostrar_ocupado)
+        super().done(resultado)
+    
+    def mostrar_erro(self, titulo, erro):
+        """Mostra um erro devolvido por uma operação na base de dados"""
+        QMessageBox.critical(self, "Erro", f"{titulo}: {erro}")
     
     def setup_ui(self):
         layout = QVBoxLayout()
@@ -61,8 +157,6 @@ class FixarPessoasDialog(QDialog):
         
         # Pessoa
         self.combo_pessoa = QComboBox()
-        for pessoa_id, nome in self.pessoas:
-            self.combo_pessoa.addItem(nome, pessoa_id)
         form_layout.addRow("Pessoa:", self.combo_pessoa)
         
         # Data
@@ -77,6 +171,20 @@ class FixarPessoasDialog(QDialog):
         self.combo_turno.addItems(["Manhã", "Tarde"])
         form_layout.addRow("Turno:", self.combo_turno)
         
+        # Repetição semanal (mesmo dia da semana até à data indicada)
+        repetir_layout = QHBoxLayout()
+        self.check_repetir = QCheckBox("Repetir semanalmente até")
+        self.date_repetir_ate = QDateEdit()
+        self.date_repetir_ate.setDate(QDate.currentDate().addMonths(3))
+        self.date_repetir_ate.setCalendarPopup(True)
+        self.date_repetir_ate.setDisplayFormat("dd/MM/yyyy")
+        self.date_repetir_ate.setEnabled(False)
+        self.check_repetir.toggled.connect(self.date_repetir_ate.setEnabled)
+        repetir_layout.addWidget(self.check_repetir)
+        repetir_layout.addWidget(self.date_repetir_ate)
+        repetir_layout.addStretch()
+        form_layout.addRow("", repetir_layout)
+        
         # Botões
         btn_layout = QHBoxLayout()
         btn_adicionar = QPushButton("➕ Adicionar Permanência")
@@ -110,8 +218,24 @@ class FixarPessoasDialog(QDialog):
             }
         """)
         
+        btn_importar = QPushButton("📥 Importar Ficheiro")
+        btn_importar.clicked.connect(self.importar_ficheiro)
+        btn_importar.setStyleSheet("""
+            QPushButton {
+                background-color: #9C27B0;
+                color: white;
+                border: none;
+                border-radius: 5px;
+                padding: 8px;
+            }
+            QPushButton:hover {
+                background-color: #7B1FA2;
+            }
+        """)
+        
         btn_layout.addWidget(btn_adicionar)
         btn_layout.addWidget(btn_limpar)
+        btn_layout.addWidget(btn_importar)
         btn_layout.addStretch()
         
         form_layout.addRow("", btn_layout)
@@ -124,19 +248,64 @@ class FixarPessoasDialog(QDialog):
         
         lista_layout = QVBoxLayout()
         
+        # Filtros (aplicados na base de dados)
+        filtros_layout = QHBoxLayout()
+        self.combo_filtro_pessoa = QComboBox()
+        self.combo_filtro_pessoa.addItem("Todas as pessoas", None)
+        self.combo_filtro_pessoa.currentIndexChanged.connect(self.filtrar)
+        
+        self.check_filtro_datas = QCheckBox("De")
+        self.date_filtro_inicio = QDateEdit()
+        self.date_filtro_inicio.setDate(QDate.currentDate())
+        self.date_filtro_fim = QDateEdit()
+        self.date_filtro_fim.setDate(QDate.currentDate().addMonths(3))
+        for date_edit in (self.date_filtro_inicio, self.date_filtro_fim):
+            date_edit.setCalendarPopup(True)
+            date_edit.setDisplayFormat("dd/MM/yyyy")
+            date_edit.setEnabled(False)
+            date_edit.dateChanged.connect(self.filtrar)
+            self.check_filtro_datas.toggled.connect(date_edit.setEnabled)
+        self.check_filtro_datas.toggled.connect(self.filtrar)
+        
+        filtros_layout.addWidget(QLabel("Pessoa:"))
+        filtros_layout.addWidget(self.combo_filtro_pessoa)
+        filtros_layout.addSpacing(20)
+        filtros_layout.addWidget(self.check_filtro_datas)
+        filtros_layout.addWidget(self.date_filtro_inicio)
+        filtros_layout.addWidget(QLabel("até"))
+        filtros_layout.addWidget(self.date_filtro_fim)
+        filtros_layout.addStretch()
+        lista_layout.addLayout(filtros_layout)
+        
         # Tabela de permanências fixas
         self.tabela_permanencias = QTableWidget()
         self.tabela_permanencias.setColumnCount(4)
         self.tabela_permanencias.setHorizontalHeaderLabels(["ID", "Pessoa", "Data", "Turno"])
         self.tabela_permanencias.horizontalHeader().setSectionResizeMode(QHeaderView.Stretch)
         self.tabela_permanencias.setSelectionBehavior(QTableWidget.SelectRows)
+        self.tabela_permanencias.setSelectionMode(QTableWidget.ExtendedSelection)
         
         lista_layout.addWidget(self.tabela_permanencias)
         
+        # Paginação
+        paginas_layout = QHBoxLayout()
+        self.btn_pagina_anterior = QPushButton("◀ Anterior")
+        self.btn_pagina_anterior.clicked.connect(self.pagina_anterior)
+        self.label_pagina = QLabel()
+        self.btn_pagina_seguinte = QPushButton("Seguinte ▶")
+        self.btn_pagina_seguinte.clicked.connect(self.pagina_seguinte)
+        
+        paginas_layout.addStretch()
+        paginas_layout.addWidget(self.btn_pagina_anterior)
+        paginas_layout.addWidget(self.label_pagina)
+        paginas_layout.addWidget(self.btn_pagina_seguinte)
+        paginas_layout.addStretch()
+        lista_layout.addLayout(paginas_layout)
+        
         # Botões para a tabela
         btn_tabela_layout = QHBoxLayout()
         
-        btn_remover = QPushButton("❌ Remover Selecionada")
+        btn_remover = QPushButton("❌ Remover Selecionadas")
         btn_remover.clicked.connect(self.remover_permanencia)
         btn_remover.setStyleSheet("""
             QPushButton {
@@ -152,7 +321,7 @@ class FixarPessoasDialog(QDialog):
         """)
         
         btn_atualizar = QPushButton("🔄 Atualizar Lista")
-        btn_atualizar.clicked.connect(self.atualizar_lista)
+        btn_atualizar.clicked.connect(self.carregar_dados)
         btn_atualizar.setStyleSheet("""
             QPushButton {
                 background-color: #2196F3;
@@ -215,128 +384,415 @@ class FixarPessoasDialog(QDialog):
                 QMessageBox.warning(self, "Aviso", "Selecione uma pessoa!")
                 return
             
-            # Verificar se já existe permanência para esta data e turno
-            conn = self.gestor._conectar()
-            cursor = conn.cursor()
+            if self.check_repetir.isChecked():
+                self.adicionar_permanencias_semanais(pessoa_id, pessoa_nome, turno)
+                return
+            
+            if not self.confirmar_disponibilidade(pessoa_nome, self.date_data.date().toPyDate()):
+                return
+            
+            filtros = self.filtros()
+            
+            def adicionar():
+                # Verificar se já existe permanência para esta data e turno
+                if self.gestor.existe_permanencia_fixa(data, turno):
+                    return 'ocupada', []
+                
+                # A pessoa pode ter sido removida depois de a lista ser carregada
+                if self.gestor.obter_nome_pessoa(pessoa_id) is None:
+                    return 'pessoa_inexistente', []
+                
+                # Inserir nova permanência
+                if not self.gestor.adicionar_permanencia_fixa_por_id(pessoa_id, data, turno):
+                    return 'falhou', []
+                return 'adicionada', self.ler_adicionadas([(data, turno)], filtros)
+            
+            def concluido(resultado):
+                estado, novas = resultado
+                if estado == 'ocupada':
+                    QMessageBox.warning(self, "Aviso", 
+                                      f"Já existe uma permanência fixa para {data} - {turno}!")
+                    return
+                if estado == 'pessoa_inexistente':
+                    QMessageBox.warning(self, "Aviso", 
+                                      f"A pessoa '{pessoa_nome}' já não existe na base de dados!")
+                    self.carregar_dados()
+                    return
+                if estado == 'falhou':
+                    QMessageBox.warning(self, "Aviso", 
+                                      f"Não foi possível adicionar a permanência fixa para {data} - {turno}!")
+                    return
+                
+                QMessageBox.information(self, "Sucesso", 
+                                      f"Permanência fixa adicionada:\n{pessoa_nome} - {data} - {turno}")
+                
+                # Inserir na tabela e limpar seleção
+                self.inserir_permanencias(novas)
+                self.limpar_selecao()
             
-            cursor.execute('''
-                SELECT id FROM permanencias_fixas 
-                WHERE data = ? AND turno = ?
-            ''', (data, turno))
+            self.executor.executar(
+                adicionar,
+                ao_concluir=concluido,
+                ao_falhar=lambda e: self.mostrar_erro("Erro ao adicionar permanência", e)
+            )
             
-            if cursor.fetchone():
-                QMessageBox.warning(self, "Aviso", 
-                                  f"Já existe uma permanência fixa para {data} - {turno}!")
-                conn.close()
+        except Exception as e:
+            QMessageBox.critical(self, "Erro", f"Erro ao adicionar permanência: {e}")
+    
+    def adicionar_permanencias_semanais(self, pessoa_id, pessoa_nome, turno):
+        """Adiciona a mesma permanência fixa todas as semanas até à data indicada"""
+        inicio = self.date_data.date().toPyDate()
+        fim = self.date_repetir_ate.date().toPyDate()
+        
+        if fim < inicio:
+            QMessageBox.warning(self, "Aviso", "A data final da repetição é anterior à data inicial!")
+            return
+        
+        datas = []
+        data = inicio
+        while data <= fim:
+            datas.append(data)
+            data += timedelta(weeks=1)
+        
+        if not self.confirmar_disponibilidade_datas(pessoa_nome, datas):
+            return
+        
+        lote = [(pessoa_id, data, turno) for data in datas]
+        filtros = self.filtros()
+        
+        def adicionar():
+            resultados = self.gestor.adicionar_permanencias_fixas(lote)
+            chaves = [(data, turno) for _, data, turno, estado in resultados if estado == 'adicionada']
+            return resultados, self.ler_adicionadas(chaves, filtros)
+        
+        self.executor.executar(
+            adicionar,
+            ao_concluir=lambda resultado: self.permanencias_semanais_adicionadas(
+                pessoa_nome, turno, *resultado),
+            ao_falhar=lambda e: self.mostrar_erro("Erro ao adicionar permanências", e)
+        )
+    
+    def permanencias_semanais_adicionadas(self, pessoa_nome, turno, resultados, novas):
+        """Mostra o resultado da adição de permanências semanais"""
+        adicionadas = [data for _, data, _, estado in resultados if estado == 'adicionada']
+        ocupadas = [data for _, data, _, estado in resultados if estado != 'adicionada']
+        
+        mensagem = f"{len(adicionadas)} permanência(s) fixa(s) adicionada(s) para {pessoa_nome} ({turno})."
+        if ocupadas:
+            lista = ", ".join(QDate.fromString(d, 'yyyy-MM-dd').toString('dd/MM/yyyy')
+                              for d in ocupadas[:10])
+            if len(ocupadas) > 10:
+                lista += f" ... e mais {len(ocupadas) - 10}"
+            mensagem += f"\n\nJá existia permanência fixa em {len(ocupadas)} data(s):\n{lista}"
+        
+        QMessageBox.information(self, "Sucesso" if adicionadas else "Aviso", mensagem)
+        
+        # Inserir na tabela e limpar seleção
+        self.inserir_permanencias(novas)
+        self.limpar_selecao()
+    
+    def importar_ficheiro(self):
+        """Importa permanências fixas de um ficheiro CSV/Excel (colunas Data, Turno, Pessoa)"""
+        from escala_importar_fixas import importar_permanencias_fixas
+        
+        caminho, _ = QFileDialog.getOpenFileName(
+            self, "Importar Permanências Fixas", "",
+            "Ficheiros de dados (*.xlsx *.xlsm *.csv *.txt);;Todos os ficheiros (*)"
+        )
+        if not caminho:
+            return
+        
+        # A leitura e validação do ficheiro também correm fora da thread da interface
+        self.executor.executar(
+            importar_permanencias_fixas, caminho, self.gestor, self.disponibilidade,
+            ao_concluir=self.ficheiro_importado,
+            ao_falhar=lambda e: self.mostrar_erro("Erro ao importar permanências", e)
+        )
+    
+    def ficheiro_importado(self, resultado):
+        """Mostra o relatório da importação de permanências fixas"""
+        try:
+            if resultado is None:
+                QMessageBox.critical(self, "Erro", 
+                                   "Não foi possível ler o ficheiro.\n"
+                                   "Deve ter as colunas Data, Turno e Pessoa.")
                 return
             
-            # Inserir nova permanência
-            cursor.execute('''
-                INSERT INTO permanencias_fixas (pessoa_id, data, turno)
-                VALUES (?, ?, ?)
-            ''', (pessoa_id, data, turno))
+            importadas, rejeitadas = resultado
+            mensagem = f"{len(importadas)} permanência(s) fixa(s) importada(s)."
             
-            conn.commit()
-            conn.close()
+            if len(rejeitadas):
+                linhas = [
+                    f"  Linha {linha}: {pessoa} - {data} - {turno}: {motivo}"
+                    for linha, data, turno, pessoa, _, motivo in rejeitadas.head(15).itertuples(index=False)
+                ]
+                if len(rejeitadas) > 15:
+                    linhas.append(f"  ... e mais {len(rejeitadas) - 15}")
+                mensagem += f"\n\n{len(rejeitadas)} linha(s) rejeitada(s):\n" + "\n".join(linhas)
             
-            QMessageBox.information(self, "Sucesso", 
-                                  f"Permanência fixa adicionada:\n{pessoa_nome} - {data} - {turno}")
+            QMessageBox.information(self, "Importação Concluída", mensagem)
             
-            # Atualizar lista e limpar seleção
+            # Atualizar lista
             self.carregar_dados()
-            self.atualizar_lista()
-            self.limpar_selecao()
             
         except Exception as e:
-            QMessageBox.critical(self, "Erro", f"Erro ao adicionar permanência: {e}")
+            QMessageBox.critical(self, "Erro", f"Erro ao importar permanências: {e}")
+    
+    def confirmar_disponibilidade_datas(self, pessoa_nome, datas):
+        """
+        Avisa se a pessoa não está disponível em alguma das datas segundo o ficheiro de folgas
+        
+        Returns:
+            True se as permanências podem ser adicionadas
+        """
+        if self.disponibilidade is None or not datas:
+            return True
+        
+        # Contagem acumulada: se a pessoa está disponível em todos os dias entre a
+        # primeira e a última data, não é preciso verificar data a data
+        primeira = max(datas[0], self.disponibilidade.inicio)
+        ultima = min(datas[-1], self.disponibilidade.fim)
+        if primeira > ultima or self.disponibilidade.contar_dias_disponiveis(
+                pessoa_nome, primeira, ultima) == (ultima - primeira).days + 1:
+            return True
+        
+        indisponiveis = [
+            data for data in datas
+            if self.disponibilidade.indice_dia(data) is not None
+            and not self.disponibilidade.esta_disponivel(pessoa_nome, data)
+        ]
+        
+        if not indisponiveis:
+            return True
+        if len(indisponiveis) == 1:
+            return self.confirmar_disponibilidade(pessoa_nome, indisponiveis[0])
+        
+        lista = "\n".join(
+            f"  {data.strftime('%d/%m/%Y')}: {self.disponibilidade.categoria(pessoa_nome, data) or 'indisponível'}"
+            for data in indisponiveis[:10]
+        )
+        if len(indisponiveis) > 10:
+            lista += f"\n  ... e mais {len(indisponiveis) - 10}"
+        
+        reply = QMessageBox.question(
+            self, 'Pessoa Indisponível',
+            f"{pessoa_nome} não está disponível em {len(indisponiveis)} data(s):\n{lista}\n\n"
+            "Adicionar as permanências fixas mesmo assim?",
+            QMessageBox.Yes | QMessageBox.No,
+            QMessageBox.No
+        )
+        return reply == QMessageBox.Yes
+    
+    def confirmar_disponibilidade(self, pessoa_nome, data):
+        """
+        Avisa se a pessoa não está disponível na data segundo o ficheiro de folgas
+        
+        Returns:
+            True se a permanência pode ser adicionada
+        """
+        if self.disponibilidade is None or self.disponibilidade.indice_dia(data) is None:
+            return True
+        
+        if self.disponibilidade.esta_disponivel(pessoa_nome, data):
+            return True
+        
+        categoria = self.disponibilidade.categoria(pessoa_nome, data) or "indisponível"
+        proximo = self.disponibilidade.proximo_dia_disponivel(pessoa_nome, data)
+        proximo_str = proximo.strftime('%d/%m/%Y') if proximo else "nenhum no ficheiro de folgas"
+        
+        reply = QMessageBox.question(
+            self, 'Pessoa Indisponível',
+            f"{pessoa_nome} está com {categoria} em {data.strftime('%d/%m/%Y')}.\n"
+            f"Próximo dia disponível: {proximo_str}\n\n"
+            "Adicionar a permanência fixa mesmo assim?",
+            QMessageBox.Yes | QMessageBox.No,
+            QMessageBox.No
+        )
+        return reply == QMessageBox.Yes
     
     def remover_permanencia(self):
-        """Remove a permanência fixa selecionada"""
+        """Remove as permanências fixas selecionadas"""
         try:
-            linha_selecionada = self.tabela_permanencias.currentRow()
+            linhas_selecionadas = sorted({
+                indice.row() for indice in self.tabela_permanencias.selectionModel().selectedRows()
+            })
             
-            if linha_selecionada == -1:
+            if not linhas_selecionadas:
                 QMessageBox.warning(self, "Aviso", "Selecione uma permanência para remover!")
                 return
             
-            # Obter ID da permanência
-            id_item = self.tabela_permanencias.item(linha_selecionada, 0)
-            if not id_item:
+            # Obter IDs das permanências
+            permanencia_ids = []
+            descricoes = []
+            for linha in linhas_selecionadas:
+                id_item = self.tabela_permanencias.item(linha, 0)
+                if not id_item:
+                    continue
+                permanencia_ids.append(int(id_item.text()))
+                pessoa = self.tabela_permanencias.item(linha, 1).text()
+                data = self.tabela_permanencias.item(linha, 2).text()
+                turno = self.tabela_permanencias.item(linha, 3).text()
+                descricoes.append(f"{pessoa} - {data} - {turno}")
+            
+            if not permanencia_ids:
                 return
             
-            permanencia_id = int(id_item.text())
-            pessoa = self.tabela_permanencias.item(linha_selecionada, 1).text()
-            data = self.tabela_permanencias.item(linha_selecionada, 2).text()
-            turno = self.tabela_permanencias.item(linha_selecionada, 3).text()
+            if len(descricoes) > 10:
+                descricoes = descricoes[:10] + [f"... e mais {len(descricoes) - 10}"]
             
             # Confirmar remoção
             reply = QMessageBox.question(
                 self, 'Confirmar Remoção',
-                f"Remover permanência fixa?\n{pessoa} - {data} - {turno}",
+                f"Remover {len(permanencia_ids)} permanência(s) fixa(s)?\n" + "\n".join(descricoes),
                 QMessageBox.Yes | QMessageBox.No,
                 QMessageBox.No
             )
             
             if reply == QMessageBox.Yes:
-                conn = self.gestor._conectar()
-                cursor = conn.cursor()
-                
-                cursor.execute('DELETE FROM permanencias_fixas WHERE id = ?', (permanencia_id,))
+                def concluido(removidas):
+                    QMessageBox.information(self, "Sucesso", f"{removidas} permanência(s) fixa(s) removida(s)!")
+                    
+                    # Retirar as linhas da tabela
+                    self.retirar_permanencias(permanencia_ids)
                 
-                conn.commit()
-                conn.close()
-                
-                QMessageBox.information(self, "Sucesso", "Permanência fixa removida!")
-                
-                # Atualizar lista
-                self.carregar_dados()
-                self.atualizar_lista()
+                self.executor.executar(
+                    'remover_permanencias_fixas_por_id', permanencia_ids,
+                    ao_concluir=concluido,
+                    ao_falhar=lambda e: self.mostrar_erro("Erro ao remover permanência", e)
+                )
                 
         except Exception as e:
             QMessageBox.critical(self, "Erro", f"Erro ao remover permanência: {e}")
     
     def atualizar_lista(self):
-        """Atualiza a tabela com as permanências fixas"""
+        """Atualiza a tabela com a página atual de permanências fixas"""
         try:
             self.tabela_permanencias.setRowCount(len(self.permanencias_fixas))
             
-            for row, (permanencia_id, pessoa_nome, data, turno) in enumerate(self.permanencias_fixas):
-                # ID
-                item_id = QTableWidgetItem(str(permanencia_id))
-                item_id.setFlags(item_id.flags() & ~Qt.ItemIsEditable)
-                self.tabela_permanencias.setItem(row, 0, item_id)
-                
-                # Pessoa
-                item_pessoa = QTableWidgetItem(pessoa_nome)
-                item_pessoa.setFlags(item_pessoa.flags() & ~Qt.ItemIsEditable)
-                self.tabela_permanencias.setItem(row, 1, item_pessoa)
-                
-                # Data (formatar para DD/MM/YYYY)
-                data_obj = QDate.fromString(data, 'yyyy-MM-dd')
-                item_data = QTableWidgetItem(data_obj.toString('dd/MM/yyyy'))
-                item_data.setFlags(item_data.flags() & ~Qt.ItemIsEditable)
-                self.tabela_permanencias.setItem(row, 2, item_data)
-                
-                # Turno
-                item_turno = QTableWidgetItem(turno)
-                item_turno.setFlags(item_turno.flags() & ~Qt.ItemIsEditable)
-                self.tabela_permanencias.setItem(row, 3, item_turno)
+            for row, registo in enumerate(self.permanencias_fixas):
+                self.preencher_linha(row, registo)
             
             # Ocultar coluna ID
             self.tabela_permanencias.setColumnHidden(0, True)
+            self.atualizar_paginacao()
             
         except Exception as e:
             QMessageBox.critical(self, "Erro", f"Erro ao atualizar lista: {e}")
     
+    def preencher_linha(self, row, registo):
+        """Preenche uma linha da tabela com uma permanência fixa (id, pessoa, data, turno)"""
+        permanencia_id, pessoa_nome, data, turno = registo
+        
+        # Data (formatar para DD/MM/YYYY)
+        data_formatada = QDate.fromString(data, 'yyyy-MM-dd').toString('dd/MM/yyyy')
+        
+        for coluna, texto in enumerate((str(permanencia_id), pessoa_nome, data_formatada, turno)):
+            item = QTableWidgetItem(texto)
+            item.setFlags(item.flags() & ~Qt.ItemIsEditable)
+            self.tabela_permanencias.setItem(row, coluna, item)
+    
+    def atualizar_paginacao(self):
+        """Atualiza o texto e os botões da paginação"""
+        pagina = len(self._inicios_pagina)
+        total_paginas = max(1, -(-self.total_permanencias // self.TAMANHO_PAGINA))
+        
+        self.label_pagina.setText(
+            f"Página {pagina} de {max(pagina, total_paginas)} ({self.total_permanencias} permanência(s))"
+        )
+        self.btn_pagina_anterior.setEnabled(pagina > 1)
+        self.btn_pagina_seguinte.setEnabled(self._ha_seguinte)
+    
+    def ler_adicionadas(self, chaves, filtros):
+        """
+        Lê as permanências acabadas de adicionar que passam nos filtros
+        (chamado na thread do executor)
+        
+        Args:
+            chaves: Lista de (data, turno) adicionados
+            filtros: Resultado de filtros() no momento do pedido
+        
+        Returns:
+            Lista de (id, pessoa, data, turno)
+        """
+        if not chaves:
+            return []
+        
+        data_inicio, data_fim, pessoa_id = filtros
+        chaves = {(data.strftime('%Y-%m-%d') if hasattr(data, 'strftime') else data, turno)
+                  for data, turno in chaves}
+        datas = [data for data, _ in chaves]
+        inicio = max(min(datas), data_inicio) if data_inicio else min(datas)
+        fim = min(max(datas), data_fim) if data_fim else max(datas)
+        if inicio > fim:
+            return []
+        
+        return [
+            registo for registo in self.gestor.listar_permanencias_fixas(inicio, fim, pessoa_id)
+            if (registo[2], registo[3]) in chaves
+        ]
+    
+    def inserir_permanencias(self, novas):
+        """
+        Insere na tabela as permanências novas que pertencem à página atual,
+        sem recarregar a lista
+        """
+        inicio = self._inicios_pagina[-1]
+        chaves = [(data, turno) for _, _, data, turno in self.permanencias_fixas]
+        
+        for registo in sorted(novas, key=lambda r: (r[2], r[3])):
+            self.total_permanencias += 1
+            chave = (registo[2], registo[3])
+            
+            # Antes do início da página ou depois do fim de uma página cheia
+            pagina_cheia = len(chaves) >= self.TAMANHO_PAGINA
+            if inicio is not None and chave <= inicio:
+                continue
+            if pagina_cheia and chave > chaves[-1]:
+                self._ha_seguinte = True
+                continue
+            
+            linha = bisect_left(chaves, chave)
+            chaves.insert(linha, chave)
+            self.permanencias_fixas.insert(linha, registo)
+            self.tabela_permanencias.insertRow(linha)
+            self.preencher_linha(linha, registo)
+            
+            # A última linha passa para a página seguinte
+            if len(chaves) > self.TAMANHO_PAGINA:
+                self._ha_seguinte = True
+                chaves.pop()
+                self.permanencias_fixas.pop()
+                self.tabela_permanencias.removeRow(self.TAMANHO_PAGINA)
+        
+        self.atualizar_paginacao()
+    
+    def retirar_permanencias(self, permanencia_ids):
+        """Retira da tabela as permanências removidas, sem recarregar a lista"""
+        permanencia_ids = set(permanencia_ids)
+        
+        for linha in reversed(range(len(self.permanencias_fixas))):
+            if self.permanencias_fixas[linha][0] in permanencia_ids:
+                del self.permanencias_fixas[linha]
+                self.tabela_permanencias.removeRow(linha)
+                self.total_permanencias -= 1
+        
+        # Há linhas depois desta página: recarregá-la para voltar a ficar completa.
+        # Página vazia: carregar a anterior (ver dados_carregados)
+        if self._ha_seguinte or (not self.permanencias_fixas and self.total_permanencias):
+            self.carregar_dados()
+        else:
+            self.atualizar_paginacao()
+    
     def limpar_selecao(self):
         """Limpa os campos de seleção"""
         self.combo_pessoa.setCurrentIndex(0)
         self.date_data.setDate(QDate.currentDate())
         self.combo_turno.setCurrentIndex(0)
+        self.check_repetir.setChecked(False)
 
 def main():
     """Função para teste independente"""
-    from gestor_basedados import GestorBaseDados
+    from escala_bd_consultas import GestorBaseDados
     
     app = QApplication(sys.argv)
     gestor = GestorBaseDados()
@@ -3,25 +3,100 @@
 
 import sys
 import os
+import csv
+import importlib
+import time
+from datetime import datetime
+
+# Início do arranque (antes de importar o Qt), para o relatório de tempos
+_INICIO_ARRANQUE = time.perf_counter()
+
 from PyQt5.QtWidgets import (QApplication, QMainWindow, QWidget, QVBoxLayout, 
                              QPushButton, QLabel, QFrame, QHBoxLayout, QMessageBox,
-                             QTableWidget, QTableWidgetItem, QHeaderView, QDateEdit,
+                             QTableView, QHeaderView, QDateEdit,
                              QTabWidget, QComboBox, QSpinBox, QLineEdit, QFormLayout,
-                             QGroupBox, QTextEdit, QDialog, QDialogButtonBox)
-from PyQt5.QtCore import Qt, QDate
+                             QGroupBox, QTextEdit, QDialog, QDialogButtonBox,
+                             QProgressDialog)
+from PyQt5.QtCore import Qt, QDate, QThreadPool, QTimer
 from PyQt5.QtGui import QFont, QIcon
 
-# Importar os módulos existentes
-from escala_algoritmo import GeradorEscala
-from escala_ler_excel import ler_excel_folgas
+# Importar os módulos existentes (pandas, openpyxl e os diálogos só são
+# carregados quando usados ou pelo aquecimento depois de a janela aparecer)
 from escala_bd_consultas import GestorBaseDados
+from tarefasQt import ExecutorBD, Tarefa, TrabalhadorGeracao
+from modeloEscala import ModeloEscala
+
+# Módulos carregados em segundo plano depois da primeira pintura
+MODULOS_AQUECIMENTO = ('pandas', 'openpyxl', 'escala_algoritmo', 'escala_contexto',
+                       'fixarPessoas', 'adicionarPessoas')
+
+
+def aquecer_modulos(modulos=MODULOS_AQUECIMENTO):
+    """Importa os módulos pesados (chamada fora da thread da interface)"""
+    for nome in modulos:
+        try:
+            importlib.import_module(nome)
+        except ImportError as e:
+            print(f"⚠ Aviso: não foi possível carregar '{nome}': {e}")
+
+
+class TemposArranque:
+    """
+    Tempos das etapas do arranque, em ms desde o início de main.py
+
+    Com ESCALA_TEMPOS_ARRANQUE=<ficheiro.csv> os tempos de cada arranque são
+    acrescentados ao ficheiro, para acompanhar a evolução em cada posto.
+    """
+
+    def __init__(self, inicio=_INICIO_ARRANQUE):
+        self.inicio = inicio
+        self.etapas = []
+        self.data_hora = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+
+    def marcar(self, etapa):
+        self.etapas.append((etapa, (time.perf_counter() - self.inicio) * 1000))
+
+    def mostrar(self):
+        print("\n" + "="*50)
+        print("TEMPOS DE ARRANQUE")
+        print("="*50)
+        for etapa, ms in self.etapas:
+            print(f"{etapa:<30} {ms:>10.1f} ms")
+        print("="*50)
+
+    def guardar(self, caminho):
+        """Acrescenta os tempos ao ficheiro CSV (data_hora, executavel, etapa, ms)"""
+        novo = not os.path.exists(caminho)
+        try:
+            with open(caminho, 'a', newline='', encoding='utf-8') as f:
+                escritor = csv.writer(f)
+                if novo:
+                    escritor.writerow(['data_hora', 'executavel', 'etapa', 'ms'])
+                executavel = 'sim' if getattr(sys, 'frozen', False) else 'nao'
+                for etapa, ms in self.etapas:
+                    escritor.writerow([self.data_hora, executavel, etapa, round(ms, 1)])
+        except OSError as e:
+            print(f"✗ Erro ao guardar tempos de arranque: {e}")
+
 
 class EscalaWindow(QMainWindow):
-    def __init__(self):
+    def __init__(self, tempos=None):
         super().__init__()
-        self.gestor = GestorBaseDados()
-        self.df_folgas = None
+        self.tempos = tempos
+        self._pintada = False
+        self._aquecimento_pendente = 0
+        # ESCALA_INSTRUMENTAR=1 regista todas as consultas SQL e mostra um resumo ao sair
+        instrumentacao = None
+        if os.environ.get('ESCALA_INSTRUMENTAR'):
+            from escala_instrumentacao import InstrumentacaoSQL
+            instrumentacao = InstrumentacaoSQL()
+        self.gestor = GestorBaseDados(instrumentacao=instrumentacao)
+        self.executor_bd = ExecutorBD(self.gestor, parent=self)
+        self._contexto = None  # Criado no primeiro uso (importa pandas)
+        self.disponibilidade = None
         self.escala_gerada = None
+        self.trabalhador_geracao = None
+        self.progresso_geracao = None
         
         self.setWindowTitle("Sistema de Gestão de Escalas")
         self.setGeometry(100, 100, 1200, 800)
@@ -135,10 +210,13 @@ class EscalaWindow(QMainWindow):
         self.escala_view_frame = QGroupBox("Escala Gerada")
         self.escala_view_layout = QVBoxLayout()
         
-        self.tabela_escala = QTableWidget()
-        self.tabela_escala.setColumnCount(4)
-        self.tabela_escala.setHorizontalHeaderLabels(["Data", "Dia da Semana", "Manhã", "Tarde"])
+        # Modelo/vista: só as linhas visíveis são pedidas ao modelo
+        self.modelo_escala = ModeloEscala(self)
+        self.tabela_escala = QTableView()
+        self.tabela_escala.setModel(self.modelo_escala)
         self.tabela_escala.horizontalHeader().setSectionResizeMode(QHeaderView.Stretch)
+        # Linhas de altura fixa: a vista não mede o conteúdo de cada linha
+        self.tabela_escala.verticalHeader().setSectionResizeMode(QHeaderView.Fixed)
         self.tabela_escala.setMinimumHeight(400)  # Altura para ~16 linhas
         self.tabela_escala.setMaximumHeight(600)  # Altura máxima
         self.escala_view_layout.addWidget(self.tabela_escala)
@@ -221,6 +299,14 @@ class EscalaWindow(QMainWindow):
             }
         """)
     
+    @property
+    def contexto(self):
+        """ContextoDados com as folgas, a cópia da base de dados e o gerador"""
+        if self._contexto is None:
+            from escala_contexto import ContextoDados
+            self._contexto = ContextoDados(self.gestor, 'escala_folgas.xlsx')
+        return self._contexto
+    
     def abrir_gerar_escala(self):
         """Abre diálogo para gerar escala"""
         dialog = GerarEscalaDialog(self)
@@ -232,8 +318,11 @@ class EscalaWindow(QMainWindow):
         """Abre diálogo para fixar pessoas"""
         try:
             from fixarPessoas import FixarPessoasDialog
-            dialog = FixarPessoasDialog(self.gestor, self)
+            dialog = FixarPessoasDialog(self.gestor, self, self.disponibilidade,
+                                        executor=self.executor_bd)
             dialog.exec_()
+            # Sem pai, o diálogo é libertado quando não houver operações pendentes a usá-lo
+            dialog.setParent(None)
         except Exception as e:
             QMessageBox.critical(self, "Erro", f"Erro ao abrir fixar pessoas: {e}")
     
@@ -241,79 +330,90 @@ class EscalaWindow(QMainWindow):
         """Abre diálogo para adicionar pessoas"""
         try:
             from adicionarPessoas import AdicionarPessoasDialog
-            dialog = AdicionarPessoasDialog(self.gestor, self)
+            dialog = AdicionarPessoasDialog(self.gestor, self, executor=self.executor_bd)
             dialog.exec_()
+            # Sem pai, o diálogo é libertado quando não houver operações pendentes a usá-lo
+            dialog.setParent(None)
         except Exception as e:
             QMessageBox.critical(self, "Erro", f"Erro ao abrir adicionar pessoas: {e}")
     
     def gerar_escala(self, data_inicio, data_fim):
-        """Gera a escala para o período especificado"""
-        try:
-            # Carregar folgas do Excel
-            self.df_folgas = ler_excel_folgas('escala_folgas.xlsx')
-            
-            if self.df_folgas is None:
-                QMessageBox.warning(self, "Aviso", "Ficheiro de folgas não encontrado!")
-                return
-            
-            # Criar gerador de escala
-            gerador = GeradorEscala(self.gestor, self.df_folgas)
-            
-            # Gerar escala
-            self.escala_gerada = gerador.gerar_escala(data_inicio, data_fim)
-            
-            # Mostrar na tabela
-            self.mostrar_escala_tabela()
-            
-            # Mostrar frame da escala
-            self.escala_view_frame.setVisible(True)
-            
-            QMessageBox.information(self, "Sucesso", "Escala gerada com sucesso!")
-            
-        except Exception as e:
-            QMessageBox.critical(self, "Erro", f"Erro ao gerar escala: {str(e)}")
+        """Gera a escala para o período especificado (numa thread separada)"""
+        if self.trabalhador_geracao is not None:
+            QMessageBox.warning(self, "Aviso", "Já está a ser gerada uma escala!")
+            return
+        
+        # Limpar escala anterior; as semanas aparecem à medida que são geradas
+        self.escala_gerada = {}
+        self.modelo_escala.limpar()
+        self.escala_view_frame.setVisible(True)
+        
+        total_dias = (data_fim - data_inicio).days + 1
+        self.progresso_geracao = QProgressDialog("A gerar escala...", "Cancelar", 0, total_dias, self)
+        self.progresso_geracao.setWindowTitle("Gerar Escala")
+        self.progresso_geracao.setWindowModality(Qt.WindowModal)
+        self.progresso_geracao.setMinimumDuration(300)
+        self.progresso_geracao.setAutoClose(False)
+        self.progresso_geracao.setAutoReset(False)
+        
+        # Atualizar folgas/base de dados (se mudaram) e gerar escala fora da thread da interface
+        trabalhador = TrabalhadorGeracao(self.contexto, data_inicio, data_fim, self)
+        trabalhador.progresso.connect(self.progresso_geracao.setValue)
+        trabalhador.semana_concluida.connect(self.adicionar_semana_escala)
+        trabalhador.concluida.connect(self.escala_concluida)
+        trabalhador.cancelada.connect(self.escala_cancelada)
+        trabalhador.falhou.connect(self.escala_falhou)
+        trabalhador.finished.connect(self.geracao_terminada)
+        self.progresso_geracao.canceled.connect(trabalhador.cancelar)
+        
+        self.trabalhador_geracao = trabalhador
+        trabalhador.start()
+    
+    def escala_concluida(self, gerador):
+        """Recebe o gerador quando a escala termina"""
+        # Cópia: a matriz do gerador é recarregada no lugar pela próxima geração
+        self.disponibilidade = gerador.disponibilidade.copia()
+        self.escala_gerada = gerador.escala
+        
+        self.progresso_geracao.close()
+        QMessageBox.information(self, "Sucesso", "Escala gerada com sucesso!")
+    
+    def escala_cancelada(self, gerador):
+        """Mostra a escala parcial quando a geração é cancelada"""
+        self.disponibilidade = gerador.disponibilidade.copia()
+        self.escala_gerada = gerador.escala
+        self.mostrar_escala_tabela()
+        
+        self.progresso_geracao.close()
+        QMessageBox.information(self, "Cancelado", 
+                              f"Geração cancelada. Dias gerados: {len(self.escala_gerada)}")
+    
+    def escala_falhou(self, erro):
+        """Mostra o erro da geração"""
+        self.progresso_geracao.close()
+        if isinstance(erro, str):
+            QMessageBox.warning(self, "Aviso", erro)
+        else:
+            QMessageBox.critical(self, "Erro", f"Erro ao gerar escala: {str(erro)}")
+    
+    def geracao_terminada(self):
+        """Liberta o trabalhador quando a thread termina"""
+        self.trabalhador_geracao.deleteLater()
+        self.trabalhador_geracao = None
+        self.progresso_geracao.deleteLater()
+        self.progresso_geracao = None
+    
+    def adicionar_semana_escala(self, semana):
+        """Acrescenta à tabela os dias de uma semana acabada de gerar"""
+        self.escala_gerada.update(semana)
+        self.modelo_escala.adicionar_dias(semana)
     
     def mostrar_escala_tabela(self):
         """Mostra a escala gerada na tabela"""
         if not self.escala_gerada:
             return
         
-        # Ordenar datas
-        datas_ordenadas = sorted(self.escala_gerada.keys())
-        
-        self.tabela_escala.setRowCount(len(datas_ordenadas))
-        
-        dias_pt = {
-            'Monday': 'Segunda',
-            'Tuesday': 'Terça', 
-            'Wednesday': 'Quarta',
-            'Thursday': 'Quinta',
-            'Friday': 'Sexta',
-            'Saturday': 'Sábado',
-            'Sunday': 'Domingo'
-        }
-        
-        for row, data_str in enumerate(datas_ordenadas):
-            # Data
-            data_obj = QDate.fromString(data_str, 'yyyy-MM-dd')
-            item_data = QTableWidgetItem(data_obj.toString('dd/MM/yyyy'))
-            self.tabela_escala.setItem(row, 0, item_data)
-            
-            # Dia da semana
-            dia_semana = data_obj.toString('dddd')
-            dia_semana_pt = dias_pt.get(dia_semana, dia_semana)
-            item_dia = QTableWidgetItem(dia_semana_pt)
-            self.tabela_escala.setItem(row, 1, item_dia)
-            
-            # Manhã
-            manha = self.escala_gerada[data_str].get('Manhã', '')
-            item_manha = QTableWidgetItem(manha)
-            self.tabela_escala.setItem(row, 2, item_manha)
-            
-            # Tarde
-            tarde = self.escala_gerada[data_str].get('Tarde', '')
-            item_tarde = QTableWidgetItem(tarde)
-            self.tabela_escala.setItem(row, 3, item_tarde)
+        self.modelo_escala.definir_escala(self.escala_gerada)
     
     def exportar_escala(self):
         """Exporta a escala para Excel"""
@@ -321,12 +421,13 @@ class EscalaWindow(QMainWindow):
             QMessageBox.warning(self, "Aviso", "Nenhuma escala gerada para exportar!")
             return
         
+        if self.trabalhador_geracao is not None:
+            QMessageBox.warning(self, "Aviso", "Aguarde o fim da geração da escala!")
+            return
+        
         try:
-            from datetime import datetime
-            
-            # Criar gerador temporário para usar o método de exportação
-            gerador = GeradorEscala(self.gestor, self.df_folgas)
-            gerador.escala = self.escala_gerada
+            # O gerador da última geração já tem a escala e as folgas carregadas
+            gerador = self.contexto.gerador
             
             # Nome do ficheiro com data atual
             data_atual = datetime.now().strftime("%Y%m%d_%H%M")
@@ -338,6 +439,59 @@ class EscalaWindow(QMainWindow):
         except Exception as e:
             QMessageBox.critical(self, "Erro", f"Erro ao exportar: {str(e)}")
     
+    def paintEvent(self, event):
+        """Na primeira pintura, regista o tempo e inicia o aquecimento"""
+        super().paintEvent(event)
+        if not self._pintada:
+            self._pintada = True
+            if self.tempos is not None:
+                self.tempos.marcar('primeira pintura')
+            QTimer.singleShot(0, self.aquecer)
+    
+    def aquecer(self):
+        """Carrega os módulos pesados e abre a base de dados em segundo plano"""
+        self._aquecimento_pendente = 2
+        
+        tarefa = Tarefa(aquecer_modulos)
+        tarefa.sinais.concluida.connect(lambda _: self.aquecimento_concluido('módulos carregados'))
+        tarefa.sinais.falhou.connect(lambda _: self.aquecimento_concluido('módulos carregados'))
+        QThreadPool.globalInstance().start(tarefa)
+        
+        # Abre a conexão da thread do executor (e migra o esquema) e enche a cache
+        self.executor_bd.executar(
+            'listar_pessoas',
+            ao_concluir=lambda _: self.aquecimento_concluido('base de dados pronta'),
+            ao_falhar=lambda _: self.aquecimento_concluido('base de dados pronta')
+        )
+    
+    def aquecimento_concluido(self, etapa):
+        """Regista uma etapa do aquecimento e, no fim, o relatório de arranque"""
+        self._aquecimento_pendente -= 1
+        if self.tempos is None:
+            return
+        
+        self.tempos.marcar(etapa)
+        if self._aquecimento_pendente == 0:
+            self.tempos.mostrar()
+            caminho = os.environ.get('ESCALA_TEMPOS_ARRANQUE')
+            if caminho:
+                self.tempos.guardar(caminho)
+    
+    def closeEvent(self, event):
+        """Fecha as conexões à base de dados ao sair"""
+        if self.trabalhador_geracao is not None:
+            self.trabalhador_geracao.cancelar()
+            self.trabalhador_geracao.wait()
+        self.executor_bd.aguardar()
+        QThreadPool.globalInstance().waitForDone()
+        if self._contexto is not None:
+            self._contexto.fechar()
+        if self.gestor.instrumentacao is not None:
+            self.gestor.instrumentacao.mostrar_resumo()
+            self.gestor.instrumentacao.exportar('escala_consultas.json')
+        self.gestor.fechar()
+        super().closeEvent(event)
+    
     def fechar_aplicacao(self):
         """Fecha a aplicação completamente"""
         reply = QMessageBox.question(self, 'Fechar Aplicação', 
@@ -407,10 +561,14 @@ class GerarEscalaDialog(QDialog):
         return data_inicio, data_fim
 
 def main():
+    tempos = TemposArranque()
+    tempos.marcar('importações')
     app = QApplication(sys.argv)
     # Estilo moderno
     app.setStyle('Fusion')
-    window = EscalaWindow()
+    tempos.marcar('QApplication')
+    window = EscalaWindow(tempos)
+    tempos.marcar('janela construída')
     window.show()
     sys.exit(app.exec_())
 
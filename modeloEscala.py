@@ -0,0 +1,134 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+from bisect import bisect_left
+from datetime import date
+from PyQt5.QtCore import Qt, QAbstractTableModel, QModelIndex, QVariant
+
+DIAS_SEMANA = ('Segunda', 'Terça', 'Quarta', 'Quinta', 'Sexta', 'Sábado', 'Domingo')
+TURNOS = ('Manhã', 'Tarde')
+
+
+class ModeloEscala(QAbstractTableModel):
+    """
+    Modelo da tabela da escala (Data, Dia da Semana, Manhã, Tarde)
+
+    Lê diretamente do dicionário {data: {'Manhã': pessoa, 'Tarde': pessoa}},
+    com as datas no formato 'YYYY-MM-DD'. A vista só pede os dados das linhas
+    visíveis, por isso o custo não depende do tamanho do período.
+    """
+
+    COLUNAS = ('Data', 'Dia da Semana') + TURNOS
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self._escala = {}
+        self._datas = []  # Datas ordenadas, uma por linha
+
+    # ----- Interface QAbstractTableModel -----
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self._datas)
+
+    def columnCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.COLUNAS)
+
+    def data(self, index, role=Qt.DisplayRole):
+        if role != Qt.DisplayRole or not index.isValid():
+            return QVariant()
+
+        data_str = self._datas[index.row()]
+        coluna = index.column()
+
+        if coluna == 0:
+            # 'YYYY-MM-DD' -> 'DD/MM/YYYY'
+            return f"{data_str[8:10]}/{data_str[5:7]}/{data_str[0:4]}"
+        if coluna == 1:
+            return DIAS_SEMANA[date.fromisoformat(data_str).weekday()]
+        return self._escala[data_str].get(TURNOS[coluna - 2], '')
+
+    def headerData(self, section, orientation, role=Qt.DisplayRole):
+        if role != Qt.DisplayRole:
+            return QVariant()
+        if orientation == Qt.Horizontal:
+            return self.COLUNAS[section]
+        return section + 1
+
+    # ----- Atualização -----
+
+    def definir_escala(self, escala):
+        """Substitui a escala mostrada"""
+        self.beginResetModel()
+        self._escala = dict(escala)
+        self._datas = sorted(self._escala)
+        self.endResetModel()
+
+    def limpar(self):
+        """Remove todas as linhas"""
+        self.definir_escala({})
+
+    def adicionar_dias(self, dias):
+        """
+        Acrescenta ou atualiza dias da escala
+
+        Dias posteriores ao último são inseridos no fim (beginInsertRows);
+        dias já existentes só emitem dataChanged nas suas linhas.
+        """
+        novos = sorted(d for d in dias if d not in self._escala)
+        existentes = [d for d in dias if d in self._escala]
+
+        if novos and self._datas and novos[0] < self._datas[-1]:
+            # Dias intercalados: mais simples recriar o modelo
+            escala = dict(self._escala)
+            escala.update(dias)
+            self.definir_escala(escala)
+            return
+
+        for data_str in existentes:
+            self._escala[data_str] = dict(dias[data_str])
+        self._emitir_alteracoes(existentes)
+
+        if novos:
+            inicio = len(self._datas)
+            self.beginInsertRows(QModelIndex(), inicio, inicio + len(novos) - 1)
+            for data_str in novos:
+                self._escala[data_str] = dict(dias[data_str])
+            self._datas.extend(novos)
+            self.endInsertRows()
+
+    def definir_turno(self, data_str, turno, pessoa):
+        """Altera a pessoa de um turno, emitindo dataChanged só nessa célula"""
+        if data_str not in self._escala:
+            self.adicionar_dias({data_str: {turno: pessoa}})
+            return
+
+        self._escala[data_str][turno] = pessoa
+        indice = self.index(self.linha_da_data(data_str), 2 + TURNOS.index(turno))
+        self.dataChanged.emit(indice, indice, [Qt.DisplayRole])
+
+    def linha_da_data(self, data_str):
+        """Retorna a linha de uma data ('YYYY-MM-DD') ou -1"""
+        linha = bisect_left(self._datas, data_str)
+        if linha < len(self._datas) and self._datas[linha] == data_str:
+            return linha
+        return -1
+
+    def _emitir_alteracoes(self, datas):
+        """Emite dataChanged para cada bloco contíguo de linhas alteradas"""
+        linhas = sorted(self.linha_da_data(d) for d in datas)
+        inicio = anterior = None
+
+        for linha in linhas + [None]:
+            if linha is not None and anterior is not None and linha == anterior + 1:
+                anterior = linha
+                continue
+            if inicio is not None:
+                self.dataChanged.emit(self.index(inicio, 2),
+                                      self.index(anterior, len(self.COLUNAS) - 1),
+                                      [Qt.DisplayRole])
+            inicio = anterior = linha
+
+    @property
+    def escala(self):
+        """Escala mostrada (não alterar diretamente)"""
+        return self._escala
@@ -0,0 +1,212 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import queue
+import threading
+from datetime import timedelta
+from PyQt5.QtCore import QObject, QRunnable, QThread, pyqtSignal
+
+
+class SinaisTarefa(QObject):
+    """Sinais emitidos por uma Tarefa (entregues na thread da interface)"""
+    concluida = pyqtSignal(object)
+    falhou = pyqtSignal(object)
+
+
+class Tarefa(QRunnable):
+    """Executa funcao(*args, **kwargs) numa thread do pool (ou numa ThreadBD) e emite o resultado"""
+
+    def __init__(self, funcao, *args, **kwargs):
+        super().__init__()
+        self.funcao = funcao
+        self.args = args
+        self.kwargs = kwargs
+        self.sinais = SinaisTarefa()
+
+    def run(self):
+        try:
+            resultado = self.funcao(*self.args, **self.kwargs)
+        except Exception as e:
+            self.sinais.falhou.emit(e)
+        else:
+            self.sinais.concluida.emit(resultado)
+
+
+class ThreadBD(QThread):
+    """
+    Thread de longa duração que executa as Tarefas de uma fila, por ordem
+
+    O ciclo corre em Python durante toda a vida da thread, por isso o estado
+    da thread no Python (e o threading.local do GestorBaseDados) mantém-se
+    entre tarefas: todas usam a mesma conexão. Numa QThreadPool, cada
+    QRunnable corre com um estado novo e abriria uma conexão por tarefa.
+    """
+
+    def __init__(self, gestor_bd, parent=None):
+        super().__init__(parent)
+        self.gestor = gestor_bd
+        self.fila = queue.Queue()
+
+    def run(self):
+        try:
+            while True:
+                tarefa = self.fila.get()
+                if tarefa is None:
+                    break
+                tarefa.run()
+        finally:
+            self.gestor.fechar_conexao_thread()
+
+    def parar(self, timeout_ms=None):
+        """Termina a thread depois das tarefas já agendadas e espera por ela"""
+        if not self.isRunning():
+            return True
+        self.fila.put(None)
+        return self.wait() if timeout_ms is None or timeout_ms < 0 else self.wait(timeout_ms)
+
+
+class ExecutorBD(QObject):
+    """
+    Executa chamadas ao GestorBaseDados fora da thread da interface
+
+    Os resultados chegam por sinais à thread que chamou executar(), por isso
+    os callbacks podem atualizar widgets diretamente. As operações correm
+    numa só ThreadBD, pela ordem pedida e sempre com a mesma conexão (o
+    GestorBaseDados mantém uma conexão por thread).
+    """
+
+    ocupado = pyqtSignal(bool)
+
+    def __init__(self, gestor_bd, parent=None):
+        super().__init__(parent)
+        self.gestor = gestor_bd
+        self.thread_bd = ThreadBD(gestor_bd, parent=self)
+        self._pendentes = set()
+
+        # destroyed é emitido antes de os filhos serem libertados: se o executor
+        # for destruído com o diálogo, a thread termina antes de ser destruída
+        self.destroyed.connect(lambda *_, thread_bd=self.thread_bd: thread_bd.parar())
+
+    def executar(self, operacao, *args, ao_concluir=None, ao_falhar=None, **kwargs):
+        """
+        Agenda uma operação na base de dados
+
+        Args:
+            operacao: Nome de um método do GestorBaseDados ou função a executar
+            *args, **kwargs: Argumentos da operação
+            ao_concluir: Função chamada com o resultado (na thread da interface)
+            ao_falhar: Função chamada com a exceção (na thread da interface)
+
+        Returns:
+            A Tarefa agendada
+        """
+        funcao = getattr(self.gestor, operacao) if isinstance(operacao, str) else operacao
+        rotulo = operacao if isinstance(operacao, str) else getattr(operacao, '__qualname__', 'tarefa')
+        tarefa = Tarefa(self._executar_medido, rotulo, funcao, args, kwargs)
+
+        if ao_concluir is not None:
+            tarefa.sinais.concluida.connect(ao_concluir)
+        if ao_falhar is not None:
+            tarefa.sinais.falhou.connect(ao_falhar)
+        else:
+            tarefa.sinais.falhou.connect(lambda e: print(f"✗ Erro na base de dados: {e}"))
+
+        tarefa.sinais.concluida.connect(lambda _: self._terminar(tarefa))
+        tarefa.sinais.falhou.connect(lambda _: self._terminar(tarefa))
+
+        self._pendentes.add(tarefa)
+        if len(self._pendentes) == 1:
+            self.ocupado.emit(True)
+
+        if not self.thread_bd.isRunning():
+            self.thread_bd.start()
+        self.thread_bd.fila.put(tarefa)
+        return tarefa
+
+    def _executar_medido(self, rotulo, funcao, args, kwargs):
+        """Executa a função com as consultas associadas ao rótulo (ver GestorBaseDados.medir)"""
+        with self.gestor.medir(rotulo):
+            return funcao(*args, **kwargs)
+
+    def _terminar(self, tarefa):
+        self._pendentes.discard(tarefa)
+        if not self._pendentes:
+            self.ocupado.emit(False)
+
+    @property
+    def pendentes(self):
+        """Número de operações agendadas ou em curso"""
+        return len(self._pendentes)
+
+    def aguardar(self, timeout_ms=-1):
+        """
+        Bloqueia até todas as operações terminarem e fecha a conexão da thread
+        (ex: ao fechar a aplicação); uma nova operação volta a iniciar a thread
+        """
+        return self.thread_bd.parar(timeout_ms)
+
+
+class TrabalhadorGeracao(QThread):
+    """
+    Gera uma escala numa thread separada
+
+    Atualiza o ContextoDados (folgas e cópia da base de dados, só se tiverem
+    mudado) e gera a escala, emitindo o progresso por dia e a escala de cada
+    semana concluída (de segunda a domingo), para a interface mostrar
+    resultados parciais. Pode ser cancelado com cancelar(); a geração pára
+    no início do dia seguinte.
+    """
+
+    progresso = pyqtSignal(int, int)            # dias concluídos, total de dias
+    semana_concluida = pyqtSignal(object)       # {data: {'Manhã': ..., 'Tarde': ...}}
+    concluida = pyqtSignal(object)              # GeradorEscala
+    cancelada = pyqtSignal(object)              # GeradorEscala (escala parcial)
+    falhou = pyqtSignal(object)                 # exceção ou mensagem
+
+    def __init__(self, contexto, data_inicio, data_fim, parent=None):
+        super().__init__(parent)
+        self.contexto = contexto
+        self.data_inicio = data_inicio
+        self.data_fim = data_fim
+        self._cancelar = threading.Event()
+        self._dias_emitidos = 0
+
+    def cancelar(self):
+        """Pede o cancelamento da geração (não bloqueia)"""
+        self._cancelar.set()
+
+    def run(self):
+        try:
+            with self.contexto.gestor.medir('gerar_escala'):
+                gerador = self.contexto.gerar_escala(
+                    self.data_inicio, self.data_fim,
+                    ao_progresso=self._ao_progresso,
+                    cancelar=self._cancelar.is_set
+                )
+        except Exception as e:
+            self.falhou.emit(e)
+            return
+        finally:
+            # A conexão desta thread (usada para a cópia da base de dados) não volta a ser usada
+            self.contexto.gestor.fechar_conexao_thread()
+
+        if gerador is None:
+            self.falhou.emit("Ficheiro de folgas não encontrado!")
+        elif gerador.cancelada:
+            self.cancelada.emit(gerador)
+        else:
+            self.concluida.emit(gerador)
+
+    def _ao_progresso(self, dias_concluidos, total_dias):
+        """Chamado pelo gerador no fim de cada dia (nesta thread)"""
+        self.progresso.emit(dias_concluidos, total_dias)
+
+        ultimo_dia = self.data_inicio + timedelta(days=dias_concluidos - 1)
+        if ultimo_dia.weekday() == 6 or dias_concluidos == total_dias:
+            escala = self.contexto.gerador.escala
+            semana = {}
+            for i in range(self._dias_emitidos, dias_concluidos):
+                data_str = (self.data_inicio + timedelta(days=i)).strftime('%Y-%m-%d')
+                semana[data_str] = dict(escala.get(data_str, {}))
+            self._dias_emitidos = dias_concluidos
+            self.semana_concluida.emit(semana)